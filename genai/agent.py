@@ -1,8 +1,54 @@
+import asyncio
+import logging
 import os
+import time
 from bedrock_agentcore import BedrockAgentCoreApp
-from agent_config import create_strands_agent
+from app_logging import configure_logging
+from agent_pool import AGENT_POOL, get_pooled_agent
+from s3_session import flush_agent_session, reserve_agent_session, wait_for_flush
+from conversation import schedule_summary, summary_due
+from cancellation import CancelScope, current_cancel_scope, finish_cancelled
+from stream_coalescer import StreamStats, coalesce_tokens, coalescing_options, parse_flag
+from request_metrics import RequestMetrics, current_request
+from personalities import get_registry
+from model_router import (AUTO_MODEL, ROUTER_STATS, apply_route, assess_response, escalation_limit,
+                          portable_history, rewind_turn, route, router_tiers, turn_checkpoint)
+from warmup import start_warm_up
+
+configure_logging()
+logger = logging.getLogger("agent")
 
 app = BedrockAgentCoreApp()
+# Send the runtime's own log records through the queue handler as well
+app.logger.handlers = []
+# Build clients, the registry and warm agent resources off the request path
+start_warm_up()
+
+def save_summary(agent):
+    """Write an agent's updated conversation summary to its session."""
+    session_manager = getattr(agent, "_session_manager", None)
+    if session_manager is not None:
+        session_manager.sync_agent(agent)
+        flush_agent_session(agent)
+
+def summarize_in_background(agent):
+    """
+    Fold turns that no longer fit the budget into the session summary.
+
+    A write-behind session is reserved until the summary is saved, so the
+    next request waits for it instead of racing it to agent.json.
+    """
+    if not summary_due(agent):
+        return
+    release = reserve_agent_session(agent)
+    if release is None:
+        schedule_summary(agent, on_complete=save_summary)
+        return
+    job = schedule_summary(agent, on_complete=lambda a: release(lambda: a._session_manager.sync_agent(a)))
+    if job is None:
+        release()
+    else:
+        job.add_done_callback(lambda _: release())
 
 def abbreviate_model(model_id):
     """Convert full model ID to abbreviated form for S3 prefix"""
@@ -11,7 +57,9 @@ def abbreviate_model(model_id):
         'us.amazon.nova-pro-v1:0': 'nova-pro', 
         'us.amazon.nova-premier-v1:0': 'nova-premier',
         'us.anthropic.claude-3-5-haiku-20241022-v1:0': 'haiku-3-5',
-        'us.anthropic.claude-sonnet-4-20250514-v1:0': 'sonnet-4'
+        'us.anthropic.claude-sonnet-4-20250514-v1:0': 'sonnet-4',
+        # Routed sessions keep one history whatever model answers each turn
+        AUTO_MODEL: 'auto'
     }
     return model_abbreviations.get(model_id, 'unknown-model')
 
@@ -23,45 +71,176 @@ async def agent_invocation(payload):
     session_id = payload.get("session_id", "default-session")
     s3_session_bucket = payload.get("s3sessionbucket", "")
     
-    print(f'Request - Model: {model_selected}, Personality: {model_persona}, Session: {session_id}, S3 Bucket: {s3_session_bucket}')
-    
     # Split session ID on hyphen to get username and session
     if '-' in session_id:
         username, actual_session_id = session_id.split('-', 1)  # Split only on first hyphen
         model_abbrev = abbreviate_model(model_selected)
         s3_prefix = f"{username}/{model_abbrev}"  # username/model format
-        print(f'Split session - Username: {username}, Session ID: {actual_session_id}, Model: {model_selected} -> {model_abbrev}, S3 Prefix: {s3_prefix}')
     else:
         # Fallback if no hyphen found
         actual_session_id = session_id
         model_abbrev = abbreviate_model(model_selected)
         s3_prefix = f"default/{model_abbrev}"  # default/model format
-        print(f'No hyphen in session ID, using default prefix: {s3_prefix}')
     
-    # Create agent with S3 session management
-    agent = create_strands_agent(
-        model=model_selected, 
-        personality=model_persona,
+    # Per-request latency breakdown, visible to agent_config and the KB tools
+    metrics = RequestMetrics(
         session_id=actual_session_id,
-        s3_bucket=s3_session_bucket,
-        s3_prefix=s3_prefix
+        model=model_selected,
+        personality=get_registry().label(model_persona)
     )
+    current_request.set(metrics)
+    # Lets the model stream and KB retrievals stop when the client goes away
+    cancel_scope = CancelScope()
+    current_cancel_scope.set(cancel_scope)
+    logger.info("request", extra={"s3_bucket": s3_session_bucket, "s3_prefix": s3_prefix})
+    
+    if s3_session_bucket:
+        # Let this session's previous flush land before its session manager
+        # reads S3, waiting on a worker thread so other streams keep going
+        await asyncio.to_thread(wait_for_flush, (s3_session_bucket, s3_prefix, actual_session_id))
+
+    # Create agent with S3 session management, reusing warm model/tool resources
+    with metrics.span("agent_build"):
+        agent = get_pooled_agent(
+            model=model_selected, 
+            personality=model_persona,
+            session_id=actual_session_id,
+            s3_bucket=s3_session_bucket,
+            s3_prefix=s3_prefix
+        )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("agent pool stats", extra={"agent_pool": AGENT_POOL.stats()})
+
+    routed = model_selected == AUTO_MODEL
+    if routed:
+        # The agent was built on the cheapest tier; move it to the cheapest
+        # tier that fits this request
+        portable_history(agent.messages)
+        decision = route(user_message, agent.messages, has_tools=bool(agent.tool_names))
+        ROUTER_STATS.record_decision(decision)
+        tiers = router_tiers()
+        tier, current_model = decision.tier, decision.model_id
+        apply_route(agent, current_model, model_persona)
+        metrics.annotate(model=current_model, route_tier=tier, route_reasons=",".join(decision.reasons))
+        logger.info("model routed", extra={"routed_model": current_model, "route_tier": tier,
+                                           "route_reasons": list(decision.reasons), **decision.features})
     
     # tell UI to reset
     yield {"type": "start"}
 
+    # Merge tiny token deltas into fewer SSE frames unless the client opts out
+    coalesce = coalescing_options(payload)
+    stream_stats = StreamStats() if coalesce else None
+
+    def finish_cancelled_request(agent):
+        metrics.emit()
+        flush_agent_session(agent)
+
+    escalations_left = escalation_limit() if routed else 0
+    while True:
+        checkpoint = turn_checkpoint(agent) if escalations_left else None
+        stream = agent.stream_async(user_message)
+        # Text of the model call in progress, kept for the history if the client goes away
+        partial_text = []
+        # Final text, stop reason, error and latency of this answer, for the router
+        outcome = {}
+
+        async def ui_events():
+            started = time.perf_counter()
+            generation = metrics.start_span("generation")
+            first_token = metrics.start_span("first_token")
+            try:
+                async for event in stream:
+                    if "message" in event:
+                        partial_text.clear()
+                        message = event["message"]
+                        if message.get("role") == "assistant":
+                            outcome["text"] = "".join(block["text"] for block in message.get("content", [])
+                                                      if "text" in block)
+                    if "result" in event:
+                        outcome["stop_reason"] = event["result"].stop_reason
+                    usage = event.get("event", {}).get("metadata", {}).get("usage")
+                    if usage:
+                        # Token counts, including prompt cache reads and writes
+                        metrics.add_usage(usage)
+                    txt = event.get("data")
+                    if isinstance(txt, str) and txt:
+                        if first_token:
+                            metrics.end_span(first_token)
+                            first_token = None
+                            outcome["ttft_ms"] = (time.perf_counter() - started) * 1000.0
+                        metrics.add("token_events")
+                        partial_text.append(txt)
+                        # UI will JSON.parse(e.data) and route by type
+                        yield {"type": "token", "text": txt}
+            except Exception as e:
+                metrics.add("errors")
+                outcome["error"] = str(e)
+                logger.exception("agent stream failed")
+                # optional: surface errors to UI
+                yield {"type": "error", "message": str(e)}
+            finally:
+                metrics.end_span(generation)
+                outcome["total_ms"] = (time.perf_counter() - started) * 1000.0
+
+        events = ui = ui_events()
+        if coalesce:
+            events = coalesce_tokens(events, stats=stream_stats, **coalesce)
+
+        completed = False
+        try:
+            async for event in events:
+                yield event
+            completed = True
+        finally:
+            if not completed:
+                # The client disconnected: stop the model and KB calls, then close
+                # the streams and save the partial turn on a separate task
+                cancel_scope.cancel()
+                metrics.add("cancelled")
+                finish_cancelled(agent, [events, ui, stream], "".join(partial_text), on_done=finish_cancelled_request)
+
+        if not routed:
+            break
+        ROUTER_STATS.record_response(current_model, outcome.get("ttft_ms"), outcome["total_ms"])
+        reason = None
+        if escalations_left and tier + 1 < len(tiers):
+            reason = assess_response(user_message, outcome.get("text"), outcome.get("stop_reason"),
+                                     outcome.get("error"))
+        # Retry one tier up, unless the first answer is already stored
+        if reason is None or not rewind_turn(agent, checkpoint):
+            break
+        escalations_left -= 1
+        previous_model, tier = current_model, tier + 1
+        current_model = tiers[tier]
+        apply_route(agent, current_model, model_persona)
+        ROUTER_STATS.record_escalation(previous_model, current_model, reason)
+        metrics.add("escalations")
+        metrics.annotate(model=current_model, route_tier=tier, escalated_from=previous_model,
+                         escalation_reason=reason)
+        logger.info("model escalated", extra={"escalated_from": previous_model, "routed_model": current_model,
+                                              "escalation_reason": reason})
+        # The UI drops the first answer and shows the retry
+        yield {"type": "start"}
+
+    if stream_stats:
+        frames = stream_stats.snapshot()
+        metrics.add("sse_frames", frames["frames"])
+        metrics.add("sse_bytes", frames["bytes"])
+
+    # One JSON log line per request; optionally sent to the client as well
+    breakdown = metrics.emit()
+    if parse_flag(payload.get("metrics"), False):
+        yield {"type": "metrics", "metrics": breakdown}
+
     try:
-        async for event in agent.stream_async(user_message):
-            txt = event.get("data")
-            if isinstance(txt, str) and txt:
-                # UI will JSON.parse(e.data) and route by type
-                yield {"type": "token", "text": txt}
-    except Exception as e:
-        # optional: surface errors to UI
-        yield {"type": "error", "message": str(e)}
-
-    # done marker for UI to stop spinners, etc.
-    yield {"type": "done"}
+        # done marker for UI to stop spinners, etc.
+        yield {"type": "done"}
+    finally:
+        # Persist buffered session writes off the streaming path, then fold
+        # turns that no longer fit the budget into the session summary
+        flush_agent_session(agent)
+        summarize_in_background(agent)
 
 if __name__ == "__main__":
     app.run()
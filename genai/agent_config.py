@@ -4,44 +4,116 @@ This module provides a centralized way to configure and create agents
 to avoid code duplication between CLI and other components.
 """
 
+import logging
 import os
-import boto3
+from dataclasses import dataclass
+from aws_clients import PooledClientSession
 from strands import Agent
 from strands.models import BedrockModel
-from strands.agent.conversation_manager import SlidingWindowConversationManager
 from strands.session.s3_session_manager import S3SessionManager
-from strands_tools import shell, editor, python_repl, calculator
-from tools.fomc_kb_search import fomc_kb_search
-from tools.scotus_kb_search import scotus_kb_search
+from s3_session import WriteBehindS3SessionManager, session_cache_from_env
+from request_metrics import request_span
+from app_logging import truncate
+from personalities import get_registry
+from conversation import conversation_manager_for
+from prompt_cache import prompt_cache_config, prompt_cache_enabled
+from cancellation import CancellableBedrockModel
 
-def create_strands_agent(model = 'us.amazon.nova-micro-v1:0',
-                         personality = 'basic',
-                         session_id = None,
-                         s3_bucket = None,
-                         s3_prefix = None):
+# Process-wide read-through cache of session state keyed by (s3_prefix, session_id),
+# so warm multi-turn conversations skip the S3 list/get round trips
+SESSION_STATE_CACHE = session_cache_from_env()
+
+
+logger = logging.getLogger(__name__)
+
+def bedrock_model_factory(model_config):
+    """Build a BedrockModel on the pooled bedrock-runtime client."""
+    return CancellableBedrockModel(
+        boto_session=PooledClientSession("us-east-1"),
+        **model_config
+    )
+
+
+_model_factory = bedrock_model_factory
+
+
+def set_model_factory(factory):
     """
-    Create and return a configured Strands agent instance.
-    
-    Model Examples:
-    - us.amazon.nova-micro-v1:0
-    - us.amazon.nova-premier-v1:0
-    - us.amazon.nova-pro-v1:0
-    - us.anthropic.claude-sonnet-4-20250514-v1:0
-    
+    Replace how models are built, e.g. with a fake model for benchmarks.
+
+    Already pooled resources keep their model, so clear the agent pool after
+    switching factories.
+
+    Args:
+        factory (callable): Takes the Bedrock model config dict and returns a
+            Strands model; None restores bedrock_model_factory
+    """
+    global _model_factory, _summary_model
+    _model_factory = factory or bedrock_model_factory
+    _summary_model = None
+
+
+_summary_model = None
+
+
+def summary_model():
+    """
+    Return the shared model that writes rolling conversation summaries.
+
+    Summaries use SUMMARY_MODEL_ID (default Nova Micro), a small model with
+    no tools, whatever model the conversation itself runs on.
+
+    Returns:
+        Model | None: The summary model, or None when CONVERSATION_SUMMARY
+        is off
+    """
+    global _summary_model
+    if os.getenv("CONVERSATION_SUMMARY", "true").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    if _summary_model is None:
+        _summary_model = _model_factory(model_config(
+            os.getenv("SUMMARY_MODEL_ID", "us.amazon.nova-micro-v1:0"),
+            {"max_tokens": int(os.getenv("SUMMARY_MAX_TOKENS", "512")), "temperature": 0.0},
+        ))
+    return _summary_model
+
+
+@dataclass(frozen=True)
+class AgentResources:
+    """
+    Session-independent pieces of an agent that are safe to share between requests.
+
+    The BedrockModel only holds its config and a boto3 client, and the tool
+    functions are plain module-level callables, so one set of resources can be
+    bound to any number of per-session agents.
+    """
+    model_id: str
+    personality: str
+    system_prompt: str
+    bedrock_model: BedrockModel
+    tools: tuple
+    boto_session: object
+    registry_version: int = 0
+    max_tokens: int = None
+
+
+def model_config(model, overrides=None):
+    """
+    Return the Bedrock model config for a model ID plus personality overrides.
+
     Args:
         model (str): The Bedrock model ID to use
-        personality (str): Either 'basic', 'fomc', 'scotus' for default prompts or custom system prompt
-        
+        overrides (Mapping): Personality model config overrides
+
     Returns:
-        Agent: Configured agent ready for use
+        dict: Config for the model factory
     """
-    
     # Check if this is an Anthropic model that will use thinking
     is_anthropic_model = model.startswith('us.anthropic.') or model.startswith('anthropic.')
     
     # Configure the Bedrock model with Anthropic thinking capabilities
     bedrock_model_config = {
-        "inference_profile": model,
+        "model_id": model,
         "max_tokens": 2000,
        # "top_p": 0.8,
     }
@@ -60,96 +132,155 @@ def create_strands_agent(model = 'us.amazon.nova-micro-v1:0',
     else:
         # Use custom temperature for non-Anthropic models
         bedrock_model_config["temperature"] = 0.3
-    
-    bedrock_model = BedrockModel(**bedrock_model_config)
 
-    # Configure conversation management for production
-    conversation_manager = SlidingWindowConversationManager(
-        window_size=10,  # Limit history size
-    )
+    for key, value in (overrides or {}).items():
+        if key == "temperature" and is_anthropic_model:
+            continue  # thinking pins temperature to 1
+        bedrock_model_config[key] = value
+    return bedrock_model_config
 
-    # Set personality based on input with predefined options
-    predefined_personalities = {
-        'basic': "You are a helpful assistant.",
-        'creative': "You are a creative and imaginative assistant who thinks outside the box.",
-        'analytical': "You are a logical and analytical assistant who provides detailed, structured responses.",
-        'friendly': "You are a warm, friendly, and conversational assistant who uses a casual tone.",
-        'silly': "You are a trickster, you always tell jokes in all your answers and give very silly responses.",
-        'fomc': """You are an expert Federal Reserve and monetary policy analyst. You have access to extensive FOMC meeting minutes, transcripts, and historical data through your fomc_kb_search tool. 
-
-When users ask about Federal Reserve policy, interest rates, economic conditions, or FOMC decisions, use your fomc_kb_search tool to provide accurate, well-sourced information.
-
-Focus on:
-- FOMC meeting outcomes and policy decisions
-- Interest rate changes and rationale
-- Economic outlook and Fed communications
-- Historical context and precedents
-- Market implications of Fed actions
-
-Always cite specific meetings, dates, or sources when available from your knowledge base searches.""",
-        'scotus': """You are an expert legal analyst specializing in Supreme Court of the United States cases and constitutional law. You have access to extensive SCOTUS opinions, decisions, and legal precedents through your scotus_kb_search tool.
-
-When users ask about Supreme Court cases, constitutional law, legal precedents, or court decisions, use your scotus_kb_search tool to provide accurate, well-sourced legal information.
-
-Focus on:
-- Supreme Court case law and precedents
-- Constitutional interpretation and analysis
-- Legal reasoning and judicial opinions
-- Historical context of court decisions
-- Impact and implications of rulings
-
-Always cite specific cases, justices, or court decisions when available from your knowledge base searches. Provide balanced legal analysis while noting when topics involve ongoing legal debates."""
-    }
-    
-    print(f"Received personality parameter: '{personality}'")
-    
-    if personality in predefined_personalities:
-        system_prompt = predefined_personalities[personality]
-        print(f"Using predefined personality: {personality}")
-    else:
-        # Treat as custom system prompt
-        system_prompt = personality
-        print(f"Using custom personality: {system_prompt}")
-
-    # Configure tools based on personality
-    tools = []
-    if personality == 'fomc':
-        tools = [fomc_kb_search]
-        print("Added FOMC knowledge base search tool")
-    elif personality == 'scotus':
-        tools = [scotus_kb_search]
-        print("Added SCOTUS knowledge base search tool")
+
+def build_agent_resources(model = 'us.amazon.nova-micro-v1:0',
+                          personality = 'basic',
+                          prompt_cache = None):
+    """
+    Build the reusable model, prompt, tool and boto resources for an agent.
+
+    Args:
+        model (str): The Bedrock model ID to use
+        personality (str): A personality name from the registry (see
+            personalities.json) or a custom system prompt
+        prompt_cache (bool): Add Bedrock prompt cache checkpoints on models
+            that support them (see prompt_cache.py); None uses PROMPT_CACHE
+
+    Returns:
+        AgentResources: Resources that can be shared by many agents
+    """
+    registry = get_registry()
+    resolved = registry.resolve(personality)
+
+    bedrock_model_config = model_config(model, resolved.model_config)
+    if prompt_cache if prompt_cache is not None else prompt_cache_enabled():
+        bedrock_model_config.update(prompt_cache_config(model, has_tools=bool(resolved.tools)))
+    bedrock_model = _model_factory(bedrock_model_config)
+
+    if resolved.is_custom:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("using custom personality", extra={"system_prompt": truncate(resolved.system_prompt)})
     else:
-        # No tools for basic personalities to keep it simple
-        tools = []
-        print("No tools added for this personality")
-
-    # Create session manager based on whether S3 parameters are provided
-    session_manager = None
-    if session_id and s3_bucket and s3_prefix:
-        print(f"Creating S3SessionManager - Session: {session_id}, Bucket: {s3_bucket}, Prefix: {s3_prefix}")
-        
-        # Create boto3 session for better credential handling
-        boto_session = boto3.Session(region_name="us-east-1")
+        logger.debug("using predefined personality %s with tools %s",
+                     resolved.name, list(resolved.tool_names))
+
+    # Hands the session manager the pooled S3 client
+    boto_session = PooledClientSession("us-east-1")
+
+    return AgentResources(
+        model_id=model,
+        personality=personality,
+        system_prompt=resolved.system_prompt,
+        bedrock_model=bedrock_model,
+        tools=resolved.load_tools(),
+        boto_session=boto_session,
+        registry_version=registry.version,
+        max_tokens=bedrock_model_config.get("max_tokens")
+    )
+
+
+def bind_agent(resources,
+               session_id = None,
+               s3_bucket = None,
+               s3_prefix = None):
+    """
+    Create an agent from shared resources plus the per-session state.
+
+    Only the conversation manager, the session manager and the Agent itself
+    are created here; everything else comes from ``resources``.
+
+    Args:
+        resources (AgentResources): Shared resources from build_agent_resources
+        session_id (str): Session ID used for S3 persistence
+        s3_bucket (str): S3 bucket for session persistence
+        s3_prefix (str): S3 prefix for session persistence
+
+    Returns:
+        Agent: Configured agent ready for use
+    """
+    # Keep as much history as fits the model's token budget and summarize the rest
+    conversation_manager = conversation_manager_for(resources.model_id, resources.max_tokens,
+                                                    summary_model=summary_model())
+
+    # Session manager setup and agent init (which hydrates the history from S3)
+    # make up the session_load phase of a request
+    with request_span("session_load", persisted=bool(session_id and s3_bucket and s3_prefix)):
+        # Create session manager based on whether S3 parameters are provided
+        session_manager = None
+        if session_id and s3_bucket and s3_prefix:
+            logger.debug("creating S3 session manager", extra={"s3_bucket": s3_bucket, "s3_prefix": s3_prefix})
         
-        session_manager = S3SessionManager(
-            session_id=session_id,
-            bucket=s3_bucket,
-            prefix=s3_prefix,
-            boto_session=boto_session,
-            region_name="us-east-1"
+            if os.getenv("S3_SESSION_WRITE_BEHIND", "true").strip().lower() in ("1", "true", "yes", "on"):
+                # Buffer session writes and flush them after the response is done
+                session_manager = WriteBehindS3SessionManager(
+                    session_id=session_id,
+                    bucket=s3_bucket,
+                    prefix=s3_prefix,
+                    region_name="us-east-1",
+                    state_cache=SESSION_STATE_CACHE
+                )
+            else:
+                session_manager = S3SessionManager(
+                    session_id=session_id,
+                    bucket=s3_bucket,
+                    prefix=s3_prefix,
+                    boto_session=resources.boto_session,
+                    region_name="us-east-1"
+                )
+        else:
+            logger.debug("no S3 session persistence for this agent")
+
+        # Create and return the agent
+        strands_agent = Agent(
+            model=resources.bedrock_model,
+            system_prompt=resources.system_prompt,
+            conversation_manager=conversation_manager,
+            session_manager=session_manager,  # Add session manager
+            # Tokens are streamed by the caller; the default handler prints each one to stdout
+            callback_handler=None,
+            # Adding tools is what triggers "Thinking..." in the UI
+            tools=list(resources.tools)
         )
-    else:
-        print("Using default SlidingWindowConversationManager (no S3 session persistence)")
-
-    # Create and return the agent
-    strands_agent = Agent(
-        model=bedrock_model,
-        system_prompt=system_prompt,
-        conversation_manager=conversation_manager,
-        session_manager=session_manager,  # Add session manager
-        # Adding tools is what triggers "Thinking..." in the UI
-        tools=tools
-    )
     
     return strands_agent
+
+
+def create_strands_agent(model = 'us.amazon.nova-micro-v1:0',
+                         personality = 'basic',
+                         session_id = None,
+                         s3_bucket = None,
+                         s3_prefix = None,
+                         prompt_cache = None):
+    """
+    Create and return a configured Strands agent instance.
+    
+    Model Examples:
+    - us.amazon.nova-micro-v1:0
+    - us.amazon.nova-premier-v1:0
+    - us.amazon.nova-pro-v1:0
+    - us.anthropic.claude-sonnet-4-20250514-v1:0
+    
+    Args:
+        model (str): The Bedrock model ID to use
+        personality (str): Either 'basic', 'fomc', 'scotus' for default prompts or custom system prompt
+        prompt_cache (bool): Add Bedrock prompt cache checkpoints after the
+            system prompt, the tools and the history on models that support
+            them; None uses PROMPT_CACHE (default on)
+        
+    Returns:
+        Agent: Configured agent ready for use
+    """
+    resources = build_agent_resources(model=model, personality=personality, prompt_cache=prompt_cache)
+    return bind_agent(
+        resources,
+        session_id=session_id,
+        s3_bucket=s3_bucket,
+        s3_prefix=s3_prefix
+    )
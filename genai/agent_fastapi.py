@@ -1,15 +1,28 @@
+import time
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any
 from datetime import datetime,timezone
 from fastapi.responses import StreamingResponse
-from agent_config import create_strands_agent
+from starlette.background import BackgroundTask
+from agent_pool import AGENT_POOL
+from app_logging import configure_logging
+from session_router import SessionRouterSaturated, router_from_env
+from warmup import start_warm_up
+from cancellation import CANCELLATION_STATS, CancelScope, current_cancel_scope, finish_cancelled
+from model_router import AUTO_MODEL, ROUTER_STATS, apply_route, portable_history, route
+from conversation import RollingSummaryConversationManager, schedule_summary
 
 
+configure_logging()
+
 app = FastAPI(title="Strands Agent Server", version="1.0.0")
 
-# Create agent using shared configuration
-strands_agent = create_strands_agent()
+# Route each session to its own agent from a bounded pool
+session_router = router_from_env()
+
+# Build clients, the registry and warm agent resources off the request path
+start_warm_up()
 
 class InvocationRequest(BaseModel):
     input: Dict[str, Any]
@@ -27,21 +40,90 @@ async def invoke_agent_stream(request: InvocationRequest):
                 detail="No prompt found in input. Please provide a 'prompt' key in the input."
             )
 
+        model = request.input.get("model", "us.amazon.nova-micro-v1:0")
+        personality = request.input.get("personality", "basic")
+        try:
+            lease = await session_router.acquire(
+                session_id=request.input.get("session_id"),
+                model=model,
+                personality=personality
+            )
+        except SessionRouterSaturated as e:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Server is busy, please retry: {str(e)}",
+                headers={"Retry-After": "1"}
+            )
+
+        # Once the stream has started, only the stream releases the lease: on a
+        # disconnect the response's background task can run before the
+        # generator is finalized, and the finalizer still records the turn
+        started_streaming = False
+
         async def generate_stream():
+            nonlocal started_streaming
+            started_streaming = True
+            agent = lease.agent
+            cancel_scope = CancelScope()
+            current_cancel_scope.set(cancel_scope)
+            if isinstance(agent.conversation_manager, RollingSummaryConversationManager):
+                # Session agents live across requests and are never restored,
+                # so the summary written after an earlier turn goes in here
+                agent.conversation_manager.apply_summary(agent)
+            decision = None
+            if model == AUTO_MODEL:
+                # Plain-text responses cannot be reset, so routed requests here are never escalated
+                portable_history(agent.messages)
+                decision = route(user_message, agent.messages, has_tools=bool(agent.tool_names))
+                ROUTER_STATS.record_decision(decision)
+                apply_route(agent, decision.model_id, personality)
+            started = time.perf_counter()
+            ttft_ms = None
+            stream = agent.stream_async(user_message)
+            partial_text = []
+            completed = False
             try:
-                async for event in strands_agent.stream_async(user_message):
+                async for event in stream:
+                    if "message" in event:
+                        partial_text.clear()
                     if "data" in event:
+                        if ttft_ms is None:
+                            ttft_ms = (time.perf_counter() - started) * 1000.0
+                        partial_text.append(event["data"])
                         # Stream the actual agent reasoning and responses
                         yield event["data"]
+                completed = True
             except Exception as e:
+                completed = True
                 yield f"Error: {str(e)}"
+            finally:
+                if completed:
+                    if decision is not None:
+                        ROUTER_STATS.record_response(decision.model_id, ttft_ms,
+                                                     (time.perf_counter() - started) * 1000.0)
+                    # Fold turns that no longer fit the budget into the summary
+                    schedule_summary(agent)
+                    lease.release()
+                else:
+                    # The client disconnected: stop the model and KB calls and
+                    # close the turn before another request can use this agent
+                    cancel_scope.cancel()
+                    finish_cancelled(agent, [stream], "".join(partial_text), on_done=lambda _: lease.release())
+
+        def release_if_never_started():
+            if not started_streaming:
+                lease.release()
 
         return StreamingResponse(
             generate_stream(),
             media_type="text/plain",
-            headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
+            headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
+            # Releases the lease if the client went away before the stream started
+            background=BackgroundTask(release_if_never_started)
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Agent processing failed: {str(e)}")
 
@@ -49,6 +131,15 @@ async def invoke_agent_stream(request: InvocationRequest):
 async def ping():
     return {"status": "healthy"}
 
+@app.get("/stats")
+async def stats():
+    # Imported here so the KB tool stack is only loaded once a KB tool is used
+    from tools.kb_tool import kb_tool_stats
+    from tools.local_index import local_index_stats
+    return {"router": session_router.stats(), "agent_pool": AGENT_POOL.stats(), "kb_tools": kb_tool_stats(),
+            "local_indexes": local_index_stats(), "cancellation": CANCELLATION_STATS.snapshot(),
+            "model_router": ROUTER_STATS.snapshot()}
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8080)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -2,9 +2,11 @@ import boto3
 import os
 import secrets
 import string
+import io
 import json
 from pathlib import Path
 from dotenv import load_dotenv
+from sse import iter_agent_events
 
 # Load environment variables from .env file
 parent_dir = Path(__file__).parent.parent
@@ -57,48 +59,27 @@ try:
     print("✅ Agent invoked successfully!")
     print("📤 Response:")
     
-    # Handle streaming response with proper SSE parsing
+    # Handle streaming response with an incremental SSE decoder on the raw bytes,
+    # so events split across chunks or sharing a chunk are all delivered
     stream = response['response']
-    full_response = ""
+    full_response = io.StringIO()
     
-    for chunk in stream.iter_lines():
-        if chunk:
-            chunk_str = chunk.decode('utf-8')
-            
-            # Parse SSE events - handle concatenated data: events
-            if 'data: ' in chunk_str:
-                # Split by 'data: ' and process each JSON event
-                data_parts = chunk_str.split('data: ')
-                
-                for part in data_parts:
-                    if not part.strip():
-                        continue
-                        
-                    # Clean up the JSON part
-                    json_part = part.split('\n')[0].strip()
-                    if not json_part:
-                        continue
-                        
-                    try:
-                        event_data = json.loads(json_part)
-                        
-                        if event_data.get('type') == 'token' and event_data.get('text'):
-                            text = event_data['text']
-                            full_response += text
-                            print(text, end='', flush=True)
-                        elif event_data.get('type') == 'start':
-                            print("🚀 Agent started...", flush=True)
-                        elif event_data.get('type') == 'done':
-                            print("\n✨ Agent finished!", flush=True)
-                        elif event_data.get('type') == 'error':
-                            print(f"\n❌ Agent error: {event_data.get('message', 'Unknown error')}", flush=True)
-                            
-                    except json.JSONDecodeError:
-                        # Skip malformed JSON
-                        continue
-            else:
-                # Handle non-SSE content
-                print(chunk_str, end='', flush=True)
+    for event in iter_agent_events(stream.iter_chunks()):
+        if event.type == 'token' and event.text:
+            full_response.write(event.text)
+            print(event.text, end='', flush=True)
+        elif event.type == 'start':
+            print("🚀 Agent started...", flush=True)
+        elif event.type == 'done':
+            print("\n✨ Agent finished!", flush=True)
+        elif event.type == 'error':
+            message = event.payload.get('message', 'Unknown error') if isinstance(event.payload, dict) else event.payload
+            print(f"\n❌ Agent error: {message}", flush=True)
+        elif event.type == 'raw':
+            # Handle non-JSON content
+            print(event.payload, end='', flush=True)
+    
+    full_response = full_response.getvalue()
     
     print(f"\n\n🎉 Invocation complete!")
     print(f"📝 Full response length: {len(full_response)} characters")
@@ -0,0 +1,133 @@
+"""
+Process-wide pool of warm agent resources.
+
+Building a BedrockModel, resolving the system prompt, selecting tools and
+creating a boto3 session is the same work for every request that uses the
+same model and personality. This module keeps those resources warm, keyed by
+(model, personality hash, registry version), and only binds the per-session
+state (conversation and session managers) for each request.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from agent_config import build_agent_resources, bind_agent
+from model_router import resolve_model
+from personalities import get_registry
+
+
+class AgentResourcePool:
+    """
+    LRU cache of AgentResources with a size cap and hit/miss counters.
+
+    Args:
+        max_size (int): Maximum number of (model, personality) entries to keep warm
+    """
+
+    def __init__(self, max_size=32):
+        self.max_size = max(1, int(max_size))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model, personality):
+        """
+        Return the pool key for a model and a personality name or custom prompt.
+
+        The personality registry version is part of the key, so entries built
+        before a registry reload are not reused and age out of the LRU.
+        """
+        personality_hash = hashlib.sha256(personality.encode("utf-8")).hexdigest()
+        return (model, personality_hash, get_registry().version)
+
+    def get(self, model, personality):
+        """
+        Return warm resources for (model, personality), building them on a miss.
+
+        Args:
+            model (str): The Bedrock model ID
+            personality (str): Predefined personality name or custom system prompt
+
+        Returns:
+            AgentResources: Shared resources for this model and personality
+        """
+        key = self.make_key(model, personality)
+        with self._lock:
+            resources = self._entries.get(key)
+            if resources is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return resources
+            self.misses += 1
+
+        # Build outside the lock so a slow miss does not block warm hits
+        resources = build_agent_resources(model=model, personality=personality)
+
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                # Another request built the same entry concurrently; keep the first
+                self._entries.move_to_end(key)
+                return existing
+            self._entries[key] = resources
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return resources
+
+    def clear(self):
+        """Drop all warm entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """Return a snapshot of the pool counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Process-wide pool shared by every entrypoint in this container
+AGENT_POOL = AgentResourcePool(max_size=int(os.getenv("AGENT_POOL_SIZE", "32")))
+
+
+def get_pooled_agent(model = 'us.amazon.nova-micro-v1:0',
+                     personality = 'basic',
+                     session_id = None,
+                     s3_bucket = None,
+                     s3_prefix = None):
+    """
+    Drop-in replacement for create_strands_agent that reuses warm resources.
+
+    Args:
+        model (str): The Bedrock model ID to use; ``auto`` builds the agent on
+            the cheapest routing tier (see model_router)
+        personality (str): Either 'basic', 'fomc', 'scotus' for default prompts or custom system prompt
+        session_id (str): Session ID used for S3 persistence
+        s3_bucket (str): S3 bucket for session persistence
+        s3_prefix (str): S3 prefix for session persistence
+
+    Returns:
+        Agent: Configured agent bound to this session
+    """
+    resources = AGENT_POOL.get(resolve_model(model), personality)
+    return bind_agent(
+        resources,
+        session_id=session_id,
+        s3_bucket=s3_bucket,
+        s3_prefix=s3_prefix
+    )
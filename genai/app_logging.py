@@ -0,0 +1,242 @@
+"""
+Leveled, structured logging that keeps I/O off the request path.
+
+``configure_logging()`` installs a single queue-based handler on the root
+logger. Callers only build a LogRecord and put it on a bounded queue; a
+background QueueListener thread formats it and writes it to stdout. When a
+record's level is below LOG_LEVEL the logger returns before a record is
+created, so disabled hot-path logging costs one level check.
+
+Each line is a JSON object (LOG_FORMAT=json, the default) or a plain text
+line (LOG_FORMAT=text). Request fields (request_id, session_id, model,
+personality) are added from the current RequestMetrics, and any ``extra``
+keys passed to the logging call become fields of the line.
+
+Repeated messages are rate limited per (logger, message template): at most
+LOG_RATE_LIMIT records per LOG_RATE_WINDOW_SECONDS are queued and the next
+record after a window reports how many were suppressed; pass
+``extra={"_rate_limit": False}`` for records that must never be dropped
+this way (e.g. the per-request metrics line). If the queue is
+full (LOG_QUEUE_SIZE) records are dropped rather than blocking the request.
+
+Environment:
+    LOG_LEVEL: Root log level (default INFO)
+    LOG_FORMAT: json or text (default json)
+    LOG_RATE_LIMIT: Records per message template per window, 0 disables (default 20)
+    LOG_RATE_WINDOW_SECONDS: Rate-limit window (default 10)
+    LOG_QUEUE_SIZE: Maximum queued records (default 10000)
+    LOG_PROMPT_CHARS: Prompt characters kept by truncate() (default 120)
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from request_metrics import current_request
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# Request attributes copied onto every record logged during a request
+_REQUEST_FIELDS = ("session_id", "model", "personality")
+
+_listener = None
+_handler = None
+_output = None
+_configure_lock = threading.Lock()
+
+
+def truncate(text, limit=None):
+    """
+    Shorten a (possibly large) prompt for logging.
+
+    Args:
+        text (str): Text to shorten
+        limit (int): Characters to keep; defaults to LOG_PROMPT_CHARS
+
+    Returns:
+        str: The text if short enough, otherwise its first ``limit``
+        characters plus its length and a short digest so equal prompts can
+        still be correlated
+    """
+    if text is None:
+        return None
+    text = str(text)
+    if limit is None:
+        limit = int(os.getenv("LOG_PROMPT_CHARS", "120"))
+    if len(text) <= limit:
+        return text
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+    return f"{text[:limit]}... [{len(text)} chars, sha256:{digest}]"
+
+
+class RequestContextFilter(logging.Filter):
+    """Add the current request's id and attributes to each record."""
+
+    def filter(self, record):
+        metrics = current_request.get()
+        if metrics is not None:
+            if not hasattr(record, "request_id"):
+                record.request_id = metrics.request_id
+            for key in _REQUEST_FIELDS:
+                if key in metrics.attributes and not hasattr(record, key):
+                    setattr(record, key, metrics.attributes[key])
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Drop repeats of the same message template beyond a per-window budget.
+
+    Args:
+        limit (int): Records allowed per template per window
+        window_seconds (float): Window length
+    """
+
+    def __init__(self, limit=20, window_seconds=10.0):
+        super().__init__()
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.limit <= 0 or not getattr(record, "_rate_limit", True):
+            return True
+        key = (record.name, record.levelno, record.msg if isinstance(record.msg, str) else type(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.window_seconds:
+                suppressed = window[2] if window else 0
+                if len(self._windows) > 10000:
+                    self._windows.clear()
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < self.limit:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks and defers formatting to the listener.
+
+    The stock handler formats the message in the calling thread; here the
+    record is queued as is and formatted by the listener thread, so logging
+    arguments must not be mutated after the call.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as one JSON object with its structured fields."""
+
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Format a record as text, appending its structured fields as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = [f"{k}={v}" for k, v in record.__dict__.items() if k not in _RESERVED and not k.startswith("_")]
+        return f"{line} {' '.join(fields)}" if fields else line
+
+
+def configure_logging(level=None, fmt=None, stream=None):
+    """
+    Route all logging through a background queue listener.
+
+    Safe to call more than once; only the first call installs the handler.
+
+    Args:
+        level (str | int): Root level; defaults to LOG_LEVEL
+        fmt (str): "json" or "text"; defaults to LOG_FORMAT
+        stream: Output stream for the listener (default sys.stdout)
+
+    Returns:
+        DroppingQueueHandler: The installed handler
+    """
+    global _listener, _handler, _output
+    with _configure_lock:
+        if _handler is not None:
+            return _handler
+
+        level = level or os.getenv("LOG_LEVEL", "INFO").upper()
+        fmt = (fmt or os.getenv("LOG_FORMAT", "json")).lower()
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+
+        log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        handler = DroppingQueueHandler(log_queue)
+        handler.addFilter(RateLimitFilter(
+            limit=int(os.getenv("LOG_RATE_LIMIT", "20")),
+            window_seconds=float(os.getenv("LOG_RATE_WINDOW_SECONDS", "10"))
+        ))
+        handler.addFilter(RequestContextFilter())
+
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+        _listener.start()
+        _handler = handler
+        _output = output
+        atexit.register(shutdown_logging)
+        return handler
+
+
+def shutdown_logging():
+    """
+    Stop the listener thread after writing any queued records.
+
+    Later records (e.g. from other atexit hooks) are written directly.
+    """
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            logging.getLogger().handlers = [_output]
@@ -0,0 +1,156 @@
+"""
+Process-wide boto3 session and client factory.
+
+Creating a boto3 Session resolves credentials, and creating a client builds a
+new connection pool, so doing either per request repeats credential lookups
+and TLS handshakes. Everything in this package should get its AWS clients from
+here so they share one session and one pooled client per (service, region).
+
+Tuning (environment variables):
+    AWS_REGION                  Default region (us-east-1)
+    AWS_MAX_POOL_CONNECTIONS    Connections kept per client pool (50)
+    AWS_TCP_KEEPALIVE           Enable TCP keep-alive on pooled sockets (true)
+    AWS_CONNECT_TIMEOUT         Connect timeout in seconds (5)
+    AWS_READ_TIMEOUT            Read timeout in seconds (120)
+    AWS_RETRY_MODE              botocore retry mode: standard, adaptive or legacy (standard)
+    AWS_MAX_ATTEMPTS            Total attempts including the first call (3)
+
+For tests, point a service at a local stub with the standard botocore
+``AWS_ENDPOINT_URL_<SERVICE>`` variables (e.g. AWS_ENDPOINT_URL_BEDROCK_AGENT_RUNTIME),
+pass ``endpoint_url`` to get_client, or install a fake with register_client.
+"""
+
+import os
+import threading
+import boto3
+from botocore.config import Config
+
+DEFAULT_REGION = os.getenv("AWS_REGION", "us-east-1")
+
+_lock = threading.Lock()
+_sessions = {}
+_clients = {}
+
+
+def _env_bool(name, default):
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def client_config(**overrides):
+    """
+    Build the shared botocore Config for pooled clients.
+
+    Args:
+        **overrides: Keyword arguments passed through to botocore.config.Config
+
+    Returns:
+        Config: Connection pool, keep-alive, timeout and retry configuration
+    """
+    settings = {
+        "max_pool_connections": int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50")),
+        "tcp_keepalive": _env_bool("AWS_TCP_KEEPALIVE", True),
+        "connect_timeout": float(os.getenv("AWS_CONNECT_TIMEOUT", "5")),
+        "read_timeout": float(os.getenv("AWS_READ_TIMEOUT", "120")),
+        "retries": {
+            "mode": os.getenv("AWS_RETRY_MODE", "standard"),
+            "max_attempts": int(os.getenv("AWS_MAX_ATTEMPTS", "3")),
+        },
+    }
+    settings.update(overrides)
+    return Config(**settings)
+
+
+def get_boto_session(region_name=DEFAULT_REGION):
+    """
+    Return the shared boto3 Session for a region, creating it once.
+
+    Args:
+        region_name (str): AWS region
+
+    Returns:
+        boto3.Session: Session shared by every caller in this process
+    """
+    session = _sessions.get(region_name)
+    if session is None:
+        with _lock:
+            session = _sessions.get(region_name)
+            if session is None:
+                session = boto3.Session(region_name=region_name)
+                _sessions[region_name] = session
+    return session
+
+
+def get_client(service_name, region_name=DEFAULT_REGION, endpoint_url=None):
+    """
+    Return the pooled client for a service and region, creating it once.
+
+    boto3 clients are thread-safe once created, so the same client is shared
+    by every request and tool call in the process.
+
+    Args:
+        service_name (str): boto3 service name, e.g. 'bedrock-agent-runtime'
+        region_name (str): AWS region
+        endpoint_url (str): Optional endpoint override, e.g. a local stub server
+
+    Returns:
+        botocore.client.BaseClient: Shared client
+    """
+    key = (service_name, region_name, endpoint_url)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                # Session.client is not thread-safe, so creation stays under the lock
+                session = _sessions.get(region_name) or boto3.Session(region_name=region_name)
+                _sessions.setdefault(region_name, session)
+                client = session.client(
+                    service_name,
+                    region_name=region_name,
+                    endpoint_url=endpoint_url,
+                    config=client_config(),
+                )
+                _clients[key] = client
+    return client
+
+
+class PooledClientSession:
+    """
+    Stand-in for a boto3 Session that hands out the pooled clients.
+
+    Strands' BedrockModel and S3SessionManager take a ``boto_session`` and
+    call ``session.client(...)`` themselves. On the shared Session that would
+    create a client outside the lock, and a new connection pool per model.
+    Given this object instead, they get the pooled client from get_client.
+
+    Args:
+        region_name (str): AWS region of the clients
+    """
+
+    def __init__(self, region_name=DEFAULT_REGION):
+        self.region_name = region_name
+
+    def client(self, service_name, region_name=None, endpoint_url=None, **kwargs):
+        """Return the pooled client; ``config`` and other options are the pool's."""
+        return get_client(service_name, region_name or self.region_name, endpoint_url)
+
+
+def register_client(service_name, client, region_name=DEFAULT_REGION, endpoint_url=None):
+    """
+    Install a prebuilt or fake client for a service (tests, benchmarks).
+
+    Args:
+        service_name (str): boto3 service name
+        client: Object implementing the client methods that will be called
+        region_name (str): AWS region the client is registered under
+        endpoint_url (str): Endpoint override the client is registered under
+    """
+    with _lock:
+        _clients[(service_name, region_name, endpoint_url)] = client
+
+
+def reset_clients():
+    """Forget all shared sessions and clients so the next call rebuilds them."""
+    with _lock:
+        _clients.clear()
+        _sessions.clear()
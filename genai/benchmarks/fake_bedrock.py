@@ -0,0 +1,178 @@
+# fake_bedrock.py
+
+"""
+Deterministic stand-ins for Bedrock used by the benchmarks.
+
+- FakeBedrockModel streams a fixed number of tokens at a configurable rate
+  after a configurable time-to-first-token, and can make one KB tool call
+  per turn so tool latency shows up in the measurements.
+- FakeKnowledgeBaseClient answers bedrock-agent-runtime retrieve() calls
+  with deterministic results after an injected delay.
+
+install_fakes() wires both, plus an InMemoryS3Client with injected latency,
+into agent_config and aws_clients.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import time
+import types
+import typing
+from typing import Any
+from pydantic import BaseModel
+from strands.models import Model
+
+import agent_config
+import aws_clients
+from agent_pool import AGENT_POOL
+from benchmarks.fake_s3 import InMemoryS3Client
+
+
+_PLACEHOLDERS = {str: "fake", int: 0, float: 0.0, bool: False}
+
+
+def placeholder_value(annotation):
+    """Return a value that validates as ``annotation`` (for fake structured output)."""
+    if annotation in _PLACEHOLDERS:
+        return _PLACEHOLDERS[annotation]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return placeholder_fields(annotation)
+    origin, args = typing.get_origin(annotation), typing.get_args(annotation)
+    if origin is typing.Literal:
+        return args[0]
+    if origin in (typing.Union, types.UnionType):
+        if type(None) in args:
+            return None
+        return placeholder_value(args[0])
+    if origin in (list, tuple, set, frozenset):
+        return []
+    if origin is dict:
+        return {}
+    return None
+
+
+def placeholder_fields(output_model):
+    """Return placeholder values for the required fields of a pydantic model."""
+    return {name: placeholder_value(info.annotation)
+            for name, info in output_model.model_fields.items() if info.is_required()}
+
+
+class FakeBedrockModel(Model):
+    """
+    Strands model that streams synthetic tokens.
+
+    Args:
+        ttft_ms (float): Delay before the first token
+        tokens_per_second (float): Streaming rate after the first token
+        response_tokens (int): Tokens per answer
+        jitter (float): Relative random variation of each inter-token delay
+        use_tools (bool): Call the first available tool once per user turn
+        model_config (dict): Config passed by agent_config (kept for get_config)
+    """
+
+    def __init__(self, ttft_ms=300.0, tokens_per_second=80.0, response_tokens=200, jitter=0.1,
+                 use_tools=True, model_config=None):
+        self.ttft_ms = ttft_ms
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.jitter = jitter
+        self.use_tools = use_tools
+        self.config = dict(model_config or {})
+
+    def update_config(self, **model_config: Any) -> None:
+        self.config.update(model_config)
+
+    def get_config(self) -> Any:
+        return self.config
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs: Any):
+        """Yield an instance of output_model with placeholder values for its required fields."""
+        await asyncio.sleep(self.ttft_ms / 1000.0)
+        yield {"output": output_model(**placeholder_fields(output_model))}
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs: Any):
+        last = messages[-1] if messages else {"content": []}
+        prompt = " ".join(block.get("text", "") for block in last.get("content", []) if "text" in block)
+        seed = int.from_bytes(hashlib.sha256(f"{len(messages)}:{prompt}".encode()).digest()[:8], "little")
+        rng = random.Random(seed)
+        answered_tool = any("toolResult" in block for block in last.get("content", []))
+
+        await asyncio.sleep(self.ttft_ms / 1000.0)
+        yield {"messageStart": {"role": "assistant"}}
+
+        if self.use_tools and tool_specs and not answered_tool:
+            spec = tool_specs[0]
+            yield {"contentBlockStart": {"start": {"toolUse": {"toolUseId": f"tool-{seed:x}", "name": spec["name"]}}}}
+            yield {"contentBlockDelta": {"delta": {"toolUse": {"input": json.dumps({"text": prompt or "query"})}}}}
+            yield {"contentBlockStop": {}}
+            yield {"messageStop": {"stopReason": "tool_use"}}
+            yield {"metadata": {"usage": {"inputTokens": 100, "outputTokens": 20, "totalTokens": 120},
+                                "metrics": {"latencyMs": int(self.ttft_ms)}}}
+            return
+
+        yield {"contentBlockStart": {"start": {}}}
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        for i in range(self.response_tokens):
+            yield {"contentBlockDelta": {"delta": {"text": f"tok{i} "}}}
+            if delay:
+                await asyncio.sleep(delay * (1.0 + rng.uniform(-self.jitter, self.jitter)))
+        yield {"contentBlockStop": {}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+        yield {"metadata": {"usage": {"inputTokens": 100, "outputTokens": self.response_tokens,
+                                      "totalTokens": 100 + self.response_tokens},
+                            "metrics": {"latencyMs": int(self.ttft_ms)}}}
+
+
+class FakeKnowledgeBaseClient:
+    """
+    bedrock-agent-runtime stand-in with deterministic results and injected latency.
+
+    Args:
+        latency_ms (float): Delay added to every retrieve() call
+        results (int): Results returned per call (before score filtering)
+    """
+
+    def __init__(self, latency_ms=150.0, results=5):
+        self.latency_ms = latency_ms
+        self.results = results
+        self.calls = 0
+
+    def retrieve(self, knowledgeBaseId, retrievalQuery, retrievalConfiguration, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency_ms / 1000.0)
+        text = retrievalQuery["text"]
+        limit = retrievalConfiguration["vectorSearchConfiguration"].get("numberOfResults", self.results)
+        return {
+            "retrievalResults": [
+                {
+                    "content": {"text": f"Passage {i} about {text} from {knowledgeBaseId}. " * 8},
+                    "location": {"type": "S3", "s3Location": {"uri": f"s3://{knowledgeBaseId.lower()}/doc-{i}.txt"}},
+                    "score": round(0.9 - 0.1 * i, 3),
+                    "metadata": {"x-amz-bedrock-kb-chunk-id": f"{knowledgeBaseId}-{i}"},
+                }
+                for i in range(min(limit, self.results))
+            ]
+        }
+
+
+def install_fakes(ttft_ms=300.0, tokens_per_second=80.0, response_tokens=200, jitter=0.1, use_tools=True,
+                  kb_latency_ms=150.0, s3_latency_ms=20.0):
+    """
+    Route model, KB and S3 traffic in this process to the fakes.
+
+    Returns:
+        dict: The installed fakes ('kb' and 's3') for inspecting call counts
+    """
+    agent_config.set_model_factory(lambda model_config: FakeBedrockModel(
+        ttft_ms=ttft_ms, tokens_per_second=tokens_per_second, response_tokens=response_tokens,
+        jitter=jitter, use_tools=use_tools, model_config=model_config,
+    ))
+    AGENT_POOL.clear()
+
+    kb_client = FakeKnowledgeBaseClient(latency_ms=kb_latency_ms)
+    s3_client = InMemoryS3Client(latency_seconds=s3_latency_ms / 1000.0)
+    aws_clients.register_client("bedrock-agent-runtime", kb_client)
+    aws_clients.register_client("s3", s3_client)
+    return {"kb": kb_client, "s3": s3_client}
@@ -0,0 +1,87 @@
+# fake_s3.py
+
+"""
+In-memory stand-in for the S3 client, used by the benchmarks and tests.
+"""
+
+import threading
+from botocore.exceptions import ClientError
+
+
+class InMemoryS3Client:
+    """
+    Minimal in-memory stand-in for the S3 client calls used by the session managers.
+
+    Optionally sleeps to simulate S3 latency.
+
+    Args:
+        latency_seconds (float): Delay added to every call
+    """
+
+    def __init__(self, latency_seconds=0.0):
+        self.objects = {}
+        self.latency_seconds = latency_seconds
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency_seconds:
+            threading.Event().wait(self.latency_seconds)
+
+    @staticmethod
+    def _missing(operation, code):
+        return ClientError({"Error": {"Code": code, "Message": "Not Found"}}, operation)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._call("put_object")
+        body = Body.encode("utf-8") if isinstance(Body, str) else bytes(Body)
+        etag = f'"{hash(body) & 0xFFFFFFFFFFFF:x}"'
+        with self._lock:
+            self.objects[(Bucket, Key)] = (body, etag)
+        return {"ETag": etag}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._call("get_object")
+        with self._lock:
+            item = self.objects.get((Bucket, Key))
+        if item is None:
+            raise self._missing("GetObject", "NoSuchKey")
+        body, etag = item
+
+        class _Body:
+            def read(self_inner):
+                return body
+
+        return {"Body": _Body(), "ETag": etag}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._call("head_object")
+        with self._lock:
+            item = self.objects.get((Bucket, Key))
+        if item is None:
+            raise self._missing("HeadObject", "404")
+        return {"ETag": item[1], "ContentLength": len(item[0])}
+
+    def list_objects_v2(self, Bucket, Prefix="", **kwargs):
+        self._call("list_objects_v2")
+        with self._lock:
+            keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix))
+        return {"Contents": [{"Key": k} for k in keys]} if keys else {}
+
+    def get_paginator(self, operation_name):
+        client = self
+
+        class _Paginator:
+            def paginate(self_inner, **kwargs):
+                yield getattr(client, operation_name)(**kwargs)
+
+        return _Paginator()
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        self._call("delete_objects")
+        with self._lock:
+            for obj in Delete.get("Objects", []):
+                self.objects.pop((Bucket, obj["Key"]), None)
+        return {}
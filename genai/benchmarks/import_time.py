@@ -0,0 +1,121 @@
+# import_time.py
+
+"""
+Import-time budget check for the container entry point.
+
+AgentCore scales out by starting new containers, so the time it takes to
+import the app module is latency the first request of every container pays.
+This script imports the module (``agent`` by default) in fresh interpreters
+with ``python -X importtime``, prints the cumulative time of the heaviest
+import subtrees and modules, and exits with status 1 when the median total
+exceeds the budget or a module that should only load on demand (the KB
+search stack, NumPy, strands_tools) was imported at start-up.
+
+The warm-up thread is disabled (WARMUP=false) while measuring, because it
+deliberately imports tools in the background.
+
+Usage (from genai/):
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 600 --runs 5 --top 20
+    python -m benchmarks.import_time --module agent_fastapi --forbid ""
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "800"))
+
+# Modules that must only be imported when a personality needs them
+DEFAULT_FORBIDDEN = "strands_tools,numpy,tools.kb_retrieve,tools.kb_tool"
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        list: (module, depth, self_us, cumulative_us) tuples in output order
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(module, cwd):
+    """Import ``module`` in a fresh interpreter and return the parsed timings."""
+    env = {**os.environ, "WARMUP": "false"}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"importing {module} failed:\n{completed.stderr[-2000:]}")
+    return parse_importtime(completed.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="agent", help="module to import")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="fail when the median import time exceeds this (IMPORT_TIME_BUDGET_MS)")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to measure")
+    parser.add_argument("--top", type=int, default=15, help="rows to print per table")
+    parser.add_argument("--forbid", default=DEFAULT_FORBIDDEN,
+                        help="comma-separated modules that must not be imported at start-up")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = [measure(args.module, cwd) for _ in range(max(1, args.runs))]
+    totals = [next(row[3] for row in rows if row[1] == 0 and row[0] == args.module) / 1000.0 for rows in runs]
+    median_ms = statistics.median(totals)
+    # Breakdown from the run closest to the median
+    rows = runs[min(range(len(runs)), key=lambda i: abs(totals[i] - median_ms))]
+
+    subtrees = sorted((row for row in rows if row[1] <= 2 and row[0] != args.module),
+                      key=lambda row: row[3], reverse=True)[:args.top]
+    print(f"{'cumulative ms':>13}  import subtree (depth <= 2)")
+    for name, depth, _, cumulative_us in subtrees:
+        print(f"{cumulative_us / 1000.0:>13.1f}  {'  ' * depth}{name}")
+
+    heaviest = sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]
+    print(f"\n{'self ms':>13}  module")
+    for name, _, self_us, _ in heaviest:
+        print(f"{self_us / 1000.0:>13.1f}  {name}")
+
+    imported = {row[0] for row in rows}
+    forbidden = [name for name in (m.strip() for m in args.forbid.split(",")) if name and name in imported]
+
+    print(f"\n{args.module}: median {median_ms:.1f} ms over {len(totals)} runs "
+          f"(min {min(totals):.1f}, max {max(totals):.1f}), budget {args.budget_ms:.0f} ms, "
+          f"{len(imported)} modules")
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"import time {median_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    if forbidden:
+        failures.append(f"imported at start-up: {', '.join(forbidden)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "module": args.module, "budget_ms": args.budget_ms, "totals_ms": totals,
+                "median_ms": median_ms, "modules": len(imported), "forbidden_imported": forbidden,
+                "subtrees": [{"module": r[0], "depth": r[1], "cumulative_ms": r[3] / 1000.0} for r in subtrees],
+            }, f, indent=2)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# load.py
+
+"""
+Load and latency benchmark for the agent entrypoints.
+
+Drives agent.agent_invocation (in-process) or the FastAPI /invocations
+endpoint (uvicorn in a background thread, or an external --url) with N
+concurrent simulated sessions of several turns each. Bedrock, the KB tools
+and S3 session storage are replaced by deterministic fakes with configurable
+latency (see fake_bedrock.py), so results only depend on this code base.
+
+Reports time-to-first-token, inter-token latency (time between received
+frames), tokens/sec and end-to-end latency as p50/p95/p99 per personality.
+
+Usage (from genai/):
+    python -m benchmarks.load --sessions 20 --turns 3
+    python -m benchmarks.load --target fastapi --sessions 50 --personalities basic,fomc
+    python -m benchmarks.load --kb-latency-ms 400 --s3-latency-ms 50 --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+
+from app_logging import configure_logging
+from benchmarks.fake_bedrock import install_fakes
+
+
+@dataclass
+class RequestSample:
+    personality: str
+    ttft: float = None
+    gaps: list = field(default_factory=list)
+    tokens: int = 0
+    total: float = 0.0
+    error: str = None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered) + 0.5 - 1e-9)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def count_tokens(text):
+    # The fake model emits one whitespace-separated word per token
+    return len(text.split())
+
+
+async def agentcore_turn(payload):
+    import agent
+
+    sample = RequestSample(payload["personality"])
+    start = last = time.perf_counter()
+    async for event in agent.agent_invocation(payload):
+        now = time.perf_counter()
+        if event.get("type") == "token":
+            if sample.ttft is None:
+                sample.ttft = now - start
+            else:
+                sample.gaps.append(now - last)
+            last = now
+            sample.tokens += count_tokens(event["text"])
+        elif event.get("type") == "error":
+            sample.error = event.get("message")
+    sample.total = time.perf_counter() - start
+    return sample
+
+
+async def fastapi_turn(client, url, payload):
+    sample = RequestSample(payload["personality"])
+    start = last = time.perf_counter()
+    async with client.stream("POST", url, json={"input": payload}) as response:
+        if response.status_code != 200:
+            sample.error = f"HTTP {response.status_code}"
+        async for chunk in response.aiter_text():
+            now = time.perf_counter()
+            if sample.ttft is None:
+                sample.ttft = now - start
+            else:
+                sample.gaps.append(now - last)
+            last = now
+            sample.tokens += count_tokens(chunk)
+    sample.total = time.perf_counter() - start
+    return sample
+
+
+def start_fastapi_server():
+    """Run agent_fastapi under uvicorn in a daemon thread and return its URL."""
+    import uvicorn
+    import agent_fastapi
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(agent_fastapi.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/invocations"
+
+
+async def run_benchmark(args):
+    personalities = [p.strip() for p in args.personalities.split(",") if p.strip()]
+    client = None
+    url = args.url
+    if args.target == "fastapi":
+        import httpx
+        url = url or start_fastapi_server()
+        client = httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=args.sessions))
+
+    async def session(index):
+        personality = personalities[index % len(personalities)]
+        samples = []
+        for turn in range(args.turns):
+            payload = {
+                "prompt": f"Benchmark question {turn} from session {index} about {personality}",
+                "model": args.model,
+                "personality": personality,
+                "session_id": f"bench-session{index}",
+            }
+            if not args.no_s3:
+                payload["s3sessionbucket"] = "benchmark-bucket"
+            if args.no_coalesce:
+                payload["coalesce"] = False
+            try:
+                if args.target == "fastapi":
+                    samples.append(await fastapi_turn(client, url, payload))
+                else:
+                    samples.append(await agentcore_turn(payload))
+            except Exception as e:
+                samples.append(RequestSample(personality, error=str(e)))
+        return samples
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(session(i) for i in range(args.sessions)))
+    wall = time.perf_counter() - started
+    if client is not None:
+        await client.aclose()
+    return [sample for samples in results for sample in samples], wall
+
+
+def summarize(samples, wall):
+    """Aggregate samples into per-personality latency statistics."""
+    def dist(values):
+        return {f"p{p}": percentile(values, p) for p in (50, 95, 99)}
+
+    summary = {"wall_seconds": wall, "requests": len(samples), "personalities": {}}
+    for personality in sorted({s.personality for s in samples}):
+        group = [s for s in samples if s.personality == personality]
+        ok = [s for s in group if not s.error and s.ttft is not None]
+        rates = [s.tokens / (s.total - s.ttft) for s in ok if s.total > s.ttft]
+        summary["personalities"][personality] = {
+            "requests": len(group),
+            "errors": len(group) - len(ok),
+            "ttft": dist([s.ttft for s in ok]),
+            "inter_token": dist([g for s in ok for g in s.gaps]),
+            "total": dist([s.total for s in ok]),
+            "tokens_per_sec": dist(rates),
+        }
+    return summary
+
+
+def print_summary(summary):
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:8.1f}"
+
+    print(f"\n{summary['requests']} requests in {summary['wall_seconds']:.2f}s")
+    header = f"{'personality':<12}{'reqs':>6}{'errs':>6}  {'metric':<14}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    for personality, stats in summary["personalities"].items():
+        first = True
+        for metric, label in (("ttft", "ttft ms"), ("inter_token", "itl ms"), ("total", "total ms")):
+            prefix = f"{personality:<12}{stats['requests']:>6}{stats['errors']:>6}" if first else " " * 24
+            d = stats[metric]
+            print(f"{prefix}  {label:<14}{ms(d['p50'])} {ms(d['p95'])} {ms(d['p99'])}")
+            first = False
+        rate = stats["tokens_per_sec"]
+        fmt = lambda v: "-" if v is None else f"{v:8.1f}"
+        print(f"{' ' * 24}  {'tokens/sec':<14}{fmt(rate['p50'])} {fmt(rate['p95'])} {fmt(rate['p99'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("agentcore", "fastapi"), default="agentcore")
+    parser.add_argument("--url", help="External FastAPI /invocations URL (fakes are not installed there)")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent simulated sessions")
+    parser.add_argument("--turns", type=int, default=3, help="Sequential turns per session")
+    parser.add_argument("--personalities", default="basic,fomc,scotus")
+    parser.add_argument("--model", default="us.amazon.nova-micro-v1:0")
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--response-tokens", type=int, default=200)
+    parser.add_argument("--kb-latency-ms", type=float, default=150.0)
+    parser.add_argument("--s3-latency-ms", type=float, default=20.0)
+    parser.add_argument("--no-tools", action="store_true", help="Never call KB tools from the fake model")
+    parser.add_argument("--no-s3", action="store_true", help="Run without S3 session persistence")
+    parser.add_argument("--no-coalesce", action="store_true", help="Disable token coalescing per request")
+    parser.add_argument("--json", help="Write the summary to this file")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Log every request (LOG_LEVEL=INFO); by default only warnings and errors are logged")
+    args = parser.parse_args()
+
+    # Installed before the agent modules are imported, whose own call is then a no-op
+    configure_logging(level="INFO" if args.verbose else "WARNING")
+
+    if not args.url:
+        install_fakes(
+            ttft_ms=args.ttft_ms, tokens_per_second=args.tokens_per_second,
+            response_tokens=args.response_tokens, use_tools=not args.no_tools,
+            kb_latency_ms=args.kb_latency_ms, s3_latency_ms=args.s3_latency_ms,
+        )
+
+    samples, wall = asyncio.run(run_benchmark(args))
+
+    summary = summarize(samples, wall)
+    print_summary(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
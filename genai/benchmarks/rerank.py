@@ -0,0 +1,100 @@
+# rerank.py
+
+"""
+Micro-benchmark for the local KB reranking stage (tools/kb_rerank.py).
+
+Builds synthetic retrieval results (chunks of --words words drawn from a
+Zipf-like vocabulary, with query terms sprinkled in at varying rates) and
+times rerank_results per call, with the NumPy BM25 path and with the pure
+Python fallback. Reports p50/p95/p99 microseconds per call for each result
+count.
+
+Usage (from genai/):
+    python -m benchmarks.rerank
+    python -m benchmarks.rerank --results 5,10,25 --words 300 --iterations 2000
+"""
+
+import argparse
+import json
+import random
+import time
+
+from benchmarks.load import percentile
+from tools import kb_rerank
+
+QUERY = "What did the Committee decide about the federal funds rate and inflation expectations?"
+
+
+def make_results(count, words, rng):
+    """Create ``count`` fake retrieval results of ``words`` words each."""
+    vocabulary = [f"term{i}" for i in range(5000)]
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    query_words = ["committee", "federal", "funds", "rate", "inflation", "expectations"]
+    results = []
+    for i in range(count):
+        text = rng.choices(vocabulary, weights=weights, k=words)
+        # Earlier results mention the query terms more often
+        for _ in range(max(0, 12 - 2 * i)):
+            text[rng.randrange(words)] = rng.choice(query_words)
+        results.append({
+            "content": {"text": " ".join(text)},
+            "location": {"s3Location": {"uri": f"s3://bench/doc-{i}.pdf"}},
+            "score": round(rng.uniform(0.4, 0.9), 4),
+        })
+    results.sort(key=lambda r: r["score"], reverse=True)
+    return results
+
+
+def time_rerank(results, iterations):
+    """Return per-call durations in microseconds."""
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        kb_rerank.rerank_results(results, [QUERY])
+        durations.append((time.perf_counter() - start) * 1e6)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", default="5,10,25", help="comma-separated result counts per call")
+    parser.add_argument("--words", type=int, default=300, help="words per chunk")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    numpy_module = kb_rerank.np
+    backends = [("numpy", numpy_module), ("python", None)] if numpy_module is not None else [("python", None)]
+
+    rows = []
+    print(f"{'backend':<8} {'results':>7} {'kept':>5} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9}")
+    for count in [int(c) for c in args.results.split(",") if c]:
+        results = make_results(count, args.words, rng)
+        for backend, module in backends:
+            kb_rerank.np = module
+            try:
+                kept, _ = kb_rerank.rerank_results(results, [QUERY])
+                time_rerank(results, min(100, args.iterations))  # warm up
+                durations = time_rerank(results, args.iterations)
+            finally:
+                kb_rerank.np = numpy_module
+            row = {
+                "backend": backend,
+                "results": count,
+                "kept": len(kept),
+                "p50_us": percentile(durations, 50),
+                "p95_us": percentile(durations, 95),
+                "p99_us": percentile(durations, 99),
+            }
+            rows.append(row)
+            print(f"{backend:<8} {count:>7} {row['kept']:>5} {row['p50_us']:>9.1f} {row['p95_us']:>9.1f} {row['p99_us']:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"words": args.words, "iterations": args.iterations, "rows": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
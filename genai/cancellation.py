@@ -0,0 +1,288 @@
+"""
+Cancellation of requests whose client went away.
+
+When the React client closes the stream or the user hits stop, the server
+cancels the task that streams the response (CancelledError) or closes the
+response generator (GeneratorExit). Without help the rest of the request
+keeps going: BedrockModel reads the model stream on a worker thread until the
+model finishes, and queued KB retrievals still run. Each request therefore
+gets a CancelScope (a context variable, like request_metrics.current_request)
+that the expensive parts register with:
+
+- CancellableBedrockModel stops reading the Bedrock stream and closes the
+  connection, so Bedrock stops generating
+- kb_retrieve.kb_search_async cancels its retrieval if it is still queued
+  and abandons it if it is running
+
+The entry points then close the agent stream on a fresh task (the cancelled
+one cannot await) and record the partial turn with close_interrupted_turn,
+so the session history stays valid and keeps what the user already saw.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+from prompt_cache import PromptCachingBedrockModel
+from request_metrics import add_request_counter
+
+logger = logging.getLogger(__name__)
+
+current_cancel_scope = contextvars.ContextVar("current_cancel_scope", default=None)
+
+# Appended to the partial answer of a cancelled turn
+CANCELLED_MARKER = "[Response stopped by the user.]"
+CANCELLED_TOOL_RESULT = "Cancelled: the user stopped the response before this tool finished."
+
+
+class CancelScope:
+    """
+    Callbacks to run when a request is cancelled.
+
+    Callbacks run on the thread that calls cancel() and must be quick and
+    non-blocking (set an event, cancel a future).
+    """
+
+    def __init__(self):
+        self._callbacks = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.cancelled = False
+
+    def add(self, callback):
+        """
+        Register a callback; it runs immediately if the scope is already cancelled.
+
+        Returns:
+            callable: Unregisters the callback
+        """
+        with self._lock:
+            if not self.cancelled:
+                key = self._next_id
+                self._next_id += 1
+                self._callbacks[key] = callback
+                return lambda: self._callbacks.pop(key, None)
+        callback()
+        return lambda: None
+
+    def cancel(self):
+        """Cancel the scope and run the registered callbacks once."""
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning("cancel callback failed: %s", e)
+
+
+def on_cancel(callback):
+    """
+    Run ``callback`` if the current request is cancelled.
+
+    Returns:
+        callable: Unregisters the callback; a no-op outside a request
+    """
+    scope = current_cancel_scope.get()
+    if scope is None:
+        return lambda: None
+    return scope.add(callback)
+
+
+class CancellationStats:
+    """Process-wide counters of cancelled work."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cancelled_requests = 0
+        self.aborted_model_streams = 0
+        self.cancelled_tool_calls = 0
+        self.output_tokens_saved = 0
+        # Running mean of output tokens per finished model stream, used to
+        # estimate what an aborted stream would still have generated
+        self._finished_streams = 0
+        self._mean_output_tokens = 0.0
+
+    def add(self, name, value=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def record_finished_stream(self, output_tokens):
+        with self._lock:
+            self._finished_streams += 1
+            self._mean_output_tokens += (output_tokens - self._mean_output_tokens) / self._finished_streams
+
+    def estimate_tokens_saved(self, streamed_tokens):
+        """Expected output tokens an aborted stream did not generate."""
+        with self._lock:
+            return max(0, int(round(self._mean_output_tokens - streamed_tokens)))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "cancelled_requests": self.cancelled_requests,
+                "aborted_model_streams": self.aborted_model_streams,
+                "cancelled_tool_calls": self.cancelled_tool_calls,
+                "output_tokens_saved": self.output_tokens_saved,
+            }
+
+
+CANCELLATION_STATS = CancellationStats()
+
+
+class StreamCancelled(Exception):
+    """Raised on the model stream thread to stop reading an aborted stream."""
+
+
+def _release_aborted(task):
+    """Retrieve a stream thread's StreamCancelled so it is not logged as unhandled."""
+    if not task.cancelled():
+        error = task.exception()
+        if isinstance(error, StreamCancelled):
+            # The traceback holds the unread response; drop it so the connection closes now
+            error.__traceback__ = None
+
+
+class CancellableBedrockModel(PromptCachingBedrockModel):
+    """
+    BedrockModel whose stream stops when its request is cancelled.
+
+    BedrockModel.stream reads the Bedrock response on a worker thread and
+    hands chunks to the event loop through a callback. Here the callback
+    raises StreamCancelled once the request is cancelled or the consumer
+    stops iterating. That ends the read loop, and dropping the unread
+    response closes the connection, so Bedrock stops generating.
+    """
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        aborted = threading.Event()
+
+        def callback(event=None):
+            if event is not None and aborted.is_set():
+                raise StreamCancelled()
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The event loop is gone; nobody is reading any more
+                aborted.set()
+
+        unregister = on_cancel(aborted.set)
+        task = asyncio.create_task(asyncio.to_thread(self._stream, callback, messages, tool_specs, system_prompt))
+        task.add_done_callback(_release_aborted)
+
+        finished = False
+        streamed_chars = 0
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                text = event.get("contentBlockDelta", {}).get("delta", {}).get("text")
+                if text:
+                    streamed_chars += len(text)
+                usage = event.get("metadata", {}).get("usage")
+                if usage:
+                    CANCELLATION_STATS.record_finished_stream(usage.get("outputTokens", 0))
+                yield event
+            if aborted.is_set():
+                # Cancelled while this stream was being read, not at a yield
+                raise StreamCancelled("request cancelled")
+            finished = True
+            await task
+        finally:
+            unregister()
+            if not finished:
+                aborted.set()
+                saved = CANCELLATION_STATS.estimate_tokens_saved(streamed_chars // 4)
+                CANCELLATION_STATS.add("aborted_model_streams")
+                CANCELLATION_STATS.add("output_tokens_saved", saved)
+                add_request_counter("model_streams_aborted")
+                add_request_counter("output_tokens_saved", saved)
+                logger.info("model stream aborted", extra={"output_tokens_saved": saved})
+
+
+def close_interrupted_turn(agent, partial_text=""):
+    """
+    Record a cancelled turn in the agent's history and keep the history valid.
+
+    Bedrock rejects a history where a toolUse has no toolResult or two user
+    messages follow each other, which is how a turn cancelled mid-way ends.
+    Tool calls that never returned get an error toolResult, and the turn
+    ends with an assistant message holding the text the user already saw.
+    Messages are added through the agent, so the session manager persists
+    them.
+
+    Args:
+        agent: Strands Agent whose stream was cancelled
+        partial_text (str): Text streamed for the current model call
+
+    Returns:
+        int: Number of messages added
+    """
+    messages = agent.messages
+    if not messages:
+        return 0
+    added = []
+    last = messages[-1]
+    if last.get("role") == "assistant":
+        tool_uses = [block["toolUse"] for block in last.get("content", []) if "toolUse" in block]
+        if not tool_uses:
+            return 0  # the turn had already finished
+        added.append({"role": "user", "content": [
+            {"toolResult": {"toolUseId": tool_use["toolUseId"], "status": "error",
+                            "content": [{"text": CANCELLED_TOOL_RESULT}]}}
+            for tool_use in tool_uses
+        ]})
+    text = partial_text.strip()
+    added.append({"role": "assistant", "content": [{"text": f"{text}\n\n{CANCELLED_MARKER}" if text else CANCELLED_MARKER}]})
+    for message in added:
+        # Agent._append_message also fires MessageAddedEvent for the session manager
+        agent._append_message(message)
+    return len(added)
+
+
+_cleanup_tasks = set()
+
+
+def finish_cancelled(agent, streams, partial_text="", on_done=None):
+    """
+    Close a cancelled agent stream and record the partial turn, on a new task.
+
+    The task that was cancelled cannot await anything itself, so the
+    cleanup runs on a fresh task.
+
+    Args:
+        agent: Strands Agent whose stream was cancelled
+        streams (list): Async generators to close, outermost first
+        partial_text (str): Text streamed for the current model call
+        on_done (callable): Called with the agent after the turn is recorded,
+            e.g. to persist the session or release a lease
+
+    Returns:
+        asyncio.Task: The cleanup task
+    """
+    async def run():
+        try:
+            for stream in streams:
+                try:
+                    await stream.aclose()
+                except Exception as e:
+                    logger.debug("closing cancelled stream failed: %s", e)
+            close_interrupted_turn(agent, partial_text)
+        except Exception as e:
+            logger.warning("recording cancelled turn failed: %s", e)
+        finally:
+            if on_done is not None:
+                on_done(agent)
+
+    CANCELLATION_STATS.add("cancelled_requests")
+    task = asyncio.get_running_loop().create_task(run())
+    _cleanup_tasks.add(task)
+    task.add_done_callback(_cleanup_tasks.discard)
+    return task
@@ -0,0 +1,455 @@
+"""
+Token-budget conversation management.
+
+SlidingWindowConversationManager keeps a fixed number of messages, so ten
+messages of KB results cost as much input as the model allows while ten
+short turns cost almost nothing. TokenBudgetConversationManager instead
+keeps the newest messages that fit in an estimated token budget, derived per
+model from its context window and max_tokens (see token_budget_for_model).
+
+Token counts are estimated from characters (see estimate_message_tokens) and
+cached per message object, so each message is only measured once however
+many turns it stays in the window.
+
+Trimming keeps the history valid for Bedrock: it never starts with an
+assistant message or a toolResult, and never separates a toolUse from its
+toolResult. Sessions saved by the sliding window manager restore into this
+manager unchanged.
+
+RollingSummaryConversationManager additionally folds evicted turns into a
+rolling summary written by a cheap model after the response is done.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+from strands.agent.conversation_manager import SlidingWindowConversationManager
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+
+# Rough cost of an image or other binary block, which has no text to measure
+BINARY_BLOCK_TOKENS = 1600
+
+# Context window sizes, in tokens, of the models this app offers
+MODEL_CONTEXT_TOKENS = {
+    'us.amazon.nova-micro-v1:0': 128000,
+    'us.amazon.nova-pro-v1:0': 300000,
+    'us.amazon.nova-premier-v1:0': 1000000,
+    'us.anthropic.claude-3-5-haiku-20241022-v1:0': 200000,
+    'us.anthropic.claude-sonnet-4-20250514-v1:0': 200000,
+}
+DEFAULT_CONTEXT_TOKENS = 128000
+
+# Room left for the system prompt and tool specifications
+PROMPT_RESERVE_TOKENS = 4096
+
+
+def token_budget_for_model(model_id, max_tokens):
+    """
+    Return the history token budget for a model.
+
+    The budget is CONVERSATION_MAX_TOKENS (default 12000), so input cost
+    stays flat as conversations grow, but never more than what fits in the
+    model's context window next to the response (max_tokens) and the system
+    prompt and tools.
+
+    Args:
+        model_id (str): The Bedrock model ID
+        max_tokens (int): The model's max_tokens setting
+
+    Returns:
+        int: Token budget for the conversation history; 0 when
+        CONVERSATION_MAX_TOKENS is 0 (token budgeting disabled)
+    """
+    configured = int(os.getenv("CONVERSATION_MAX_TOKENS", "12000"))
+    if configured <= 0:
+        return 0
+    context = MODEL_CONTEXT_TOKENS.get(model_id, DEFAULT_CONTEXT_TOKENS)
+    return max(1024, min(configured, context - int(max_tokens or 0) - PROMPT_RESERVE_TOKENS))
+
+
+def _json_chars(value):
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(str(value))
+
+
+def _block_chars(block):
+    if "text" in block:
+        return len(block["text"])
+    if "toolUse" in block:
+        tool_use = block["toolUse"]
+        return len(tool_use.get("name", "")) + _json_chars(tool_use.get("input", {}))
+    if "toolResult" in block:
+        return sum(_block_chars(item) if isinstance(item, dict) and "json" not in item else _json_chars(item)
+                   for item in block["toolResult"].get("content", []))
+    if "reasoningContent" in block:
+        reasoning = block["reasoningContent"].get("reasoningText", {})
+        return len(reasoning.get("text", ""))
+    if "cachePoint" in block:
+        return 0
+    if "image" in block or "document" in block or "video" in block:
+        return BINARY_BLOCK_TOKENS * CHARS_PER_TOKEN
+    return _json_chars(block)
+
+
+def estimate_message_tokens(message):
+    """Estimate the input tokens of one message, including a small per-message overhead."""
+    chars = sum(_block_chars(block) for block in message.get("content", []) if isinstance(block, dict))
+    return 4 + (chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+# Managers whose saved state (removed_message_count, optional summary) any
+# manager in this module can restore, so switching between them keeps sessions
+_COMPATIBLE_STATES = {
+    "SlidingWindowConversationManager",
+    "TokenBudgetConversationManager",
+    "RollingSummaryConversationManager",
+}
+
+
+class TokenBudgetConversationManager(SlidingWindowConversationManager):
+    """
+    Keep the newest messages that fit in a token budget.
+
+    Args:
+        token_budget (int): Estimated tokens of history to keep after each turn
+        max_messages (int): Hard cap on the number of messages, whatever their size
+        should_truncate_results (bool): Replace tool results with a short error
+            when the model reports a context overflow
+    """
+
+    def __init__(self, token_budget, max_messages=40, should_truncate_results=True):
+        super().__init__(window_size=max_messages, should_truncate_results=should_truncate_results)
+        self.token_budget = int(token_budget)
+        # id(message) -> (message, tokens); the message reference keeps the id valid
+        self._token_cache = {}
+
+    def message_tokens(self, message):
+        """Return the cached token estimate for a message, measuring it on first use."""
+        cached = self._token_cache.get(id(message))
+        if cached is not None and cached[0] is message:
+            return cached[1]
+        tokens = estimate_message_tokens(message)
+        self._token_cache[id(message)] = (message, tokens)
+        return tokens
+
+    def history_tokens(self, messages):
+        """Return the estimated tokens of a list of messages."""
+        return sum(self.message_tokens(message) for message in messages)
+
+    def _forget(self, messages):
+        self._token_cache = {id(m): self._token_cache[id(m)] for m in messages if id(m) in self._token_cache}
+
+    @staticmethod
+    def _valid_start(messages, index):
+        """Whether the history may start at ``index`` (user turn, not a toolResult)."""
+        message = messages[index]
+        if message.get("role") != "user":
+            return False
+        return not any("toolResult" in content for content in message.get("content", []))
+
+    def apply_management(self, agent, **kwargs: Any) -> None:
+        """
+        Drop the oldest turns until the history fits the token budget.
+
+        Args:
+            agent: The agent whose messages will be managed; modified in place
+            **kwargs: Additional keyword arguments for future extensibility
+        """
+        trim_index = self._trim_index(agent.messages, self.token_budget)
+        if trim_index:
+            self._remove_oldest(agent, 0, trim_index)
+        self._forget(agent.messages)
+
+    def _trim_index(self, messages, budget, first=0):
+        """
+        Return how far to trim so ``messages[first:]`` fits, or None to keep all.
+
+        The result is the first valid start that fits both the budget and the
+        message cap; if none fits, the newest valid start (e.g. one huge tool
+        result in the latest turn).
+        """
+        body = messages[first:]
+        total = self.history_tokens(body)
+        if total <= budget and len(messages) <= self.window_size:
+            return None
+
+        start = max(first, len(messages) - self.window_size)
+        remaining = total - self.history_tokens(messages[first:start])
+        trim_index = None
+        for index in range(start, len(messages)):
+            if self._valid_start(messages, index):
+                trim_index = index
+                if remaining <= budget:
+                    break
+            remaining -= self.message_tokens(messages[index])
+        return trim_index if trim_index and trim_index > first else None
+
+    def _remove_oldest(self, agent, first, trim_index):
+        """Remove ``agent.messages[first:trim_index]`` and return the removed messages."""
+        messages = agent.messages
+        removed = messages[first:trim_index]
+        logger.debug("trimming conversation", extra={
+            "removed_messages": len(removed), "token_budget": self.token_budget})
+        self.removed_message_count += len(removed)
+        messages[:] = messages[:first] + messages[trim_index:]
+        return removed
+
+    def reduce_context(self, agent, e: Optional[Exception] = None, **kwargs: Any) -> None:
+        """Reduce the history after a context overflow, then drop stale token counts."""
+        try:
+            super().reduce_context(agent, e=e, **kwargs)
+        finally:
+            # Truncated tool results change size in place
+            self._token_cache.clear()
+
+    def restore_from_session(self, state: dict[str, Any]):
+        """Restore state saved by this manager or by another manager in this module."""
+        if state.get("__name__") in _COMPATIBLE_STATES:
+            state = {**state, "__name__": self.__class__.__name__}
+        return super().restore_from_session(state)
+
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a conversation between a user and an assistant so the conversation can continue without the full transcript.
+
+Merge the previous summary (if any) with the new transcript into one updated summary. Keep the user's goals and questions, the answers given, concrete facts (names, dates, figures, case names, meeting dates), the sources that were cited, and anything still open. Drop pleasantries and repetition. Write plain prose or short bullets, at most 250 words, and output only the summary."""
+
+# Characters of each tool result included in the text to summarize
+SUMMARY_TOOL_RESULT_CHARS = 1500
+
+
+class RollingSummaryConversationManager(TokenBudgetConversationManager):
+    """
+    Token-budget manager that folds evicted turns into a rolling summary.
+
+    Evicted messages are only queued when a turn ends; summarize() later
+    merges them into the summary with a cheap model, off the request path
+    (see schedule_summary). Until that happens the saved
+    removed_message_count leaves the queued messages in the session, so a
+    request that restores the session in the meantime still sees them.
+
+    The summary is saved in the conversation manager state of the session
+    and comes back as a user/assistant message pair in front of the recent
+    turns. Agents that live across requests instead of being restored from
+    the session (the FastAPI server) get it through apply_summary.
+
+    Args:
+        token_budget (int): Estimated tokens of history, summary included
+        summary_model: Strands model used to write summaries
+        max_messages (int): Hard cap on the number of messages
+        should_truncate_results (bool): See TokenBudgetConversationManager
+    """
+
+    def __init__(self, token_budget, summary_model, max_messages=40, should_truncate_results=True):
+        super().__init__(token_budget, max_messages=max_messages, should_truncate_results=should_truncate_results)
+        self.summary_model = summary_model
+        self.summary = None
+        # Summary text currently in front of the live history
+        self._summary_shown = None
+        self._summary_messages = []
+        self._pending = []
+        self._summary_lock = threading.Lock()
+
+    @property
+    def pending_count(self):
+        """Number of evicted messages not yet in the summary."""
+        return len(self._pending)
+
+    def _make_summary_messages(self, summary=None):
+        summary = summary or self.summary
+        if not summary:
+            return []
+        return [
+            {"role": "user", "content": [{"text": f"Summary of our conversation so far:\n{summary}"}]},
+            {"role": "assistant", "content": [{"text": "Understood. I will continue from that context."}]},
+        ]
+
+    def _prefix_length(self, messages):
+        prefix = self._summary_messages
+        if prefix and len(messages) >= len(prefix) and all(a is b for a, b in zip(messages, prefix)):
+            return len(prefix)
+        return 0
+
+    def apply_management(self, agent, **kwargs: Any) -> None:
+        """Move the oldest turns that do not fit the budget to the summary queue."""
+        messages = agent.messages
+        prefix = self._prefix_length(messages)
+        budget = self.token_budget - self.history_tokens(messages[:prefix])
+        trim_index = self._trim_index(messages, budget, first=prefix)
+        if trim_index:
+            self._pending.extend(self._remove_oldest(agent, prefix, trim_index))
+        self._forget(agent.messages)
+
+    def reduce_context(self, agent, e: Optional[Exception] = None, **kwargs: Any) -> None:
+        """Reduce the history after a context overflow, keeping the summary in front."""
+        prefix = agent.messages[:self._prefix_length(agent.messages)]
+        del agent.messages[:len(prefix)]
+        try:
+            super().reduce_context(agent, e=e, **kwargs)
+        finally:
+            agent.messages[:0] = prefix
+
+    def get_state(self) -> dict[str, Any]:
+        """Save the summary, counting queued messages as not yet removed."""
+        state = super().get_state()
+        state["removed_message_count"] = self.removed_message_count - len(self._pending)
+        state["summary"] = self.summary
+        return state
+
+    def restore_from_session(self, state: dict[str, Any]):
+        """Restore the summary and return it as messages to put before the recent turns."""
+        super().restore_from_session(state)
+        self.summary = self._summary_shown = state.get("summary")
+        self._summary_messages = self._make_summary_messages()
+        return list(self._summary_messages) or None
+
+    def apply_summary(self, agent):
+        """
+        Put the latest summary in front of a live agent's history.
+
+        Call this before a turn starts, while no other request uses the
+        agent; sessions restored from S3 get the summary on restore instead.
+
+        Returns:
+            bool: True if the history changed
+        """
+        summary = self.summary
+        if not summary or summary == self._summary_shown:
+            return False
+        prefix = self._prefix_length(agent.messages)
+        self._summary_messages = self._make_summary_messages(summary)
+        agent.messages[:prefix] = self._summary_messages
+        self._summary_shown = summary
+        return True
+
+    @staticmethod
+    def _transcript(messages):
+        lines = []
+        for message in messages:
+            role = message.get("role", "user")
+            for block in message.get("content", []):
+                if "text" in block:
+                    lines.append(f"{role}: {block['text']}")
+                elif "toolUse" in block:
+                    tool_use = block["toolUse"]
+                    lines.append(f"{role} called {tool_use.get('name')} with {json.dumps(tool_use.get('input', {}), default=str)}")
+                elif "toolResult" in block:
+                    text = " ".join(item.get("text", "") for item in block["toolResult"].get("content", [])
+                                    if isinstance(item, dict))
+                    lines.append(f"tool result: {text[:SUMMARY_TOOL_RESULT_CHARS]}")
+        return "\n".join(lines)
+
+    async def summarize(self):
+        """
+        Merge the queued messages into the summary.
+
+        Returns:
+            bool: True if the summary changed
+        """
+        with self._summary_lock:
+            pending = list(self._pending)
+            if not pending:
+                return False
+            prompt = ""
+            if self.summary:
+                prompt += f"Previous summary:\n{self.summary}\n\n"
+            prompt += f"New transcript:\n{self._transcript(pending)}"
+
+            parts = []
+            async for event in self.summary_model.stream(
+                [{"role": "user", "content": [{"text": prompt}]}],
+                system_prompt=SUMMARY_SYSTEM_PROMPT,
+            ):
+                text = event.get("contentBlockDelta", {}).get("delta", {}).get("text")
+                if text:
+                    parts.append(text)
+            summary = "".join(parts).strip()
+            if not summary:
+                return False
+
+            # The messages already in front of the live history keep the old
+            # text; the new summary is used from the next restore
+            self.summary = summary
+            del self._pending[:len(pending)]
+            return True
+
+
+_summary_jobs = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CONVERSATION_SUMMARY_WORKERS", "2")),
+    thread_name_prefix="summary",
+)
+
+
+def summary_due(agent):
+    """Whether an agent has evicted turns waiting to be summarized."""
+    manager = agent.conversation_manager
+    return isinstance(manager, RollingSummaryConversationManager) and manager.pending_count > 0
+
+
+def schedule_summary(agent, on_complete=None):
+    """
+    Summarize an agent's evicted turns in the background, if it has any.
+
+    Args:
+        agent: Strands Agent whose turn has finished
+        on_complete (callable): Called with the agent after the summary
+            changed, e.g. to save the session
+
+    Returns:
+        Future | None: The scheduled job, or None when there is nothing to summarize
+    """
+    if not summary_due(agent):
+        return None
+    manager = agent.conversation_manager
+
+    def run():
+        started = time.perf_counter()
+        try:
+            changed = asyncio.run(manager.summarize())
+        except Exception as e:
+            logger.warning("conversation summary failed: %s", e)
+            return False
+        logger.info("conversation summarized", extra={
+            "summary_ms": round((time.perf_counter() - started) * 1000.0, 1), "changed": changed})
+        if changed and on_complete is not None:
+            try:
+                on_complete(agent)
+            except Exception as e:
+                logger.warning("saving conversation summary failed: %s", e)
+        return changed
+
+    return _summary_jobs.submit(run)
+
+
+def conversation_manager_for(model_id, max_tokens, summary_model=None):
+    """
+    Create the conversation manager for a new agent.
+
+    Args:
+        model_id (str): The Bedrock model ID
+        max_tokens (int): The model's max_tokens setting
+        summary_model: Model for rolling summaries; None evicts old turns
+            without summarizing them
+
+    Returns:
+        ConversationManager: A RollingSummaryConversationManager or
+        TokenBudgetConversationManager, or the previous
+        SlidingWindowConversationManager(window_size=10) when
+        CONVERSATION_MAX_TOKENS is 0
+    """
+    budget = token_budget_for_model(model_id, max_tokens)
+    if not budget:
+        return SlidingWindowConversationManager(window_size=10)
+    max_messages = int(os.getenv("CONVERSATION_MAX_MESSAGES", "40"))
+    if summary_model is not None:
+        return RollingSummaryConversationManager(budget, summary_model, max_messages=max_messages)
+    return TokenBudgetConversationManager(token_budget=budget, max_messages=max_messages)
@@ -0,0 +1,188 @@
+# build_local_index.py
+
+"""
+Build a local vector index (tools.local_index) from the FOMC or SCOTUS pulls.
+
+Reads the folders written by fomc_pull.R (minutes/{year}/, transcripts/{year}/)
+or scotus_pull.r (txt/{year}/), strips HTML, splits every document into
+overlapping word chunks, embeds them and writes the index directory that a
+knowledge base spec points at with ``local_index``.
+
+Each document gets the metadata ``corpus``, ``doc_type`` (the top-level
+folder), ``year`` and, when the file name contains one, ``date``, so the
+Bedrock-style ``retrieveFilter`` works on local indexes too. Pass
+``--uri-prefix`` with the S3 prefix the Bedrock knowledge base was synced
+from to get the same citations as the hosted knowledge base.
+
+PDF files (FOMC transcripts and some minutes) are read when ``pypdf`` is
+installed and skipped otherwise.
+
+Use the embedder the app will query with: ``bedrock`` (Titan Text
+Embeddings, one call per chunk) or ``hashing`` (fully offline, lower
+quality).
+
+Usage (from genai/):
+    python -m data_pulls.build_local_index --corpus fomc --input /data/fomc --output indexes/fomc
+    python -m data_pulls.build_local_index --corpus scotus --input /data/scotus --output indexes/scotus \\
+        --embedder hashing --ivf-lists 256
+"""
+
+import argparse
+import logging
+import os
+import re
+import time
+from html.parser import HTMLParser
+from tools.kb_semantic_cache import bedrock_embedder, hashing_embedder
+from tools.local_index import build_index
+
+logger = logging.getLogger(__name__)
+
+TEXT_EXTENSIONS = (".txt", ".htm", ".html")
+_HTML_RE = re.compile(r"<\s*(html|body|p|div|table|br)\b", re.IGNORECASE)
+_DATE_RE = re.compile(r"((?:19|20)\d{2})-?(\d{2})-?(\d{2})")
+
+# Brute force stays around a millisecond below this many chunks
+IVF_MIN_CHUNKS = 10000
+
+
+class _TextExtractor(HTMLParser):
+    """Collect the visible text of an HTML page."""
+
+    _SKIP = {"script", "style", "head", "title"}
+    _BREAKS = {"p", "div", "br", "tr", "li", "h1", "h2", "h3", "h4", "table"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skipping += 1
+        elif tag in self._BREAKS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP and self._skipping:
+            self._skipping -= 1
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def html_to_text(html):
+    """Return the visible text of an HTML document."""
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return "".join(parser.parts)
+
+
+def read_pdf(path):
+    """Return the text of a PDF, or None when pypdf is not installed."""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+
+
+def document_metadata(corpus, relative_path):
+    """Derive filterable metadata from a file's place in the pull output."""
+    parts = relative_path.split(os.sep)
+    metadata = {"corpus": corpus, "doc_type": parts[0] if len(parts) > 1 else corpus}
+    if len(parts) > 2 and parts[1].isdigit():
+        metadata["year"] = int(parts[1])
+    match = _DATE_RE.search(parts[-1])
+    if match:
+        metadata["date"] = "-".join(match.groups())
+        metadata.setdefault("year", int(match.group(1)))
+    return metadata
+
+
+def read_corpus(corpus, input_dir, uri_prefix=None):
+    """
+    Yield (uri, text, metadata) for every readable document under input_dir.
+
+    Args:
+        corpus (str): Corpus name stored in the metadata
+        input_dir (str): Folder written by the pull script
+        uri_prefix (str): Prefix for document URIs; the relative path is
+            used as is when omitted
+
+    Returns:
+        generator: Document tuples, in path order
+    """
+    skipped_pdfs = 0
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, input_dir)
+            extension = os.path.splitext(name)[1].lower()
+            if extension == ".pdf":
+                text = read_pdf(path)
+                if text is None:
+                    skipped_pdfs += 1
+                    continue
+            elif extension in TEXT_EXTENSIONS:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    text = f.read()
+                if _HTML_RE.search(text[:4096]):
+                    text = html_to_text(text)
+            else:
+                continue
+            uri = f"{uri_prefix.rstrip('/')}/{relative.replace(os.sep, '/')}" if uri_prefix else relative
+            yield uri, text, document_metadata(corpus, relative)
+    if skipped_pdfs:
+        logger.warning("skipped %d PDF files; install pypdf to index them", skipped_pdfs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", required=True, help="corpus name, e.g. fomc or scotus")
+    parser.add_argument("--input", required=True, help="folder written by the pull script")
+    parser.add_argument("--output", required=True, help="index directory to create or replace")
+    parser.add_argument("--uri-prefix", help="prefix for document URIs, e.g. s3://bucket/fomc")
+    parser.add_argument("--embedder", choices=("bedrock", "hashing"), default="bedrock")
+    parser.add_argument("--model-id", default="amazon.titan-embed-text-v2:0", help="Bedrock embedding model")
+    parser.add_argument("--region", default="us-east-1")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--chunk-words", type=int, default=300)
+    parser.add_argument("--overlap-words", type=int, default=60)
+    parser.add_argument("--ivf-lists", type=int, default=-1,
+                        help=f"IVF lists; 0 for brute force, -1 for 4 * sqrt(chunks) above {IVF_MIN_CHUNKS} chunks")
+    parser.add_argument("--nprobe", type=int, help="IVF lists searched per query")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent embedding calls")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.embedder == "hashing":
+        embed_fn = hashing_embedder(args.dimensions)
+        embedder_config = {"type": "hashing", "dimensions": args.dimensions}
+    else:
+        embed_fn = bedrock_embedder(args.model_id, args.dimensions, args.region)
+        embedder_config = {"type": "bedrock", "model_id": args.model_id,
+                           "dimensions": args.dimensions, "region": args.region}
+
+    documents = list(read_corpus(args.corpus, args.input, args.uri_prefix))
+    ivf_lists = args.ivf_lists
+    if ivf_lists < 0:
+        # Estimate the chunk count from word counts
+        step = max(1, args.chunk_words - args.overlap_words)
+        chunks = sum(len(text.split()) // step + 1 for _, text, _ in documents)
+        ivf_lists = int(4 * chunks ** 0.5) if chunks >= IVF_MIN_CHUNKS else 0
+
+    started = time.perf_counter()
+    manifest = build_index(documents, args.output, embed_fn, embedder_config,
+                           chunk_size=args.chunk_words, chunk_overlap=args.overlap_words,
+                           ivf_lists=ivf_lists, nprobe=args.nprobe, workers=args.workers)
+    logger.info("indexed %d chunks from %d documents into %s in %.1f s (ivf: %s)",
+                manifest["chunks"], manifest["documents"], args.output,
+                time.perf_counter() - started, manifest["ivf"] or "brute force")
+
+
+if __name__ == "__main__":
+    main()
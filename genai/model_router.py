@@ -0,0 +1,327 @@
+"""
+Cost/latency-aware model routing for the ``auto`` model.
+
+Clients that send ``"model": "auto"`` let the server pick the model for
+each request. route() is a local classifier (no model call, microseconds)
+over the prompt length, reasoning and code cues in the prompt, whether the
+personality has tools and the size of the history. It picks the cheapest
+tier of MODEL_ROUTER_TIERS that fits:
+
+- tier 0 (Nova Micro): greetings, short questions and small talk
+- tier 1 (Nova Pro): tool use, analysis, long prompts or long history
+- tier 2 (Claude Sonnet 4, with thinking): long multi-part reasoning and code
+
+After a routed response, assess_response() flags answers that look poor
+(an error, no text, cut off at max_tokens, "I can't ..." or a few words for
+a long question). The entry point then takes the turn back with
+rewind_turn() and answers again one tier up, at most
+MODEL_ROUTER_MAX_ESCALATIONS times (MODEL_ROUTER_ESCALATE=false disables
+this). A turn can only be taken back while its session writes are still
+buffered (WriteBehindS3SessionManager); otherwise the first answer stands.
+
+Auto sessions are stored under the ``auto`` model prefix whatever tier
+served each turn, so the history stays in one place when the model changes.
+Reasoning blocks of earlier turns are dropped before routing
+(portable_history): other models reject them and Claude does not need
+them once a turn is over.
+
+ROUTER_STATS counts decisions, escalations and latency per model; it is
+served at the FastAPI ``/stats`` endpoint.
+"""
+
+import os
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from conversation import CHARS_PER_TOKEN, TokenBudgetConversationManager, estimate_message_tokens, token_budget_for_model
+
+AUTO_MODEL = "auto"
+
+DEFAULT_TIERS = (
+    "us.amazon.nova-micro-v1:0",
+    "us.amazon.nova-pro-v1:0",
+    "us.anthropic.claude-sonnet-4-20250514-v1:0",
+)
+
+# Classifier thresholds, in estimated tokens
+TRIVIAL_PROMPT_TOKENS = 8
+LONG_PROMPT_TOKENS = 300
+VERY_LONG_PROMPT_TOKENS = 2000
+LONG_HISTORY_TOKENS = 6000
+
+_REASONING_RE = re.compile(
+    r"\b(why|explain|compare|contrast|analy[sz]e|evaluate|assess|implications?|step[- ]by[- ]step|"
+    r"prove|derive|trade-?offs?|pros and cons|critique|in depth|in detail|reasoning)\b",
+    re.IGNORECASE,
+)
+_CODE_RE = re.compile(r"```|\bdef \w+\(|\bclass \w+|\bfunction\s*\w*\(|\bSELECT\b.+\bFROM\b|Traceback \(most recent")
+_UNABLE_RE = re.compile(
+    r"^\W*i(?:['’]?m sorry| am sorry| apologi[sz]e| can ?not| can['’]t|['’]?m unable| am unable|['’]?m not able|"
+    r" am not able| don['’]t know| do not know| don['’]t have (?:enough )?information)",
+    re.IGNORECASE,
+)
+
+
+def router_tiers():
+    """Model IDs of the routing tiers, cheapest first (MODEL_ROUTER_TIERS)."""
+    configured = [m.strip() for m in os.getenv("MODEL_ROUTER_TIERS", "").split(",") if m.strip()]
+    return tuple(configured) or DEFAULT_TIERS
+
+
+def escalation_limit():
+    """How many times a routed turn may be retried on a larger model."""
+    if os.getenv("MODEL_ROUTER_ESCALATE", "true").strip().lower() not in ("1", "true", "yes", "on"):
+        return 0
+    return int(os.getenv("MODEL_ROUTER_MAX_ESCALATIONS", "1"))
+
+
+def resolve_model(model):
+    """Return the model agents are built with: the cheapest tier for ``auto``."""
+    return router_tiers()[0] if model == AUTO_MODEL else model
+
+
+@dataclass
+class RoutingDecision:
+    """
+    The model picked for a request and why.
+
+    Attributes:
+        model_id: Bedrock model ID of the chosen tier
+        tier: Index into the routing tiers
+        reasons: Rules that raised the tier
+        features: Classifier inputs
+    """
+    model_id: str
+    tier: int
+    reasons: tuple = ()
+    features: dict = field(default_factory=dict)
+
+
+def route(prompt, history=(), has_tools=False, tiers=None):
+    """
+    Pick the cheapest model tier that fits a request.
+
+    Args:
+        prompt (str): The user's message
+        history (list): Messages already in the conversation
+        has_tools (bool): Whether the personality has tools
+        tiers (tuple): Model IDs, cheapest first; defaults to router_tiers()
+
+    Returns:
+        RoutingDecision: The chosen tier
+    """
+    tiers = tiers or router_tiers()
+    prompt_tokens = (len(prompt) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    reasoning_cues = len({match.lower() for match in _REASONING_RE.findall(prompt)})
+    code = bool(_CODE_RE.search(prompt))
+    history_tokens = sum(estimate_message_tokens(message) for message in history)
+
+    tier = 0
+    reasons = []
+
+    def at_least(level, reason):
+        nonlocal tier
+        if level > tier:
+            tier = level
+        reasons.append(reason)
+
+    if prompt_tokens >= VERY_LONG_PROMPT_TOKENS:
+        at_least(2, "very_long_prompt")
+    elif prompt_tokens >= LONG_PROMPT_TOKENS:
+        at_least(1, "long_prompt")
+    if code:
+        at_least(2, "code")
+    if reasoning_cues >= 3:
+        at_least(2, "multi_part_reasoning")
+    elif reasoning_cues:
+        at_least(1, "reasoning")
+    if has_tools and prompt_tokens > TRIVIAL_PROMPT_TOKENS:
+        at_least(1, "tools")
+    if history_tokens >= LONG_HISTORY_TOKENS:
+        at_least(1, "long_history")
+
+    tier = min(tier, len(tiers) - 1)
+    return RoutingDecision(
+        model_id=tiers[tier],
+        tier=tier,
+        reasons=tuple(reasons),
+        features={
+            "prompt_tokens": prompt_tokens,
+            "reasoning_cues": reasoning_cues,
+            "code": code,
+            "has_tools": bool(has_tools),
+            "history_messages": len(history),
+            "history_tokens": history_tokens,
+        },
+    )
+
+
+def assess_response(prompt, text, stop_reason=None, error=None):
+    """
+    Decide whether a routed answer is poor enough to retry on a larger model.
+
+    Args:
+        prompt (str): The user's message
+        text (str): Text of the final assistant message
+        stop_reason (str): Why the model stopped
+        error (str): Error raised while streaming, if any
+
+    Returns:
+        str | None: Why the answer is poor, or None to keep it
+    """
+    if error:
+        return "error"
+    text = (text or "").strip()
+    if not text:
+        return "empty"
+    if stop_reason == "max_tokens":
+        return "truncated"
+    if _UNABLE_RE.search(text[:200]):
+        return "unable"
+    if len(prompt) >= 60 * CHARS_PER_TOKEN and len(text.split()) < 5:
+        return "too_short"
+    return None
+
+
+def portable_history(messages):
+    """
+    Drop reasoning blocks from earlier turns so any tier can read the history.
+
+    Messages are edited in place, so the conversation manager and session
+    manager keep tracking the same message objects. Run this before a turn
+    starts, when every message belongs to an earlier turn.
+
+    Args:
+        messages (list): Agent messages
+
+    Returns:
+        int: Number of reasoning blocks removed
+    """
+    removed = 0
+    for message in messages:
+        content = message.get("content", [])
+        kept = [block for block in content if "reasoningContent" not in block]
+        if len(kept) != len(content):
+            removed += len(content) - len(kept)
+            message["content"] = kept or [{"text": "(no response)"}]
+    return removed
+
+
+def apply_route(agent, model_id, personality):
+    """
+    Make an agent answer with another model's pooled resources.
+
+    The personality's system prompt and tools are the same on every tier,
+    so only the model and the history token budget, which depends on the
+    model's context window, are swapped.
+    """
+    # Imported here because agent_pool imports this module
+    from agent_pool import AGENT_POOL
+    resources = AGENT_POOL.get(model_id, personality)
+    agent.model = resources.bedrock_model
+    manager = agent.conversation_manager
+    if isinstance(manager, TokenBudgetConversationManager):
+        budget = token_budget_for_model(resources.model_id, resources.max_tokens)
+        if budget:
+            manager.token_budget = budget
+
+
+def turn_checkpoint(agent):
+    """
+    Remember where an agent's conversation stands before a turn.
+
+    Returns:
+        tuple: (messages, latest session message) for rewind_turn
+    """
+    session_manager = getattr(agent, "_session_manager", None)
+    latest = None
+    if session_manager is not None:
+        latest = getattr(session_manager, "_latest_agent_message", {}).get(agent.agent_id)
+    return list(agent.messages), latest
+
+
+def rewind_turn(agent, checkpoint):
+    """
+    Take back the messages a turn added, in memory and in the session.
+
+    Args:
+        agent: Agent that ran the turn
+        checkpoint (tuple): From turn_checkpoint before the turn
+
+    Returns:
+        bool: False, with nothing changed, when the session cannot take the
+        messages back (they were already written to S3, or the session
+        manager does not buffer writes)
+    """
+    messages, latest = checkpoint
+    session_manager = getattr(agent, "_session_manager", None)
+    if session_manager is not None:
+        discard = getattr(session_manager, "discard_messages_after", None)
+        if discard is None or not discard(agent, latest):
+            return False
+    kept = {id(message) for message in messages}
+    agent.messages[:] = [message for message in agent.messages if id(message) in kept]
+    return True
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class RouterStats:
+    """
+    Process-wide routing decisions, escalations and latency per model.
+
+    Args:
+        window (int): Latest responses per model kept for the percentiles
+    """
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self._models = {}
+        self.escalation_reasons = {}
+
+    def _model(self, model_id):
+        stats = self._models.get(model_id)
+        if stats is None:
+            stats = {"routed": 0, "escalated_from": 0, "escalated_to": 0, "responses": 0,
+                     "ttft_ms": deque(maxlen=self._window), "total_ms": deque(maxlen=self._window)}
+            self._models[model_id] = stats
+        return stats
+
+    def record_decision(self, decision):
+        with self._lock:
+            self._model(decision.model_id)["routed"] += 1
+
+    def record_escalation(self, from_model, to_model, reason):
+        with self._lock:
+            self._model(from_model)["escalated_from"] += 1
+            self._model(to_model)["escalated_to"] += 1
+            self.escalation_reasons[reason] = self.escalation_reasons.get(reason, 0) + 1
+
+    def record_response(self, model_id, ttft_ms, total_ms):
+        with self._lock:
+            stats = self._model(model_id)
+            stats["responses"] += 1
+            if ttft_ms is not None:
+                stats["ttft_ms"].append(ttft_ms)
+            stats["total_ms"].append(total_ms)
+
+    def snapshot(self):
+        with self._lock:
+            models = {}
+            for model_id, stats in self._models.items():
+                entry = {k: stats[k] for k in ("routed", "escalated_from", "escalated_to", "responses")}
+                for name in ("ttft_ms", "total_ms"):
+                    values = stats[name]
+                    if values:
+                        entry[f"{name}_p50"] = round(_percentile(values, 0.5), 1)
+                        entry[f"{name}_p95"] = round(_percentile(values, 0.95), 1)
+                models[model_id] = entry
+            return {"models": models, "escalation_reasons": dict(self.escalation_reasons)}
+
+
+ROUTER_STATS = RouterStats()
@@ -0,0 +1,309 @@
+"""
+Registry of predefined personalities.
+
+Each personality maps to a system prompt, the tools its agents get and
+optional model config overrides. The registry is loaded once at import from
+a JSON file (personalities.json next to this module, or PERSONALITIES_FILE)
+and is immutable; a reload builds a new registry and swaps it in atomically,
+so a request always sees one consistent version.
+
+The file is re-read when its modification time changes, checked at most
+every PERSONALITIES_RELOAD_SECONDS (default 5, 0 disables). A file that
+fails to load is logged and the previous registry stays active.
+
+File format::
+
+    {
+      "personalities": {
+        "fomc": {
+          "system_prompt": "You are an expert Federal Reserve ...",
+          "tools": ["fomc_kb_search"],
+          "model_config": {"max_tokens": 3000}
+        }
+      },
+      "knowledge_bases": {
+        "treasury_kb_search": {
+          "knowledge_base_id": "ABCDEFGHIJ",
+          "region": "us-east-1",
+          "description": "Search the Treasury knowledge base for ...",
+          "max_concurrency": 4,
+          "timeout_seconds": 20,
+          "max_result_chars": 20000
+        }
+      }
+    }
+
+Entries under ``knowledge_bases`` are KnowledgeBaseSpec fields and become
+search tools with that name, so a new KB-backed personality only needs a
+knowledge base entry and a personality that lists it in ``tools``.
+
+Tools are loaded on first use (see LazyTool), so importing this module, and
+building agents for personalities without tools, never imports the KB search
+stack (boto retrieval, reranking, NumPy).
+"""
+
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERSONALITIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "personalities.json")
+
+# Tools that personalities can reference by name without declaring them, as
+# "module:attribute" paths imported on first use
+BUILTIN_TOOLS = MappingProxyType({
+    "fomc_kb_search": "tools.fomc_kb_search:FOMC_KB_TOOL",
+    "scotus_kb_search": "tools.scotus_kb_search:SCOTUS_KB_TOOL",
+})
+
+
+def import_tool(path):
+    """Import and return the object at a "module:attribute" path."""
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class LazyTool:
+    """
+    An agent tool that is imported or built the first time it is needed.
+
+    Args:
+        name (str): Tool name, known without loading the tool
+        factory (callable): Returns the agent tool
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self._factory = factory
+        self._tool = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"LazyTool({self.name!r}, loaded={self._tool is not None})"
+
+    def load(self):
+        """Return the agent tool, loading it on the first call."""
+        if self._tool is None:
+            with self._lock:
+                if self._tool is None:
+                    self._tool = self._factory()
+        return self._tool
+
+_EMPTY = MappingProxyType({})
+
+
+@dataclass(frozen=True)
+class Personality:
+    """
+    A predefined personality, or a custom system prompt.
+
+    Attributes:
+        name: Personality name, or "custom" for a custom system prompt
+        system_prompt: System prompt for the agent
+        tools: LazyTools, in the order they are offered to the model
+        model_config: Bedrock model config overrides for this personality
+    """
+    name: str
+    system_prompt: str
+    tools: Tuple = ()
+    model_config: Mapping = field(default_factory=lambda: _EMPTY)
+
+    @property
+    def is_custom(self):
+        return self.name == "custom"
+
+    @property
+    def tool_names(self):
+        return tuple(tool.name for tool in self.tools)
+
+    def load_tools(self):
+        """Return the agent tools, importing them if this is their first use."""
+        return tuple(tool.load() for tool in self.tools)
+
+
+class PersonalityRegistry:
+    """
+    Immutable mapping of personality name to Personality.
+
+    Args:
+        personalities (dict): Personality by name
+        source (str): File the registry was loaded from, if any
+        version (int): Increases with every reload
+    """
+
+    def __init__(self, personalities, source=None, version=0):
+        self._personalities = MappingProxyType(dict(personalities))
+        self.names = frozenset(self._personalities)
+        self.source = source
+        self.version = version
+
+    def __contains__(self, name):
+        return name in self._personalities
+
+    def __len__(self):
+        return len(self._personalities)
+
+    def get(self, name) -> Optional[Personality]:
+        """Return the predefined personality called ``name``, or None."""
+        return self._personalities.get(name)
+
+    def resolve(self, personality):
+        """
+        Return the predefined personality, or a tool-less custom one.
+
+        Args:
+            personality (str): Predefined personality name or custom system prompt
+
+        Returns:
+            Personality: The matching personality
+        """
+        found = self._personalities.get(personality)
+        if found is not None:
+            return found
+        return Personality(name="custom", system_prompt=personality)
+
+    def label(self, personality):
+        """Return the name to log for a personality; custom prompts become "custom"."""
+        return personality if personality in self._personalities else "custom"
+
+    @classmethod
+    def from_dict(cls, config, source=None, version=0):
+        """
+        Build a registry from a parsed config.
+
+        Args:
+            config (dict): Parsed personalities file
+            source (str): Where the config came from, for error messages
+            version (int): Registry version
+
+        Returns:
+            PersonalityRegistry: The new registry
+
+        Raises:
+            ValueError: If the config is malformed or references an unknown tool
+        """
+        tools = {name: _builtin_tool(name) for name in BUILTIN_TOOLS}
+        knowledge_bases = config.get("knowledge_bases") or {}
+        if knowledge_bases:
+            # Validating specs needs the KB tool module, but not building the tools
+            from tools.kb_tool import KnowledgeBaseSpec, make_kb_tool
+        for name, kb in knowledge_bases.items():
+            if not kb.get("knowledge_base_id") or not kb.get("description"):
+                raise ValueError(f"Knowledge base tool '{name}' needs knowledge_base_id and description")
+            try:
+                spec = KnowledgeBaseSpec(name=name, **kb)
+            except TypeError as e:
+                raise ValueError(f"Knowledge base tool '{name}': {e}") from e
+            tools[name] = LazyTool(name, lambda spec=spec: make_kb_tool(spec))
+
+        personalities = {}
+        for name, entry in (config.get("personalities") or {}).items():
+            if name == "custom":
+                raise ValueError("'custom' is reserved for custom system prompts")
+            if not isinstance(entry.get("system_prompt"), str) or not entry["system_prompt"]:
+                raise ValueError(f"Personality '{name}' needs a system_prompt")
+            unknown = [t for t in entry.get("tools", []) if t not in tools]
+            if unknown:
+                raise ValueError(f"Personality '{name}' references unknown tools: {', '.join(unknown)}")
+            personalities[name] = Personality(
+                name=name,
+                system_prompt=entry["system_prompt"],
+                tools=tuple(tools[t] for t in entry.get("tools", [])),
+                model_config=MappingProxyType(dict(entry.get("model_config") or {})),
+            )
+        return cls(personalities, source=source, version=version)
+
+    @classmethod
+    def from_file(cls, path, version=0):
+        """Load a registry from a JSON personalities file."""
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls.from_dict(config, source=path, version=version)
+
+
+_builtin_tools = {}
+_builtin_lock = threading.Lock()
+
+
+def _builtin_tool(name):
+    """Return the process-wide LazyTool for a builtin tool, shared by every registry version."""
+    with _builtin_lock:
+        tool = _builtin_tools.get(name)
+        if tool is None:
+            tool = LazyTool(name, lambda: import_tool(BUILTIN_TOOLS[name]))
+            _builtin_tools[name] = tool
+        return tool
+
+
+_registry = None
+_mtime = None
+_last_check = 0.0
+_reload_lock = threading.Lock()
+
+
+def personalities_file():
+    """Return the personalities file configured for this process."""
+    return os.getenv("PERSONALITIES_FILE", DEFAULT_PERSONALITIES_FILE)
+
+
+def reload_registry(path=None):
+    """
+    Load the personalities file and make it the active registry.
+
+    Args:
+        path (str): File to load; defaults to personalities_file()
+
+    Returns:
+        PersonalityRegistry: The active registry (the previous one if loading failed)
+    """
+    global _registry, _mtime
+    path = path or personalities_file()
+    with _reload_lock:
+        version = _registry.version + 1 if _registry is not None else 0
+        mtime = None
+        try:
+            mtime = os.path.getmtime(path)
+            registry = PersonalityRegistry.from_file(path, version=version)
+        except (OSError, ValueError) as e:
+            if _registry is None:
+                raise
+            # Do not retry the same broken file on every check
+            _mtime = mtime
+            logger.error("failed to reload personalities from %s, keeping version %d: %s", path, _registry.version, e)
+            return _registry
+        _registry, _mtime = registry, mtime
+        logger.info("loaded %d personalities", len(registry), extra={"source": path, "registry_version": version})
+        return registry
+
+
+def get_registry():
+    """
+    Return the active registry, reloading it first if the file changed.
+
+    The modification time is checked at most every
+    PERSONALITIES_RELOAD_SECONDS, so this is a clock read on most calls.
+    """
+    global _last_check
+    interval = float(os.getenv("PERSONALITIES_RELOAD_SECONDS", "5"))
+    if interval > 0:
+        now = time.monotonic()
+        if now - _last_check >= interval:
+            _last_check = now
+            path = _registry.source or personalities_file()
+            try:
+                changed = os.path.getmtime(path) != _mtime
+            except OSError:
+                changed = False
+            if changed:
+                return reload_registry(path)
+    return _registry
+
+
+reload_registry()
@@ -0,0 +1,84 @@
+"""
+Bedrock prompt caching.
+
+The fomc and scotus personalities send the same long system prompt and tool
+specifications on every model call, and every turn resends the history of
+the previous turns. On models that support prompt caching, cache
+checkpoints are placed after:
+
+- the system prompt (``cache_prompt``)
+- the tool specifications (``cache_tools``, Anthropic models only)
+- the last message of each request (``cache_messages``), so the next model
+  call, either the next step of a tool loop or the next turn, reads the
+  whole earlier conversation from the cache and only pays full price for
+  what was added since
+
+The message checkpoint is added to the formatted request only, never to
+``agent.messages``, so no cache points end up in stored sessions.
+
+Prefixes shorter than the model's minimum cacheable length are simply not
+cached. Cache read/write token counts reported by Bedrock are added to the
+request metrics (see RequestMetrics.add_usage).
+"""
+
+import os
+from typing import Any, Optional
+from strands.models import BedrockModel
+
+# Prompt parts each model can cache
+PROMPT_CACHE_SUPPORT = {
+    'us.amazon.nova-micro-v1:0': frozenset({"system", "messages"}),
+    'us.amazon.nova-pro-v1:0': frozenset({"system", "messages"}),
+    'us.amazon.nova-premier-v1:0': frozenset({"system", "messages"}),
+    'us.anthropic.claude-3-5-haiku-20241022-v1:0': frozenset({"system", "tools", "messages"}),
+    'us.anthropic.claude-sonnet-4-20250514-v1:0': frozenset({"system", "tools", "messages"}),
+}
+
+CACHE_POINT_TYPE = "default"
+
+
+def prompt_cache_enabled():
+    """Whether prompt caching is on for this process (PROMPT_CACHE, default true)."""
+    return os.getenv("PROMPT_CACHE", "true").strip().lower() in ("1", "true", "yes", "on")
+
+
+def prompt_cache_config(model_id, has_tools):
+    """
+    Return the model config entries that turn on prompt caching for a model.
+
+    Args:
+        model_id (str): The Bedrock model ID
+        has_tools (bool): Whether agents on this model get tools
+
+    Returns:
+        dict: ``cache_prompt``, ``cache_tools`` and ``cache_messages`` entries
+        for the parts the model can cache; empty for unsupported models
+    """
+    supported = PROMPT_CACHE_SUPPORT.get(model_id, frozenset())
+    config = {}
+    if "system" in supported:
+        config["cache_prompt"] = CACHE_POINT_TYPE
+    if "tools" in supported and has_tools:
+        config["cache_tools"] = CACHE_POINT_TYPE
+    if "messages" in supported:
+        config["cache_messages"] = CACHE_POINT_TYPE
+    return config
+
+
+class PromptCachingBedrockModel(BedrockModel):
+    """
+    BedrockModel that also puts a cache checkpoint after the last message.
+
+    Takes the BedrockModel arguments; the ``cache_messages`` config entry
+    (a cache point type) turns the message checkpoint on.
+    """
+
+    def format_request(self, messages, tool_specs=None, system_prompt: Optional[str] = None) -> dict[str, Any]:
+        request = super().format_request(messages, tool_specs, system_prompt)
+        cache_type = self.config.get("cache_messages")
+        formatted = request.get("messages")
+        if cache_type and formatted:
+            last = formatted[-1]
+            # A new content list, so the message in agent.messages is untouched
+            last["content"] = [*last["content"], {"cachePoint": {"type": cache_type}}]
+        return request
@@ -0,0 +1,195 @@
+"""
+Per-request latency breakdown for agent invocations.
+
+A RequestMetrics object is made current for each request (a context
+variable, so it follows the request into tool worker threads) and collects
+timing spans for each phase: agent build, S3 session load, time to first
+token, generation and every KB tool call. At the end of the request it is
+logged as one structured record and can be sent to the client as a
+``{"type": "metrics"}`` SSE event.
+
+Every span is also started on the OpenTelemetry tracer. Unless an
+OpenTelemetry SDK / exporter is configured for the process, the global tracer
+is the API's no-op implementation, so the default overhead is a few
+attribute writes per span.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from opentelemetry import trace
+
+_tracer = trace.get_tracer("genai.agent")
+logger = logging.getLogger(__name__)
+
+current_request = contextvars.ContextVar("current_request_metrics", default=None)
+
+# Bedrock usage fields and the request counters they are added to
+USAGE_COUNTERS = {
+    "inputTokens": "input_tokens",
+    "outputTokens": "output_tokens",
+    "cacheReadInputTokens": "cache_read_input_tokens",
+    "cacheWriteInputTokens": "cache_write_input_tokens",
+}
+
+
+class RequestMetrics:
+    """
+    Timing spans and counters for one request.
+
+    Args:
+        **attributes: Request attributes (session_id, model, personality, ...)
+    """
+
+    def __init__(self, **attributes):
+        self.request_id = uuid.uuid4().hex[:12]
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        self.spans = []
+        self.counters = {}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._root = _tracer.start_span("agent_invocation", attributes=self._otel_attributes(self.attributes))
+        self._root_context = trace.set_span_in_context(self._root)
+        self._finished = None
+
+    @staticmethod
+    def _otel_attributes(attributes):
+        return {f"genai.{k}": v for k, v in attributes.items() if isinstance(v, (str, bool, int, float))}
+
+    def _elapsed_ms(self, at=None):
+        return ((at or time.perf_counter()) - self._start) * 1000.0
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time a phase of the request.
+
+        Safe to use from worker threads; spans are children of the request's
+        root span without attaching to the thread's OpenTelemetry context.
+        """
+        otel_span = _tracer.start_span(name, context=self._root_context,
+                                       attributes=self._otel_attributes(attributes))
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            ended = time.perf_counter()
+            record = {
+                "name": name,
+                "start_ms": round(self._elapsed_ms(started), 2),
+                "duration_ms": round((ended - started) * 1000.0, 2),
+            }
+            if attributes:
+                record["attributes"] = attributes
+            if error:
+                record["error"] = error
+                otel_span.set_attribute("error.type", error)
+            otel_span.end()
+            with self._lock:
+                self.spans.append(record)
+
+    def start_span(self, name):
+        """Start a span that is ended later with end_span (for streaming phases)."""
+        return (name, time.perf_counter(), _tracer.start_span(name, context=self._root_context))
+
+    def end_span(self, handle, **attributes):
+        """End a span started with start_span."""
+        name, started, otel_span = handle
+        ended = time.perf_counter()
+        record = {
+            "name": name,
+            "start_ms": round(self._elapsed_ms(started), 2),
+            "duration_ms": round((ended - started) * 1000.0, 2),
+        }
+        if attributes:
+            record["attributes"] = attributes
+            for key, value in self._otel_attributes(attributes).items():
+                otel_span.set_attribute(key, value)
+        otel_span.end()
+        with self._lock:
+            self.spans.append(record)
+
+    def annotate(self, **attributes):
+        """Set request attributes learned after the request started (e.g. the routed model)."""
+        with self._lock:
+            self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+        for key, value in self._otel_attributes(attributes).items():
+            self._root.set_attribute(key, value)
+
+    def add(self, name, value=1):
+        """Increment a counter (token counts, cache hits, ...)."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_usage(self, usage):
+        """
+        Add the token usage of one model call to the counters.
+
+        Args:
+            usage (dict): Bedrock ``metadata.usage``, including the prompt
+                cache read/write counts when caching is on
+        """
+        self.add("model_calls")
+        for field, counter in USAGE_COUNTERS.items():
+            value = usage.get(field)
+            if value:
+                self.add(counter, value)
+
+    def finish(self):
+        """Close the root span; later calls are no-ops."""
+        if self._finished is None:
+            self._finished = time.perf_counter()
+            for key, value in self.counters.items():
+                if isinstance(value, (int, float)):
+                    self._root.set_attribute(f"genai.{key}", value)
+            self._root.end()
+
+    def to_dict(self):
+        """Return the breakdown as a JSON-serializable dict."""
+        self.finish()
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+            counters = dict(self.counters)
+        phases = {}
+        for record in spans:
+            phases[record["name"]] = round(phases.get(record["name"], 0.0) + record["duration_ms"], 2)
+        return {
+            "request_id": self.request_id,
+            **self.attributes,
+            "total_ms": round(self._elapsed_ms(self._finished), 2),
+            "phases_ms": phases,
+            "spans": spans,
+            "counters": counters,
+        }
+
+    def emit(self):
+        """Log the breakdown as a single structured record and return the dict."""
+        data = self.to_dict()
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("request_metrics", extra={**data, "_rate_limit": False})
+        return data
+
+
+@contextmanager
+def request_span(name, **attributes):
+    """Time a phase on the current request, or do nothing outside a request."""
+    metrics = current_request.get()
+    if metrics is None:
+        yield
+    else:
+        with metrics.span(name, **attributes):
+            yield
+
+
+def add_request_counter(name, value=1):
+    """Increment a counter on the current request, if there is one."""
+    metrics = current_request.get()
+    if metrics is not None:
+        metrics.add(name, value)
@@ -0,0 +1,571 @@
+"""
+Write-behind S3 session persistence.
+
+The stock S3SessionManager PUTs every message, and re-reads and re-PUTs the
+agent object, synchronously while the model is streaming. This module keeps
+those writes in an in-memory buffer instead and flushes them to S3 in one
+concurrent batch after the response is done:
+
+- repeated writes to the same key (agent.json is rewritten after every
+  message) are coalesced into a single PUT
+- reads see buffered writes, so the session stays consistent before a flush
+- a new manager for the same session waits for that session's in-flight
+  flush before it reads from S3
+- every manager with unflushed data is flushed at interpreter shutdown
+
+An optional SessionStateCache keeps the objects of recently used sessions in
+memory, keyed by (s3_prefix, session_id), so a warm multi-turn conversation
+is rehydrated without any S3 list or get calls. Entries are validated against
+the ETag of the last flushed agent object and bounded by total bytes (LRU).
+
+Configuration (environment variables):
+    S3_SESSION_WRITE_BEHIND     Use the write-behind manager (true)
+    S3_FLUSH_MAX_WORKERS        Concurrent PUTs per flush batch (8)
+    S3_FLUSH_WAIT_SECONDS       How long a new request waits for a pending flush (10)
+    SESSION_CACHE_MAX_BYTES     Size bound of the session state cache (67108864, 0 disables it)
+    SESSION_CACHE_VALIDATE      'etag' to HEAD the agent object before a cache hit, 'none' to trust it (etag)
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, List, Optional
+from botocore.exceptions import ClientError
+from strands.session.repository_session_manager import RepositorySessionManager
+from strands.session.s3_session_manager import MESSAGE_PREFIX, S3SessionManager
+from strands.types.exceptions import SessionException
+from strands.types.session import SessionMessage
+from aws_clients import get_client
+
+FLUSH_WAIT_SECONDS = float(os.getenv("S3_FLUSH_WAIT_SECONDS", "10"))
+
+logger = logging.getLogger(__name__)
+
+# Flush jobs and the PUTs inside them run on separate pools so a full job
+# pool can never deadlock waiting for its own PUTs
+_flush_jobs = ThreadPoolExecutor(max_workers=4, thread_name_prefix="s3-flush")
+_put_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("S3_FLUSH_MAX_WORKERS", "8")),
+    thread_name_prefix="s3-put",
+)
+
+_registry_lock = threading.Lock()
+_inflight_flushes = {}
+_live_managers = weakref.WeakSet()
+
+
+def wait_for_flush(session_key, timeout=FLUSH_WAIT_SECONDS):
+    """
+    Block until the in-flight flush for a session (if any) has finished.
+
+    Args:
+        session_key (tuple): (bucket, prefix, session_id)
+        timeout (float): Maximum seconds to wait
+    """
+    with _registry_lock:
+        future = _inflight_flushes.get(session_key)
+    if future is not None:
+        wait([future], timeout=timeout)
+
+
+class SessionCacheEntry:
+    """
+    Objects known for one session.
+
+    Attributes:
+        bucket (str): Bucket the objects live in
+        objects (dict): S3 key -> serialized JSON bytes
+        known_keys (set): Every key known to exist, including ones not loaded
+        version_key (str): Key whose ETag identifies this version (agent.json)
+        version_etag (str): ETag of version_key after the last flush
+    """
+
+    def __init__(self, bucket, objects=None, known_keys=None, version_key=None, version_etag=None):
+        self.bucket = bucket
+        self.objects = dict(objects or {})
+        self.known_keys = set(known_keys or ())
+        self.version_key = version_key
+        self.version_etag = version_etag
+
+    @property
+    def size(self):
+        return sum(len(content) for content in self.objects.values())
+
+    def copy(self):
+        return SessionCacheEntry(self.bucket, self.objects, self.known_keys, self.version_key, self.version_etag)
+
+
+class SessionStateCache:
+    """
+    Byte-bounded LRU of session objects keyed by (s3_prefix, session_id).
+
+    Args:
+        max_bytes (int): Upper bound on the total size of cached objects
+        validate (str): 'etag' to check the version object with a HEAD request
+            before serving a hit, 'none' to trust the cache (single writer)
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, validate="etag"):
+        self.max_bytes = int(max_bytes)
+        self.validate = validate
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, prefix, session_id, bucket, client):
+        """
+        Return a private copy of a valid cached entry, or None.
+
+        Args:
+            prefix (str): S3 prefix of the session
+            session_id (str): Session ID
+            bucket (str): Bucket the caller reads from
+            client: S3 client used for ETag validation
+        """
+        key = (prefix, session_id)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0].bucket != bucket:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry = item[0].copy()
+
+        if self.validate == "etag" and entry.version_key:
+            try:
+                etag = client.head_object(Bucket=bucket, Key=entry.version_key).get("ETag")
+            except ClientError:
+                etag = None
+            if etag != entry.version_etag:
+                self.invalidate(prefix, session_id)
+                with self._lock:
+                    self.stale += 1
+                    self.misses += 1
+                return None
+
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, prefix, session_id, entry):
+        """Store an entry, evicting least recently used sessions to fit."""
+        key = (prefix, session_id)
+        size = entry.size
+        with self._lock:
+            self._pop(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (entry, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, prefix, session_id):
+        """Drop the entry for a session."""
+        with self._lock:
+            self._pop((prefix, session_id))
+
+    def _pop(self, key):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._bytes -= item[1]
+
+    def stats(self):
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sessions": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class WriteBehindS3SessionManager(S3SessionManager):
+    """
+    S3SessionManager that buffers writes and flushes them in batches.
+
+    Args:
+        session_id (str): ID for the session
+        bucket (str): S3 bucket name
+        prefix (str): S3 key prefix for storage organization
+        region_name (str): AWS region for S3 storage
+        client: Optional S3 client; defaults to the pooled client from aws_clients.
+            Pass a moto client or benchmarks.fake_s3.InMemoryS3Client in tests.
+        state_cache (SessionStateCache): Optional cache of session objects shared across requests
+    """
+
+    def __init__(self, session_id, bucket, prefix="", region_name="us-east-1", client=None, state_cache=None,
+                 **kwargs: Any):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client or get_client("s3", region_name=region_name)
+        self.session_key = (bucket, prefix, session_id)
+        self._pending = OrderedDict()
+        self._pending_lock = threading.Lock()
+        # Keys handed to a flush, so discard_messages_after knows what may be in S3
+        self._flushed_keys = set()
+        self.flushes = 0
+        self.objects_written = 0
+        self.writes_coalesced = 0
+
+        # Read-your-writes across requests: let the previous turn land first.
+        # Async entry points wait off the event loop before building the
+        # manager, so there this finds the flush already done.
+        wait_for_flush(self.session_key)
+
+        # A warm cache entry is complete: keys it does not know do not exist in S3
+        self.state_cache = state_cache
+        self._state = state_cache.get(prefix, session_id, bucket, self.client) if state_cache else None
+        self._state_complete = self._state is not None
+        if self._state is None:
+            self._state = SessionCacheEntry(bucket)
+        with _registry_lock:
+            _live_managers.add(self)
+
+        # Skip S3SessionManager.__init__, which would build its own S3 client
+        RepositorySessionManager.__init__(self, session_id=session_id, session_repository=self)
+
+    def _write_s3_object(self, key: str, data: dict) -> None:
+        """Buffer a JSON object instead of writing it to S3."""
+        content = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+        with self._pending_lock:
+            if key in self._pending:
+                self.writes_coalesced += 1
+                del self._pending[key]
+            self._pending[key] = content
+
+    def _read_s3_object(self, key: str) -> Optional[dict]:
+        """Read a JSON object, preferring the unflushed buffer, then the session cache, then S3."""
+        with self._pending_lock:
+            content = self._pending.get(key)
+            if content is None:
+                content = self._state.objects.get(key)
+                if content is None and self._state_complete and key not in self._state.known_keys:
+                    return None
+        if content is not None:
+            return json.loads(content)
+
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+            content = response["Body"].read()
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "NoSuchKey":
+                return None
+            raise SessionException(f"S3 error reading {key}: {e}") from e
+        with self._pending_lock:
+            self._state.objects[key] = content
+            self._state.known_keys.add(key)
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError as e:
+            raise SessionException(f"Invalid JSON in S3 object {key}: {e}") from e
+
+    def create_session(self, session, **kwargs: Any):
+        """Create a new session, treating a buffered session object as existing."""
+        session_key = f"{self._get_session_path(session.session_id)}session.json"
+        with self._pending_lock:
+            if session_key in self._pending or session_key in self._state.known_keys:
+                raise SessionException(f"Session {session.session_id} already exists")
+            skip_head_check = self._state_complete
+        if skip_head_check:
+            # The cache knows every object of this session, so skip the HEAD check
+            self._write_s3_object(session_key, session.to_dict())
+            return session
+        return super().create_session(session, **kwargs)
+
+    def list_messages(self, session_id: str, agent_id: str, limit: Optional[int] = None, offset: int = 0,
+                      **kwargs: Any) -> List[SessionMessage]:
+        """List messages from S3 merged with buffered, not yet flushed messages."""
+        messages_prefix = f"{self._get_agent_path(session_id, agent_id)}messages/"
+        keys = set()
+        if not self._state_complete:
+            try:
+                paginator = self.client.get_paginator("list_objects_v2")
+                for page in paginator.paginate(Bucket=self.bucket, Prefix=messages_prefix):
+                    keys.update(obj["Key"] for obj in page.get("Contents", []))
+            except ClientError as e:
+                raise SessionException(f"S3 error reading messages: {e}") from e
+        with self._pending_lock:
+            self._state.known_keys.update(keys)
+            keys.update(k for k in self._state.known_keys if k.startswith(messages_prefix))
+            keys.update(k for k in self._pending if k.startswith(messages_prefix))
+
+        indexed = []
+        for key in keys:
+            filename = key.split("/")[-1]
+            if filename.startswith(MESSAGE_PREFIX) and filename.endswith(".json"):
+                indexed.append((int(filename[len(MESSAGE_PREFIX):-5]), key))
+        message_keys = [k for _, k in sorted(indexed)]
+        message_keys = message_keys[offset:offset + limit] if limit is not None else message_keys[offset:]
+
+        messages = []
+        for key in message_keys:
+            data = self._read_s3_object(key)
+            if data:
+                messages.append(SessionMessage.from_dict(data))
+        return messages
+
+    def discard_messages_after(self, agent, message):
+        """
+        Take back the buffered messages appended after ``message``.
+
+        Used to retry a turn (e.g. on a larger model): the unflushed message
+        writes are dropped and ``message`` becomes the agent's latest message
+        again, so the retry reuses the same message ids.
+
+        Args:
+            agent: Agent whose messages to discard
+            message (SessionMessage): Latest message to keep; None keeps none
+
+        Returns:
+            bool: False, with nothing changed, if any of those messages may
+            already be in S3
+        """
+        first = 0 if message is None else message.message_id + 1
+        messages_prefix = f"{self._get_agent_path(self.session_id, agent.agent_id)}messages/"
+
+        def after(key):
+            filename = key[len(messages_prefix):]
+            return (key.startswith(messages_prefix) and filename.startswith(MESSAGE_PREFIX)
+                    and int(filename[len(MESSAGE_PREFIX):-5]) >= first)
+
+        with self._pending_lock:
+            if any(after(key) for key in self._flushed_keys | self._state.known_keys):
+                return False
+            for key in [key for key in self._pending if after(key)]:
+                del self._pending[key]
+        self._latest_agent_message[agent.agent_id] = message
+        return True
+
+    def delete_session(self, session_id: str, **kwargs: Any) -> None:
+        """
+        Delete a session from S3, including writes that were not flushed yet.
+
+        The buffered objects are dropped and the session's in-flight flush is
+        awaited first, so neither can write the session back afterwards.
+        """
+        session_prefix = self._get_session_path(session_id)
+        with self._pending_lock:
+            dropped = [key for key in self._pending if key.startswith(session_prefix)]
+            for key in dropped:
+                del self._pending[key]
+            self._flushed_keys = {key for key in self._flushed_keys if not key.startswith(session_prefix)}
+            if session_id == self.session_id:
+                self._state = SessionCacheEntry(self.bucket)
+                self._state_complete = False
+        wait_for_flush((self.bucket, self.prefix, session_id))
+        if self.state_cache is not None:
+            self.state_cache.invalidate(self.prefix, session_id)
+        try:
+            super().delete_session(session_id, **kwargs)
+        except SessionException as e:
+            # A session that was only ever buffered has nothing in S3 to delete
+            if not dropped or e.__cause__ is not None:
+                raise
+
+    @property
+    def pending_count(self):
+        """Number of buffered objects waiting to be flushed."""
+        with self._pending_lock:
+            return len(self._pending)
+
+    def flush(self):
+        """
+        Write all buffered objects to S3 now, concurrently.
+
+        Objects that fail to upload are put back in the buffer (unless a newer
+        version was buffered meanwhile) so a later flush retries them.
+
+        Raises:
+            SessionException: If any PUT failed
+        """
+        with self._pending_lock:
+            batch = list(self._pending.items())
+            self._pending.clear()
+            self._flushed_keys.update(key for key, _ in batch)
+        if not batch:
+            return
+
+        def put(item):
+            key, content = item
+            response = self.client.put_object(Bucket=self.bucket, Key=key, Body=content,
+                                              ContentType="application/json")
+            return response.get("ETag")
+
+        try:
+            futures = {_put_executor.submit(put, item): item for item in batch}
+        except RuntimeError:
+            # The interpreter is shutting down (e.g. flush_all at exit after a
+            # background summary buffered writes); write on this thread instead
+            futures = {}
+            for item in batch:
+                future = Future()
+                try:
+                    future.set_result(put(item))
+                except Exception as e:
+                    future.set_exception(e)
+                futures[future] = item
+        failed = []
+        etags = {}
+        for future, item in futures.items():
+            try:
+                etags[item[0]] = future.result()
+            except Exception as e:
+                failed.append((item, e))
+
+        self.flushes += 1
+        self.objects_written += len(batch) - len(failed)
+        self._update_state_cache(batch, etags, failed)
+        if failed:
+            with self._pending_lock:
+                for (key, content), _ in failed:
+                    self._pending.setdefault(key, content)
+            raise SessionException(f"Failed to flush {len(failed)} S3 session objects: {failed[0][1]}")
+
+    def _update_state_cache(self, batch, etags, failed):
+        """Record flushed objects and publish the session state to the shared cache."""
+        if self.state_cache is None:
+            return
+        if failed:
+            # S3 and the cache may now disagree; force the next request to reload
+            self.state_cache.invalidate(self.prefix, self.session_id)
+            return
+        with self._pending_lock:
+            for key, content in batch:
+                self._state.objects[key] = content
+                self._state.known_keys.add(key)
+                if key.endswith("/agent.json"):
+                    self._state.version_key = key
+                    self._state.version_etag = etags.get(key)
+            # Everything this session touched has been read or written by now
+            self._state_complete = True
+            snapshot = self._state.copy()
+        self.state_cache.put(self.prefix, self.session_id, snapshot)
+
+    def flush_async(self):
+        """
+        Schedule a flush in the background and return its Future.
+
+        The Future is registered under this session so the next manager for
+        the same session waits for it before reading.
+        """
+        def run(previous):
+            try:
+                if previous is not None:
+                    # Keep flushes of one session ordered
+                    wait([previous])
+                self.flush()
+            except Exception as e:
+                logger.error("S3 session flush failed for %s: %s", self.session_key, e)
+                raise
+            finally:
+                with _registry_lock:
+                    if _inflight_flushes.get(self.session_key) is future:
+                        del _inflight_flushes[self.session_key]
+
+        with _registry_lock:
+            future = _flush_jobs.submit(run, _inflight_flushes.get(self.session_key))
+            _inflight_flushes[self.session_key] = future
+        return future
+
+
+def session_cache_from_env():
+    """Create a SessionStateCache from environment variables, or None when disabled."""
+    max_bytes = int(os.getenv("SESSION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    if max_bytes <= 0:
+        return None
+    return SessionStateCache(max_bytes=max_bytes, validate=os.getenv("SESSION_CACHE_VALIDATE", "etag"))
+
+
+def flush_agent_session(agent):
+    """
+    Schedule a background flush of an agent's write-behind session, if it has one.
+
+    Args:
+        agent: Strands Agent created by agent_config
+
+    Returns:
+        Future | None: The scheduled flush, or None when there is nothing to flush
+    """
+    manager = getattr(agent, "_session_manager", None)
+    if isinstance(manager, WriteBehindS3SessionManager):
+        return manager.flush_async()
+    return None
+
+
+def reserve_agent_session(agent):
+    """
+    Hold an agent's write-behind session for background work that writes to it.
+
+    The reservation is registered like an in-flight flush, so the next
+    manager for the session waits for it (up to S3_FLUSH_WAIT_SECONDS)
+    before reading, and flushes scheduled later are ordered after it.
+
+    Args:
+        agent: Strands Agent created by agent_config
+
+    Returns:
+        callable | None: ``release(write=None)``. It waits for the flushes
+        already in flight, runs ``write`` (which buffers writes on the
+        manager), flushes them and ends the reservation. Only the first call
+        does anything. None when the agent has no write-behind session.
+    """
+    manager = getattr(agent, "_session_manager", None)
+    if not isinstance(manager, WriteBehindS3SessionManager):
+        return None
+    future = Future()
+    with _registry_lock:
+        previous = _inflight_flushes.get(manager.session_key)
+        _inflight_flushes[manager.session_key] = future
+    released = threading.Lock()
+
+    def release(write=None):
+        if not released.acquire(blocking=False):
+            return
+        try:
+            if previous is not None:
+                wait([previous])
+            if write is not None:
+                write()
+                manager.flush()
+        except Exception as e:
+            logger.error("S3 session write failed for %s: %s", manager.session_key, e)
+        finally:
+            future.set_result(None)
+            with _registry_lock:
+                if _inflight_flushes.get(manager.session_key) is future:
+                    del _inflight_flushes[manager.session_key]
+
+    return release
+
+
+def flush_all(timeout=None):
+    """Flush every live write-behind manager and wait for in-flight flushes."""
+    with _registry_lock:
+        managers = list(_live_managers)
+        inflight = list(_inflight_flushes.values())
+    wait(inflight, timeout=timeout)
+    for manager in managers:
+        try:
+            manager.flush()
+        except Exception as e:
+            logger.error("S3 session flush on shutdown failed for %s: %s", manager.session_key, e)
+
+
+atexit.register(flush_all)
@@ -0,0 +1,177 @@
+"""
+Session-aware request routing for the FastAPI server.
+
+Each session id gets its own agent from a bounded LRU pool, so concurrent
+users never share a conversation history. Requests for the same session are
+serialized by a per-session lock, a global semaphore caps how many agents
+stream at once, and a bounded wait queue applies backpressure: once it is
+full, new requests are rejected with SessionRouterSaturated (HTTP 429).
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from agent_pool import get_pooled_agent
+
+
+class SessionRouterSaturated(Exception):
+    """Raised when the router has no free slot and its wait queue is full."""
+
+
+class _SessionSlot:
+    def __init__(self, agent):
+        self.agent = agent
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class SessionLease:
+    """
+    A held routing slot for one request.
+
+    The lease keeps the session lock and one concurrency permit until
+    release() is called; release() is idempotent so it can be called from
+    both the stream generator and a response background task.
+    """
+
+    def __init__(self, router, slot):
+        self._router = router
+        self._slot = slot
+        self._released = False
+
+    @property
+    def agent(self):
+        return self._slot.agent
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._slot.last_used = time.monotonic()
+        self._router._release(self._slot)
+
+
+class SessionRouter:
+    """
+    Map session ids to dedicated agents with concurrency control.
+
+    Args:
+        max_sessions (int): Number of idle session agents kept in memory
+        max_concurrency (int): Requests allowed to run at the same time
+        max_queue (int): Requests allowed to wait for a slot before returning 429
+        agent_factory (callable): Builds an agent from model and personality
+    """
+
+    def __init__(self, max_sessions=256, max_concurrency=32, max_queue=64, agent_factory=get_pooled_agent):
+        self.max_sessions = max(1, int(max_sessions))
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.agent_factory = agent_factory
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._sessions = OrderedDict()
+        self._active = 0
+        self._waiting = 0
+        self.rejected = 0
+        self.evictions = 0
+        self.completed = 0
+
+    async def _get_slot(self, session_id, model, personality):
+        if not session_id:
+            # Anonymous requests get a private, throwaway agent
+            return _SessionSlot(await self._build_agent(model, personality))
+
+        key = (session_id, model, personality)
+        slot = self._sessions.get(key)
+        if slot is None:
+            agent = await self._build_agent(model, personality)
+            # Another request for this session may have built it meanwhile
+            slot = self._sessions.get(key)
+            if slot is None:
+                slot = _SessionSlot(agent)
+                self._sessions[key] = slot
+                self._evict_idle()
+                return slot
+        self._sessions.move_to_end(key)
+        return slot
+
+    async def _build_agent(self, model, personality):
+        # A pool miss builds the model and tools and imports the KB stack,
+        # so keep it off the event loop that streams the other sessions
+        return await asyncio.to_thread(self.agent_factory, model=model, personality=personality)
+
+    def _evict_idle(self):
+        if len(self._sessions) <= self.max_sessions:
+            return
+        for key in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            # Never evict a session that is running or has requests waiting on it
+            if not self._sessions[key].lock.locked():
+                del self._sessions[key]
+                self.evictions += 1
+
+    async def acquire(self, session_id, model, personality):
+        """
+        Wait for this session's lock and a global slot.
+
+        Args:
+            session_id (str): Session id from the request, or None
+            model (str): The Bedrock model ID
+            personality (str): Predefined personality name or custom system prompt
+
+        Returns:
+            SessionLease: Holds the session agent until released
+
+        Raises:
+            SessionRouterSaturated: If all slots are busy and the queue is full
+        """
+        if self._active + self._waiting >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise SessionRouterSaturated(
+                f"{self._active} requests running and {self._waiting} queued"
+            )
+
+        self._waiting += 1
+        try:
+            slot = await self._get_slot(session_id, model, personality)
+            await slot.lock.acquire()
+            try:
+                await self._semaphore.acquire()
+            except BaseException:
+                slot.lock.release()
+                raise
+        finally:
+            self._waiting -= 1
+
+        self._active += 1
+        return SessionLease(self, slot)
+
+    def _release(self, slot):
+        self._active -= 1
+        self.completed += 1
+        self._semaphore.release()
+        slot.lock.release()
+
+    def stats(self):
+        """Return a snapshot of routing counters."""
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "active": self._active,
+            "waiting": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "evictions": self.evictions,
+        }
+
+
+def router_from_env():
+    """Create a SessionRouter sized from environment variables."""
+    return SessionRouter(
+        max_sessions=int(os.getenv("ROUTER_MAX_SESSIONS", "256")),
+        max_concurrency=int(os.getenv("ROUTER_MAX_CONCURRENCY", "32")),
+        max_queue=int(os.getenv("ROUTER_MAX_QUEUE", "64")),
+    )
@@ -0,0 +1,177 @@
+"""
+Incremental Server-Sent Events decoder for AgentCore runtime responses.
+
+The runtime streams ``data: {json}\\n\\n`` frames, but network chunks do not
+line up with frames: one chunk can hold several frames and one frame can be
+split across chunks (even in the middle of a UTF-8 character). SSEDecoder
+works on the raw byte stream, keeps the unfinished tail between feeds and only
+emits complete events.
+
+Typical use::
+
+    for event in iter_agent_events(response["response"].iter_chunks()):
+        if event.type == "token":
+            ...
+"""
+
+import codecs
+import json
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Optional
+
+
+@dataclass
+class SSEEvent:
+    """One complete SSE event (``data`` lines are joined with newlines)."""
+    data: str
+    event: str = "message"
+    id: Optional[str] = None
+    retry: Optional[int] = None
+
+
+@dataclass
+class AgentEvent:
+    """
+    An SSE event whose data has been parsed as JSON exactly once.
+
+    Attributes:
+        type (str): The event ``type`` field ('start', 'token', 'done', 'error', ...),
+            'error' for runtime error objects, or 'raw' when the data is not JSON
+        payload: The parsed JSON value (or the raw string for 'raw' events)
+    """
+    type: str
+    payload: Any = field(default=None)
+
+    @property
+    def text(self):
+        """Token text for 'token' events, otherwise an empty string."""
+        if self.type == "token" and isinstance(self.payload, dict):
+            return self.payload.get("text") or ""
+        return ""
+
+
+class SSEDecoder:
+    """
+    Stateful decoder that turns byte chunks into SSEEvents.
+
+    Line endings may be CRLF, LF or CR, including a CRLF split across chunks.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._tail = ""
+        self._skip_lf = False
+        self._data = []
+        self._event = None
+        self._id = None
+        self._retry = None
+
+    def feed(self, chunk: bytes) -> list:
+        """
+        Decode a chunk and return the events it completes.
+
+        Args:
+            chunk (bytes): Next piece of the response body
+
+        Returns:
+            list: Completed SSEEvents, possibly empty
+        """
+        text = self._decoder.decode(chunk)
+        return self._consume(text)
+
+    def close(self) -> list:
+        """Flush the decoder at end of stream and return any final event."""
+        events = self._consume(self._decoder.decode(b"", final=True))
+        if self._tail:
+            events.extend(self._line(self._tail))
+            self._tail = ""
+        # A final event without a trailing blank line is still delivered
+        events.extend(self._line(""))
+        return events
+
+    def _consume(self, text):
+        if self._skip_lf and text.startswith("\n"):
+            text = text[1:]
+        self._skip_lf = False
+
+        events = []
+        buffer = self._tail + text
+        start = 0
+        length = len(buffer)
+        while True:
+            lf = buffer.find("\n", start)
+            cr = buffer.find("\r", start)
+            if lf < 0 and cr < 0:
+                break
+            end = lf if cr < 0 or (0 <= lf < cr) else cr
+            events.extend(self._line(buffer[start:end]))
+            if buffer[end] == "\r":
+                if end + 1 < length:
+                    start = end + 2 if buffer[end + 1] == "\n" else end + 1
+                else:
+                    # CR at the very end: a following LF belongs to this line ending
+                    self._skip_lf = True
+                    start = end + 1
+            else:
+                start = end + 1
+        self._tail = buffer[start:]
+        return events
+
+    def _line(self, line):
+        if not line:
+            if not self._data and self._event is None:
+                return []
+            event = SSEEvent(
+                data="\n".join(self._data),
+                event=self._event or "message",
+                id=self._id,
+                retry=self._retry,
+            )
+            self._data = []
+            self._event = None
+            return [event]
+
+        if line.startswith(":"):
+            return []  # comment / keep-alive
+        name, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if name == "data":
+            self._data.append(value)
+        elif name == "event":
+            self._event = value
+        elif name == "id":
+            self._id = value
+        elif name == "retry" and value.isdigit():
+            self._retry = int(value)
+        return []
+
+
+def iter_sse_events(chunks: Iterable[bytes]) -> Iterator[SSEEvent]:
+    """Yield complete SSEEvents from an iterable of byte chunks."""
+    decoder = SSEDecoder()
+    for chunk in chunks:
+        if chunk:
+            yield from decoder.feed(chunk)
+    yield from decoder.close()
+
+
+def to_agent_event(event: SSEEvent) -> AgentEvent:
+    """Parse an SSEEvent's data as JSON and classify it."""
+    try:
+        payload = json.loads(event.data)
+    except json.JSONDecodeError:
+        return AgentEvent("error" if event.event == "error" else "raw", event.data)
+    if isinstance(payload, dict):
+        if isinstance(payload.get("type"), str):
+            return AgentEvent(payload["type"], payload)
+        if "error" in payload:
+            # Error object emitted by BedrockAgentCoreApp when the entrypoint raises
+            return AgentEvent("error", payload)
+    return AgentEvent("raw", payload)
+
+
+def iter_agent_events(chunks: Iterable[bytes]) -> Iterator[AgentEvent]:
+    """Yield typed AgentEvents from an iterable of byte chunks."""
+    for event in iter_sse_events(chunks):
+        yield to_agent_event(event)
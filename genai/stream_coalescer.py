@@ -0,0 +1,197 @@
+"""
+Token coalescing for the SSE stream sent to the UI.
+
+Fast models emit one tiny delta per token, and every delta becomes its own
+JSON-encoded SSE frame. coalesce_tokens merges consecutive token events and
+emits them every ``flush_ms`` milliseconds or ``flush_bytes`` bytes, whichever
+comes first. Any other event (error, done, metrics, ...) flushes the buffer
+immediately and is passed through unchanged.
+
+Configuration (environment variables, overridable per request):
+    STREAM_COALESCE         Enable coalescing by default (true)
+    STREAM_FLUSH_MS         Maximum time a token waits in the buffer (40)
+    STREAM_FLUSH_BYTES      Buffer size that triggers a flush (256)
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+DEFAULT_FLUSH_MS = float(os.getenv("STREAM_FLUSH_MS", "40"))
+DEFAULT_FLUSH_BYTES = int(os.getenv("STREAM_FLUSH_BYTES", "256"))
+
+_DONE = object()
+
+
+class StreamStats:
+    """Frame counters for one stream, or accumulated over many streams."""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.tokens_in = 0
+        self.seconds = 0.0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record_frame(self, text, tokens):
+        with self._lock:
+            self.frames += 1
+            self.bytes += len(text.encode("utf-8"))
+            self.tokens_in += tokens
+
+    def finish(self):
+        with self._lock:
+            self.seconds = time.monotonic() - self._started
+
+    def merge(self, other):
+        with self._lock:
+            self.frames += other.frames
+            self.bytes += other.bytes
+            self.tokens_in += other.tokens_in
+            self.seconds += other.seconds
+
+    def snapshot(self):
+        """Return frames/sec, bytes/frame and the token-to-frame ratio."""
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "bytes": self.bytes,
+                "tokens_in": self.tokens_in,
+                "frames_per_sec": self.frames / self.seconds if self.seconds else 0.0,
+                "bytes_per_frame": self.bytes / self.frames if self.frames else 0.0,
+                "tokens_per_frame": self.tokens_in / self.frames if self.frames else 0.0,
+            }
+
+
+# Totals across all coalesced streams in this process
+STREAM_STATS = StreamStats()
+
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+_FALSE_VALUES = ("0", "false", "no", "off", "")
+
+
+def parse_flag(value, default):
+    """
+    Interpret a boolean option from JSON or the environment.
+
+    Booleans and numbers are used as is, strings such as "true", "off" or
+    "0" are parsed, and anything else (including None) gives ``default``.
+    """
+    if isinstance(value, (bool, int, float)):
+        return bool(value)
+    if isinstance(value, str):
+        normalized = value.strip().lower()
+        if normalized in _TRUE_VALUES:
+            return True
+        if normalized in _FALSE_VALUES:
+            return False
+    return default
+
+
+def coalescing_options(payload):
+    """
+    Read per-request coalescing options from an invocation payload.
+
+    Payload keys: ``coalesce`` (a bool, or a string such as "false"),
+    ``stream_flush_ms`` and ``stream_flush_bytes``.
+
+    Returns:
+        dict | None: Keyword arguments for coalesce_tokens, or None to opt out
+    """
+    default = parse_flag(os.getenv("STREAM_COALESCE", "true"), True)
+    enabled = parse_flag(payload.get("coalesce"), default)
+    flush_ms = float(payload.get("stream_flush_ms", DEFAULT_FLUSH_MS))
+    if not enabled or flush_ms <= 0:
+        return None
+    return {
+        "flush_ms": flush_ms,
+        "flush_bytes": int(payload.get("stream_flush_bytes", DEFAULT_FLUSH_BYTES)),
+    }
+
+
+async def coalesce_tokens(events, flush_ms=DEFAULT_FLUSH_MS, flush_bytes=DEFAULT_FLUSH_BYTES, stats=None):
+    """
+    Merge ``{"type": "token"}`` events from an async iterator into larger frames.
+
+    The source is consumed by a single pump task, so a flush deadline can fire
+    while the model is paused (for example during a tool call).
+
+    Args:
+        events: Async iterator of UI event dicts
+        flush_ms (float): Maximum time in milliseconds a token is buffered
+        flush_bytes (int): Buffered UTF-8 size that triggers an immediate flush
+        stats (StreamStats): Optional per-stream counters to update
+
+    Yields:
+        dict: Coalesced token events and every other event unchanged
+    """
+    stats = stats or StreamStats()
+    queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for event in events:
+                await queue.put(event)
+        except BaseException as e:
+            await queue.put(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            await queue.put(_DONE)
+
+    pump_task = asyncio.create_task(pump())
+    loop = asyncio.get_running_loop()
+    buffer = []
+    buffered_bytes = 0
+    deadline = None
+
+    def flush():
+        nonlocal buffer, buffered_bytes, deadline
+        text = "".join(buffer)
+        stats.record_frame(text, len(buffer))
+        buffer, buffered_bytes, deadline = [], 0, None
+        return {"type": "token", "text": text}
+
+    try:
+        while True:
+            if buffer:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    yield flush()
+                    continue
+            else:
+                item = await queue.get()
+
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+
+            if item.get("type") == "token" and isinstance(item.get("text"), str):
+                if not buffer:
+                    deadline = loop.time() + flush_ms / 1000.0
+                buffer.append(item["text"])
+                buffered_bytes += len(item["text"].encode("utf-8"))
+                if buffered_bytes >= flush_bytes:
+                    yield flush()
+            else:
+                if buffer:
+                    yield flush()
+                yield item
+
+        if buffer:
+            yield flush()
+    finally:
+        if not pump_task.done():
+            pump_task.cancel()
+            try:
+                await pump_task
+            except BaseException:
+                pass
+        stats.finish()
+        if stats is not STREAM_STATS:
+            STREAM_STATS.merge(stats)
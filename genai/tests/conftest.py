@@ -0,0 +1,58 @@
+"""
+Shared fixtures for the genai test suite.
+
+The tests run against the local fakes (InMemoryS3Client in
+benchmarks/fake_s3.py, the hashing embedder and the fake Bedrock clients in
+benchmarks/fake_bedrock.py), so they need no AWS credentials or network
+access. Run them from genai/:
+
+    uv run --group dev pytest
+"""
+
+import os
+
+# Never reach for real credentials or the instance metadata service
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_EC2_METADATA_DISABLED", "true")
+# Importing the servers must not build real clients and agents in the background
+os.environ["WARMUP"] = "false"
+
+import pytest
+
+import aws_clients
+from tools.kb_cache import KB_CACHE
+
+
+@pytest.fixture(autouse=True)
+def isolated_clients():
+    """Give every test fresh pooled clients and an empty KB cache."""
+    aws_clients.reset_clients()
+    if KB_CACHE is not None:
+        KB_CACHE.clear()
+    yield
+    aws_clients.reset_clients()
+    if KB_CACHE is not None:
+        KB_CACHE.clear()
+
+
+@pytest.fixture
+def fake_model():
+    """Fast FakeBedrockModel without tool calls."""
+    from benchmarks.fake_bedrock import FakeBedrockModel
+    return FakeBedrockModel(ttft_ms=0.0, tokens_per_second=0.0, response_tokens=5, jitter=0.0, use_tools=False)
+
+
+@pytest.fixture
+def fake_bedrock():
+    """Route model, KB and S3 traffic to the benchmark fakes; restore the model factory after."""
+    import agent_config
+    from agent_pool import AGENT_POOL
+    from benchmarks.fake_bedrock import install_fakes
+
+    fakes = install_fakes(ttft_ms=0.0, tokens_per_second=0.0, response_tokens=20, jitter=0.0, use_tools=False,
+                          kb_latency_ms=0.0, s3_latency_ms=0.0)
+    yield fakes
+    agent_config.set_model_factory(None)
+    AGENT_POOL.clear()
@@ -0,0 +1,101 @@
+"""FastAPI server end to end against the fake model."""
+
+import asyncio
+
+import httpx
+import pytest
+
+import agent_fastapi
+from conversation import schedule_summary
+from session_router import SessionRouter
+
+
+@pytest.fixture
+def router(fake_bedrock, monkeypatch):
+    router = SessionRouter()
+    monkeypatch.setattr(agent_fastapi, "session_router", router)
+    return router
+
+
+async def ask(client, prompt, session_id="s1"):
+    response = await client.post("/invocations", json={"input": {"prompt": prompt, "session_id": session_id}})
+    response.raise_for_status()
+    return response.text
+
+
+def run_turns(prompts, session_id="s1"):
+    async def main():
+        transport = httpx.ASGITransport(app=agent_fastapi.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await ask(client, prompt, session_id) for prompt in prompts]
+    return asyncio.run(main())
+
+
+def schedule_and_wait(agent):
+    # Wait for the summary so the next turn deterministically picks it up
+    job = schedule_summary(agent)
+    if job is not None:
+        job.result(timeout=10)
+    return job
+
+
+def test_turns_stream_the_answer_and_free_the_session(router):
+    answers = run_turns(["hello", "and again"])
+
+    assert all(answer.startswith("tok0 ") for answer in answers)
+    stats = router.stats()
+    assert (stats["sessions"], stats["active"], stats["completed"]) == (1, 0, 2)
+
+
+def test_evicted_turns_are_summarized_into_the_live_history(router, monkeypatch):
+    # The smallest budget, so every third turn or so is evicted
+    monkeypatch.setenv("CONVERSATION_MAX_TOKENS", "1")
+    monkeypatch.setattr(agent_fastapi, "schedule_summary", schedule_and_wait)
+    long_prompt = "Tell me about monetary policy. " * 150
+
+    run_turns([long_prompt, long_prompt, long_prompt])
+    run_turns(["one more question"])
+
+    agent = next(iter(router._sessions.values())).agent
+    manager = agent.conversation_manager
+    assert manager.summary
+    assert agent.messages[0]["content"][0]["text"].startswith("Summary of our conversation so far:")
+    assert manager.pending_count == 0
+
+
+def open_stream(prompt, session_id="s1"):
+    request = agent_fastapi.InvocationRequest(input={"prompt": prompt, "session_id": session_id})
+    return agent_fastapi.invoke_agent_stream(request)
+
+
+def test_disconnect_keeps_the_lease_until_the_turn_is_recorded(router):
+    async def main():
+        response = await open_stream("hello")
+        body = response.body_iterator
+        await body.__anext__()
+        # The client went away while the stream was suspended: Starlette runs
+        # the background task before the generator is finalized
+        await response.background()
+        assert router.stats()["active"] == 1
+        await body.aclose()
+        for _ in range(50):
+            if router.stats()["active"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        return next(iter(router._sessions.values())).agent
+
+    agent = asyncio.run(main())
+
+    assert router.stats()["active"] == 0
+    assert agent.messages[-1]["role"] == "assistant"
+
+
+def test_stream_that_never_starts_releases_the_lease(router):
+    async def main():
+        response = await open_stream("hello")
+        await response.background()
+        await response.body_iterator.aclose()
+
+    asyncio.run(main())
+
+    assert router.stats()["active"] == 0
@@ -0,0 +1,101 @@
+"""Warm agent resource pool (agent_pool.py)."""
+
+import pytest
+
+import agent_config
+import agent_pool
+import personalities
+from agent_pool import AgentResourcePool, get_pooled_agent
+from model_router import AUTO_MODEL, router_tiers
+
+MICRO, PRO, PREMIER = "us.amazon.nova-micro-v1:0", "us.amazon.nova-pro-v1:0", "us.amazon.nova-premier-v1:0"
+
+
+@pytest.fixture
+def pool(fake_model, monkeypatch):
+    """An AGENT_POOL_SIZE=2 pool whose models are the fake model; counts model builds."""
+    monkeypatch.setenv("AGENT_POOL_SIZE", "2")
+    pool = AgentResourcePool(max_size=2)
+    monkeypatch.setattr(agent_pool, "AGENT_POOL", pool)
+    pool.builds = []
+    agent_config.set_model_factory(lambda model_config: pool.builds.append(model_config["model_id"]) or fake_model)
+    # Agents also get the shared summary model; build it before counting
+    agent_config.summary_model()
+    pool.builds.clear()
+    yield pool
+    agent_config.set_model_factory(None)
+
+
+def counters(pool):
+    stats = pool.stats()
+    return stats["hits"], stats["misses"], stats["evictions"], stats["size"]
+
+
+def test_warm_entries_are_reused(pool):
+    first = pool.get(MICRO, "basic")
+
+    assert pool.get(MICRO, "basic") is first
+    assert counters(pool) == (1, 1, 0, 1)
+    assert pool.stats()["hit_rate"] == 0.5
+    assert pool.builds == [MICRO]
+
+
+def test_least_recently_used_entry_is_evicted(pool):
+    pool.get(MICRO, "basic")
+    pool.get(PRO, "basic")
+    pool.get(MICRO, "basic")  # PRO is now the least recently used
+    pool.get(PREMIER, "basic")
+
+    assert counters(pool) == (1, 3, 1, 2)
+    pool.get(MICRO, "basic")
+    pool.get(PRO, "basic")
+    assert pool.builds == [MICRO, PRO, PREMIER, PRO]
+
+
+def test_custom_prompts_get_their_own_entries(pool):
+    basic = pool.get(MICRO, "basic")
+    custom = pool.get(MICRO, "You are a terse assistant.")
+
+    assert custom is not basic
+    assert custom.system_prompt == "You are a terse assistant."
+    assert pool.get(MICRO, "You are a terse assistant.") is custom
+
+
+def test_registry_reload_misses_the_old_entries(pool, monkeypatch):
+    before = pool.get(MICRO, "basic")
+    current = personalities.get_registry()
+    reloaded = personalities.PersonalityRegistry.from_file(current.source, version=current.version + 1)
+    monkeypatch.setattr(personalities, "_registry", reloaded)
+
+    after = pool.get(MICRO, "basic")
+
+    assert after is not before
+    assert after.registry_version == current.version + 1
+    assert counters(pool)[:2] == (0, 2)
+
+
+def test_auto_agents_are_built_on_the_cheapest_tier(pool):
+    agent = get_pooled_agent(model=AUTO_MODEL, personality="basic")
+
+    assert pool.builds == [router_tiers()[0]]
+    assert pool.get(router_tiers()[0], "basic").bedrock_model is agent.model
+    assert counters(pool)[:2] == (1, 1)
+
+
+def test_pooled_agents_share_resources_but_not_history(pool):
+    first = get_pooled_agent(model=MICRO, personality="basic")
+    second = get_pooled_agent(model=MICRO, personality="basic")
+
+    assert first.model is second.model
+    assert first.conversation_manager is not second.conversation_manager
+    first.messages.append({"role": "user", "content": [{"text": "hi"}]})
+    assert second.messages == []
+
+
+def test_clear_resets_entries_and_counters(pool):
+    pool.get(MICRO, "basic")
+    pool.get(MICRO, "basic")
+
+    pool.clear()
+
+    assert counters(pool) == (0, 0, 0, 0)
@@ -0,0 +1,120 @@
+"""Non-blocking queue handler and per-template rate limiting (app_logging.py)."""
+
+import json
+import logging
+import queue
+import types
+
+import pytest
+
+import app_logging
+from app_logging import DroppingQueueHandler, JsonFormatter, RateLimitFilter
+
+
+def record(msg="KB search %s", level=logging.INFO, name="tools.kb_tool", **extra):
+    item = logging.LogRecord(name, level, __file__, 1, msg, ("fomc",), None)
+    item.__dict__.update(extra)
+    return item
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(app_logging, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def handler_logger():
+    """A logger writing only through a DroppingQueueHandler with a two-record queue."""
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    logger = logging.getLogger("tests.app_logging")
+    logger.handlers, logger.propagate = [handler], False
+    logger.setLevel(logging.INFO)
+    yield logger, handler
+    logger.handlers, logger.propagate = [], True
+
+
+def test_full_queue_drops_records_without_blocking(handler_logger):
+    logger, handler = handler_logger
+
+    for i in range(5):
+        logger.info("event %d", i)
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+    assert [handler.queue.get_nowait().getMessage() for _ in range(2)] == ["event 0", "event 1"]
+
+
+def test_records_are_queued_unformatted(handler_logger):
+    logger, handler = handler_logger
+
+    logger.info("event %s", "one", extra={"session_id": "s1"})
+
+    queued = handler.queue.get_nowait()
+    # Formatting is left to the listener thread
+    assert (queued.msg, queued.args, queued.session_id) == ("event %s", ("one",), "s1")
+    assert handler.dropped == 0
+
+
+def test_repeats_beyond_the_limit_are_suppressed(clock):
+    limit = RateLimitFilter(limit=3, window_seconds=10)
+
+    assert [limit.filter(record()) for _ in range(5)] == [True, True, True, False, False]
+
+
+def test_next_window_reports_the_suppressed_count(clock):
+    limit = RateLimitFilter(limit=2, window_seconds=10)
+    for _ in range(6):
+        limit.filter(record())
+
+    clock[0] += 9.9
+    assert not limit.filter(record())
+
+    clock[0] += 0.1
+    summary = record()
+    assert limit.filter(summary)
+    assert summary.suppressed == 5
+    assert json.loads(JsonFormatter().format(summary))["suppressed"] == 5
+
+    # The count is reported once
+    clock[0] += 10
+    later = record()
+    assert limit.filter(later)
+    assert not hasattr(later, "suppressed")
+
+
+def test_templates_levels_and_loggers_are_limited_separately(clock):
+    limit = RateLimitFilter(limit=1, window_seconds=10)
+
+    assert limit.filter(record())
+    assert not limit.filter(record())
+    assert limit.filter(record(msg="KB timeout %s"))
+    assert limit.filter(record(level=logging.WARNING))
+    assert limit.filter(record(name="agent"))
+
+
+def test_records_can_opt_out_of_rate_limiting(clock):
+    limit = RateLimitFilter(limit=1, window_seconds=10)
+    limit.filter(record())
+
+    assert limit.filter(record(_rate_limit=False))
+    assert not limit.filter(record())
+
+
+def test_zero_limit_disables_rate_limiting(clock):
+    limit = RateLimitFilter(limit=0, window_seconds=10)
+
+    assert all(limit.filter(record()) for _ in range(50))
+
+
+def test_suppressed_records_never_reach_the_queue(handler_logger, clock):
+    logger, handler = handler_logger
+    handler.addFilter(RateLimitFilter(limit=1, window_seconds=10))
+
+    for _ in range(3):
+        logger.info("retrying %s", "fomc")
+
+    assert handler.queue.qsize() == 1
+    # Suppression happens before the queue, so nothing counts as dropped
+    assert handler.dropped == 0
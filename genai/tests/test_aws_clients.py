@@ -0,0 +1,114 @@
+"""Pooled boto3 session and client reuse (aws_clients)."""
+
+import threading
+import time
+
+import boto3
+
+import agent_config
+import aws_clients
+from benchmarks.fake_bedrock import FakeKnowledgeBaseClient
+from tools.kb_retrieve import retrieve_results
+
+
+def test_get_client_reuses_one_client_per_service_and_region():
+    first = aws_clients.get_client("s3", region_name="us-east-1")
+
+    assert aws_clients.get_client("s3", region_name="us-east-1") is first
+    assert aws_clients.get_client("s3", region_name="us-west-2") is not first
+    assert aws_clients.get_client("bedrock-agent-runtime", region_name="us-east-1") is not first
+
+
+def test_clients_share_the_pooled_config():
+    client = aws_clients.get_client("bedrock-agent-runtime")
+
+    assert client.meta.config.max_pool_connections == aws_clients.client_config().max_pool_connections
+    assert client.meta.config.tcp_keepalive is True
+
+
+def test_endpoint_url_gets_its_own_client():
+    default = aws_clients.get_client("bedrock-agent-runtime")
+    stub = aws_clients.get_client("bedrock-agent-runtime", endpoint_url="http://127.0.0.1:9999")
+
+    assert stub is not default
+    assert stub.meta.endpoint_url == "http://127.0.0.1:9999"
+    assert aws_clients.get_client("bedrock-agent-runtime", endpoint_url="http://127.0.0.1:9999") is stub
+
+
+def test_boto_session_is_shared():
+    assert aws_clients.get_boto_session("us-east-1") is aws_clients.get_boto_session("us-east-1")
+
+
+def test_concurrent_first_calls_build_one_client():
+    clients = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        clients.append(aws_clients.get_client("s3"))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(client) for client in clients}) == 1
+
+
+def test_models_built_on_many_threads_share_one_client(monkeypatch):
+    # Session.client is not thread-safe, so creation must never overlap
+    active, overlaps = [0], []
+    create_client = boto3.Session.client
+
+    def tracking_client(self, *args, **kwargs):
+        active[0] += 1
+        overlaps.append(active[0])
+        time.sleep(0.02)
+        try:
+            return create_client(self, *args, **kwargs)
+        finally:
+            active[0] -= 1
+
+    monkeypatch.setattr(boto3.Session, "client", tracking_client)
+    models = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        models.append(agent_config.bedrock_model_factory(agent_config.model_config("us.amazon.nova-pro-v1:0")))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(models) == 8
+    assert max(overlaps) == 1
+    assert {id(model.client) for model in models} == {id(aws_clients.get_client("bedrock-runtime"))}
+
+
+def test_pooled_client_session_hands_out_pooled_clients():
+    session = aws_clients.PooledClientSession("us-east-1")
+
+    assert session.client("s3") is aws_clients.get_client("s3", region_name="us-east-1")
+    assert session.client("s3", region_name="us-west-2") is aws_clients.get_client("s3", region_name="us-west-2")
+
+
+def test_reset_clients_rebuilds():
+    first = aws_clients.get_client("s3")
+    aws_clients.reset_clients()
+
+    assert aws_clients.get_client("s3") is not first
+
+
+def test_kb_retrieval_uses_the_registered_client():
+    fake = FakeKnowledgeBaseClient(latency_ms=0.0, results=3)
+    aws_clients.register_client("bedrock-agent-runtime", fake)
+
+    results = retrieve_results("KB1", "rate hike", number_of_results=3, min_score=0.0)
+    retrieve_results("KB1", "balance sheet", number_of_results=3, min_score=0.0)
+
+    assert fake.calls == 2
+    assert [r["score"] for r in results] == [0.9, 0.8, 0.7]
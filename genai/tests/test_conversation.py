@@ -0,0 +1,173 @@
+"""Token-budget conversation trimming."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from conversation import (CHARS_PER_TOKEN, RollingSummaryConversationManager, TokenBudgetConversationManager,
+                          conversation_manager_for, estimate_message_tokens, schedule_summary, summary_due,
+                          token_budget_for_model)
+
+
+def text(role, chars):
+    return {"role": role, "content": [{"text": "x" * chars}]}
+
+
+def tool_use(tool_id):
+    return {"role": "assistant", "content": [{"toolUse": {"toolUseId": tool_id, "name": "kb", "input": {}}}]}
+
+
+def tool_result(tool_id, chars):
+    return {"role": "user", "content": [{"toolResult": {"toolUseId": tool_id, "status": "success",
+                                                        "content": [{"text": "r" * chars}]}}]}
+
+
+def turn(chars):
+    return [text("user", chars), text("assistant", chars)]
+
+
+def test_estimate_counts_characters_plus_overhead():
+    assert estimate_message_tokens(text("user", 400)) == 4 + 400 // CHARS_PER_TOKEN
+    assert estimate_message_tokens(tool_result("t1", 800)) == 4 + 800 // CHARS_PER_TOKEN
+
+
+def test_history_within_budget_is_kept():
+    manager = TokenBudgetConversationManager(token_budget=1000)
+    agent = SimpleNamespace(messages=turn(400) + turn(400))
+
+    manager.apply_management(agent)
+
+    assert len(agent.messages) == 4
+    assert manager.removed_message_count == 0
+
+
+def test_oldest_turns_are_dropped_to_fit():
+    manager = TokenBudgetConversationManager(token_budget=450)
+    messages = turn(400) + turn(400) + turn(400)
+    agent = SimpleNamespace(messages=list(messages))
+
+    manager.apply_management(agent)
+
+    # Each turn is about 208 tokens, so two turns fit
+    assert agent.messages == messages[2:]
+    assert manager.removed_message_count == 2
+
+
+def test_trimming_never_separates_a_tool_call_from_its_result():
+    manager = TokenBudgetConversationManager(token_budget=200)
+    messages = turn(400) + [text("user", 40), tool_use("t1"), tool_result("t1", 1200), text("assistant", 40)]
+    agent = SimpleNamespace(messages=list(messages))
+
+    manager.apply_management(agent)
+
+    # The tool turn alone is over budget, but a cut inside it would orphan
+    # the tool result, so the whole turn is kept
+    assert agent.messages[0]["role"] == "user"
+    assert "toolResult" not in agent.messages[0]["content"][0]
+    assert agent.messages == messages[2:]
+
+
+def test_message_cap_applies_whatever_the_size():
+    manager = TokenBudgetConversationManager(token_budget=100000, max_messages=4)
+    messages = turn(10) + turn(10) + turn(10)
+    agent = SimpleNamespace(messages=list(messages))
+
+    manager.apply_management(agent)
+
+    assert agent.messages == messages[2:]
+
+
+def test_token_counts_are_cached_per_message():
+    manager = TokenBudgetConversationManager(token_budget=1000)
+    message = text("user", 400)
+
+    assert manager.message_tokens(message) == manager.message_tokens(message)
+    assert manager._token_cache[id(message)][0] is message
+
+
+def test_budget_is_capped_by_the_context_window(monkeypatch):
+    monkeypatch.setenv("CONVERSATION_MAX_TOKENS", "1000000")
+
+    assert token_budget_for_model("us.amazon.nova-micro-v1:0", 2000) == 128000 - 2000 - 4096
+
+
+@pytest.mark.parametrize("configured, expected", [("12000", TokenBudgetConversationManager), ("0", None)])
+def test_conversation_manager_for(monkeypatch, configured, expected):
+    monkeypatch.setenv("CONVERSATION_MAX_TOKENS", configured)
+
+    manager = conversation_manager_for("us.amazon.nova-micro-v1:0", 2000)
+
+    if expected is None:
+        assert manager.window_size == 10
+        assert not isinstance(manager, TokenBudgetConversationManager)
+    else:
+        assert isinstance(manager, expected)
+        assert manager.token_budget == 12000
+
+
+class FakeSummaryModel:
+    """Summary model that answers with a fixed text and records its prompts."""
+
+    def __init__(self, summary="The user asked about rate hikes."):
+        self.summary = summary
+        self.prompts = []
+
+    async def stream(self, messages, system_prompt=None, **kwargs):
+        self.prompts.append(messages[-1]["content"][0]["text"])
+        yield {"contentBlockDelta": {"delta": {"text": self.summary}}}
+
+
+def rolling_agent(budget=450):
+    manager = RollingSummaryConversationManager(token_budget=budget, summary_model=FakeSummaryModel())
+    return SimpleNamespace(messages=turn(400) + turn(400) + turn(400), conversation_manager=manager)
+
+
+def test_evicted_turns_are_queued_and_summarized():
+    agent = rolling_agent()
+    manager = agent.conversation_manager
+
+    manager.apply_management(agent)
+
+    assert summary_due(agent)
+    assert manager.pending_count == 2
+    assert schedule_summary(agent).result(timeout=5)
+    assert manager.summary == "The user asked about rate hikes."
+    assert manager.pending_count == 0
+    assert not summary_due(agent)
+
+
+def test_apply_summary_puts_the_latest_summary_in_front_once():
+    agent = rolling_agent()
+    manager = agent.conversation_manager
+    manager.apply_management(agent)
+    schedule_summary(agent).result(timeout=5)
+    recent = list(agent.messages)
+
+    assert manager.apply_summary(agent)
+    assert not manager.apply_summary(agent)
+    assert agent.messages[2:] == recent
+    assert "rate hikes" in agent.messages[0]["content"][0]["text"]
+    assert agent.messages[1]["role"] == "assistant"
+
+    # A newer summary replaces the old pair instead of stacking on it
+    manager.summary = "The user asked about rate hikes and the balance sheet."
+    assert manager.apply_summary(agent)
+    assert len(agent.messages) == len(recent) + 2
+    assert "balance sheet" in agent.messages[0]["content"][0]["text"]
+
+
+def test_summary_stays_in_front_when_later_turns_are_trimmed():
+    agent = rolling_agent()
+    manager = agent.conversation_manager
+    manager.apply_management(agent)
+    schedule_summary(agent).result(timeout=5)
+    manager.apply_summary(agent)
+    summary_pair = agent.messages[:2]
+
+    newest = turn(400)
+    agent.messages.extend(newest)
+    manager.apply_management(agent)
+
+    # The summary pair counts against the budget, so only the newest turn is left
+    assert agent.messages == summary_pair + newest
+    assert manager.pending_count == 4
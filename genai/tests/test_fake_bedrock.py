@@ -0,0 +1,31 @@
+"""The benchmark fakes behave like the Bedrock pieces they replace."""
+
+from typing import Literal, Optional
+
+from pydantic import BaseModel
+from strands import Agent
+
+
+class Citation(BaseModel):
+    uri: str
+    page: int
+
+
+class Answer(BaseModel):
+    text: str
+    confidence: float
+    sources: list[Citation]
+    citation: Citation
+    kind: Literal["fact", "opinion"]
+    note: Optional[str]
+    verified: bool = True
+
+
+def test_structured_output_returns_the_requested_model(fake_model):
+    agent = Agent(model=fake_model, callback_handler=None)
+
+    answer = agent.structured_output(Answer, "When did the Fed last raise rates?")
+
+    assert isinstance(answer, Answer)
+    assert answer.citation == Citation(uri="fake", page=0)
+    assert (answer.kind, answer.note, answer.verified, answer.sources) == ("fact", None, True, [])
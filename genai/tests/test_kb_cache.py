@@ -0,0 +1,165 @@
+"""TTL + LRU retrieval cache with its SQLite disk tier (tools/kb_cache.py)."""
+
+import types
+
+import aws_clients
+from benchmarks.fake_bedrock import FakeKnowledgeBaseClient
+from tools import kb_cache, kb_retrieve, kb_semantic_cache
+from tools.kb_cache import RetrievalCache, normalize_query
+
+
+def results(label, size=10):
+    return [{"content": {"text": label * size}, "score": 0.5}]
+
+
+def frozen_clock(monkeypatch, start=1000.0):
+    now = [start]
+    monkeypatch.setattr(kb_cache, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_keys_normalize_text_count_and_score():
+    key = RetrievalCache.make_key("KB1", "  What was the Fed's RATE decision?? ", "5", 0.400001)
+
+    assert key == ("KB1", "what was the fed's rate decision", 5, 0.4)
+    assert key == RetrievalCache.make_key("KB1", "what was the fed's rate decision", 5, 0.4)
+    assert key != RetrievalCache.make_key("KB1", "what was the fed's rate decision", 6, 0.4)
+    assert key != RetrievalCache.make_key("KB1", "what was the fed's rate decision", 5, 0.41)
+    assert key != RetrievalCache.make_key("KB2", "what was the fed's rate decision", 5, 0.4)
+
+
+def test_normalize_query_folds_unicode_and_spacing():
+    assert normalize_query("ＦＯＭＣ\tMinutes\n2015!") == "fomc minutes 2015"
+
+
+def test_hits_return_copies():
+    cache = RetrievalCache()
+    key = cache.make_key("KB1", "rate hike", 5, 0.4)
+    cache.put(key, results("a"))
+
+    first = cache.get(key)
+    first[0]["score"] = 0.0
+
+    assert cache.get(key) == results("a")
+    assert cache.stats()["hits"] == 2
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = frozen_clock(monkeypatch)
+    cache = RetrievalCache(ttl_seconds=60)
+    key = cache.make_key("KB1", "rate hike", 5, 0.4)
+    cache.put(key, results("a"))
+
+    now[0] += 59
+    assert cache.get(key) == results("a")
+    now[0] += 2
+    assert cache.get(key) is None
+
+    stats = cache.stats()
+    assert (stats["expirations"], stats["misses"], stats["entries"], stats["bytes"]) == (1, 1, 0, 0)
+
+
+def test_byte_limit_evicts_least_recently_used_first():
+    entry_bytes = len(kb_cache.json.dumps(results("a")).encode("utf-8"))
+    cache = RetrievalCache(max_bytes=entry_bytes * 3)
+    keys = [cache.make_key("KB1", f"query {i}", 5, 0.4) for i in range(4)]
+    for key, label in zip(keys[:3], "abc"):
+        cache.put(key, results(label))
+
+    # Touch the oldest entry so the second one becomes least recently used
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[3], results("d"))
+
+    assert cache.get(keys[1]) is None
+    assert all(cache.get(key) is not None for key in (keys[0], keys[2], keys[3]))
+    stats = cache.stats()
+    assert (stats["evictions"], stats["entries"], stats["bytes"]) == (1, 3, entry_bytes * 3)
+
+
+def test_entries_larger_than_the_cache_are_not_kept():
+    cache = RetrievalCache(max_bytes=16)
+    key = cache.make_key("KB1", "rate hike", 5, 0.4)
+    cache.put(key, results("a", size=100))
+
+    assert cache.get(key) is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "cache" / "kb.sqlite")
+    key = RetrievalCache.make_key("KB1", "rate hike", 5, 0.4)
+    RetrievalCache(disk_path=path).put(key, results("a"))
+
+    restarted = RetrievalCache(disk_path=path)
+
+    assert restarted.get(key) == results("a")
+    assert restarted.get(key) == results("a")
+    stats = restarted.stats()
+    # The first lookup is read from disk, then served from memory
+    assert (stats["disk_hits"], stats["hits"], stats["misses"]) == (1, 1, 0)
+
+
+def test_expired_disk_entries_are_dropped(tmp_path, monkeypatch):
+    now = frozen_clock(monkeypatch)
+    path = str(tmp_path / "kb.sqlite")
+    key = RetrievalCache.make_key("KB1", "rate hike", 5, 0.4)
+    RetrievalCache(ttl_seconds=60, disk_path=path).put(key, results("a"))
+
+    now[0] += 120
+    restarted = RetrievalCache(disk_path=path)
+
+    assert restarted.get(key) is None
+    assert restarted._db.execute("SELECT COUNT(*) FROM kb_cache").fetchone()[0] == 0
+
+
+def test_clear_empties_memory_and_disk(tmp_path):
+    path = str(tmp_path / "kb.sqlite")
+    cache = RetrievalCache(disk_path=path)
+    key = cache.make_key("KB1", "rate hike", 5, 0.4)
+    cache.put(key, results("a"))
+
+    cache.clear()
+
+    assert cache.get(key) is None
+    assert RetrievalCache(disk_path=path).get(key) is None
+
+
+def test_env_configures_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("KB_CACHE_MAX_BYTES", "2048")
+    monkeypatch.setenv("KB_CACHE_TTL_SECONDS", "30")
+    monkeypatch.setenv("KB_CACHE_PATH", str(tmp_path / "kb.sqlite"))
+
+    cache = kb_cache._cache_from_env()
+
+    assert (cache.max_bytes, cache.ttl_seconds, cache._db is not None) == (2048, 30.0, True)
+
+
+def test_env_can_disable_the_cache(monkeypatch):
+    monkeypatch.setenv("KB_CACHE_ENABLED", "false")
+
+    assert kb_cache._cache_from_env() is None
+
+
+def test_retrievals_skip_a_disabled_cache(monkeypatch):
+    monkeypatch.setattr(kb_retrieve, "KB_CACHE", None)
+    monkeypatch.setattr(kb_semantic_cache, "_semantic_cache", None)
+    fake = FakeKnowledgeBaseClient(latency_ms=0.0, results=3)
+    aws_clients.register_client("bedrock-agent-runtime", fake)
+
+    kb_retrieve.retrieve_results("KB1", "rate hike", number_of_results=3, min_score=0.0)
+    kb_retrieve.retrieve_results("KB1", "rate hike", number_of_results=3, min_score=0.0)
+
+    assert fake.calls == 2
+
+
+def test_retrievals_are_served_from_the_cache(monkeypatch):
+    monkeypatch.setattr(kb_retrieve, "KB_CACHE", RetrievalCache())
+    monkeypatch.setattr(kb_semantic_cache, "_semantic_cache", None)
+    fake = FakeKnowledgeBaseClient(latency_ms=0.0, results=3)
+    aws_clients.register_client("bedrock-agent-runtime", fake)
+
+    first = kb_retrieve.retrieve_results("KB1", "Rate hike?", number_of_results=3, min_score=0.0)
+    second = kb_retrieve.retrieve_results("KB1", "rate  hike", number_of_results=3, min_score=0.0)
+
+    assert fake.calls == 1
+    assert second == first
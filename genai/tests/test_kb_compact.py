@@ -0,0 +1,153 @@
+"""Deduplication, overlap trimming and budget packing of KB results (tools/kb_compact.py)."""
+
+import copy
+
+from tools.kb_compact import MIN_PARTIAL_TOKENS, compact_results, estimate_tokens
+
+
+def words(prefix, start, stop):
+    return " ".join(f"{prefix}{i}" for i in range(start, stop))
+
+
+def result(text, uri=None, score=0.5):
+    item = {"content": {"text": text}, "score": score}
+    if uri:
+        item["location"] = {"s3Location": {"uri": uri}}
+    return item
+
+
+def location(item):
+    return item.get("location", {}).get("s3Location", {}).get("uri")
+
+
+def test_duplicates_merge_into_the_best_result_with_every_source():
+    passage = words("w", 0, 60)
+    results = [result(passage, "s3://a", 0.9), result(passage, "s3://b", 0.8), result(passage, "s3://c", 0.7)]
+    original = copy.deepcopy(results)
+
+    compacted, stats = compact_results(results, location_fn=location)
+
+    assert len(compacted) == 1
+    assert compacted[0]["score"] == 0.9
+    assert compacted[0]["additionalLocations"] == ["s3://b", "s3://c"]
+    assert stats["duplicates"] == 2
+    # Cached results are shared, so the input is never modified
+    assert results == original
+
+
+def test_near_duplicates_merge_at_the_similarity_threshold():
+    passage = words("w", 0, 100)
+    reworded = passage.replace("w99", "changed")
+    results = [result(passage, "s3://a"), result(reworded, "s3://b")]
+
+    merged, _ = compact_results(results, similarity_threshold=0.85, location_fn=location)
+    kept, _ = compact_results(results, similarity_threshold=0.999, location_fn=location)
+
+    assert len(merged) == 1 and merged[0]["additionalLocations"] == ["s3://b"]
+    assert len(kept) == 2
+
+
+def test_passages_contained_in_a_kept_one_are_duplicates():
+    results = [result(words("w", 0, 80), "s3://a"), result(words("w", 20, 40), "s3://b")]
+
+    compacted, stats = compact_results(results, location_fn=location)
+
+    assert len(compacted) == 1
+    assert stats["duplicates"] == 1
+
+
+def test_duplicates_from_the_same_source_add_no_citation():
+    passage = words("w", 0, 60)
+
+    compacted, _ = compact_results([result(passage, "s3://a"), result(passage, "s3://a")], location_fn=location)
+
+    assert "additionalLocations" not in compacted[0]
+
+
+def test_distinct_passages_are_kept_in_order():
+    results = [result(words("a", 0, 40)), result(words("b", 0, 40)), result(words("c", 0, 40))]
+
+    compacted, stats = compact_results(results)
+
+    assert compacted == results
+    assert (stats["duplicates"], stats["trimmed_overlaps"], stats["results_out"]) == (0, 0, 3)
+
+
+def test_chunk_overlap_with_the_same_document_is_trimmed():
+    results = [result(words("w", 0, 40), "s3://doc", 0.9), result(words("w", 30, 70), "s3://doc", 0.8)]
+
+    compacted, stats = compact_results(results, location_fn=location)
+
+    assert compacted[1]["content"]["text"] == "[...] " + words("w", 40, 70)
+    assert stats["trimmed_overlaps"] == 1
+
+
+def test_trailing_chunk_overlap_is_trimmed():
+    results = [result(words("w", 0, 40), "s3://doc", 0.9),
+               result(words("x", 0, 30) + " " + words("w", 0, 10), "s3://doc", 0.8)]
+
+    compacted, _ = compact_results(results, location_fn=location)
+
+    assert compacted[1]["content"]["text"] == words("x", 0, 30) + " [...]"
+
+
+def test_overlap_across_documents_is_not_trimmed():
+    results = [result(words("w", 0, 40), "s3://one"), result(words("w", 30, 70), "s3://two")]
+
+    compacted, stats = compact_results(results, location_fn=location)
+
+    assert compacted == results
+    assert stats["trimmed_overlaps"] == 0
+
+
+def test_short_repeats_are_not_overlap():
+    results = [result(words("w", 0, 40), "s3://doc"), result(words("w", 35, 70), "s3://doc")]
+
+    compacted, _ = compact_results(results, location_fn=location)
+
+    assert compacted[1] == results[1]
+
+
+def test_results_are_packed_into_the_budget_and_cut_at_a_sentence():
+    first = "x" * 400
+    sentence = "The committee decided to raise the target range. "
+    second = sentence * 20
+    results = [result(first), result(second), result("y" * 400)]
+    budget = estimate_tokens(first) + 150
+
+    compacted, stats = compact_results(results, token_budget=budget)
+
+    assert len(compacted) == 2
+    cut = compacted[1]["content"]["text"]
+    assert cut.endswith("range. [...]")
+    assert len(cut) < len(second)
+    assert stats["tokens_after"] <= budget + 2
+    assert stats["tokens_before"] == sum(estimate_tokens(r["content"]["text"]) for r in results)
+    assert stats["results_out"] == 2
+
+
+def test_long_words_are_cut_at_a_space_without_a_sentence_end():
+    text = " ".join(["word"] * 400)
+
+    compacted, _ = compact_results([result(text)], token_budget=100)
+
+    assert compacted[0]["content"]["text"].endswith("word [...]")
+    assert len(compacted[0]["content"]["text"]) <= 100 * 4 + len(" [...]")
+
+
+def test_too_little_budget_left_drops_the_rest():
+    first = "x" * 400
+    budget = estimate_tokens(first) + MIN_PARTIAL_TOKENS - 1
+
+    compacted, stats = compact_results([result(first), result("y" * 800)], token_budget=budget)
+
+    assert [r["content"]["text"] for r in compacted] == [first]
+    assert stats["tokens_after"] == estimate_tokens(first)
+
+
+def test_no_budget_keeps_everything():
+    results = [result("x" * 4000), result("y" * 4000)]
+
+    compacted, _ = compact_results(results, token_budget=None)
+
+    assert compacted == results
@@ -0,0 +1,125 @@
+"""Local BM25 reranking and the adaptive cutoff (tools/kb_rerank.py)."""
+
+import copy
+
+import pytest
+
+from tools import kb_rerank
+from tools.kb_rerank import bm25_scores, query_terms, rerank_results, term_frequencies
+from tools.kb_retrieve import format_results
+
+
+def result(text, score, uri="s3://doc"):
+    return {"content": {"text": text}, "score": score, "location": {"s3Location": {"uri": uri}}}
+
+
+def texts(results):
+    return [r["content"]["text"] for r in results]
+
+
+def test_query_terms_drop_stopwords_and_repeats():
+    assert list(query_terms(["What is the federal funds rate?", "Rate hikes in 2015"])) == \
+        ["federal", "funds", "rate", "hikes", "2015"]
+
+
+def test_terms_are_counted_as_word_prefixes():
+    normalized = [kb_rerank._normalized_text(result("Rates, rated and the rate; separate.", 0.5))]
+
+    counts, _ = term_frequencies({"rate": 0}, normalized)
+
+    assert counts == [[3]]
+
+
+def test_lexical_overlap_reorders_results():
+    results = [
+        result("The weather in Boston was mild this spring.", 0.60),
+        result("The committee raised the federal funds rate target by a quarter point.", 0.58),
+        result("Markets closed higher on Friday.", 0.59),
+    ]
+
+    kept, stats = rerank_results(results, ["federal funds rate"], relative_cutoff=0.0, max_gap=0, min_keep=1)
+
+    assert texts(kept)[0] == results[1]["content"]["text"]
+    assert [r["rerankScore"] for r in kept] == sorted((r["rerankScore"] for r in kept), reverse=True)
+    assert stats["results_in"] == stats["results_out"] == 3
+
+
+def test_results_without_query_terms_keep_the_kb_order():
+    results = [result("alpha", 0.9), result("beta", 0.8), result("gamma", 0.7)]
+
+    kept, _ = rerank_results(results, ["what is it"], relative_cutoff=0.0, max_gap=0, min_keep=1)
+
+    assert texts(kept) == ["alpha", "beta", "gamma"]
+
+
+def test_relative_cutoff_drops_the_weak_tail():
+    results = [result("a", 0.9), result("b", 0.8), result("c", 0.5), result("d", 0.2)]
+
+    kept, stats = rerank_results(results, ["zzz"], lexical_weight=0.0, relative_cutoff=0.7, max_gap=0, min_keep=1)
+
+    assert texts(kept) == ["a", "b"]
+    assert stats["cutoff"] == pytest.approx(0.63)
+
+
+def test_results_stop_at_a_large_score_gap():
+    results = [result("a", 0.9), result("b", 0.85), result("c", 0.6), result("d", 0.58)]
+
+    kept, _ = rerank_results(results, ["zzz"], lexical_weight=0.0, relative_cutoff=0.0, max_gap=0.2, min_keep=1)
+
+    assert texts(kept) == ["a", "b"]
+
+
+def test_min_keep_overrides_the_cutoff():
+    results = [result("a", 0.9), result("b", 0.2), result("c", 0.1)]
+
+    kept, _ = rerank_results(results, ["zzz"], lexical_weight=0.0, relative_cutoff=0.9, max_gap=0.1, min_keep=2)
+
+    assert texts(kept) == ["a", "b"]
+
+
+def test_few_results_are_returned_unchanged():
+    results = [result("b", 0.2), result("a", 0.9)]
+
+    kept, stats = rerank_results(results, ["anything"], min_keep=2)
+
+    assert kept == results
+    assert stats == {"results_in": 2, "results_out": 2, "cutoff": 0.0}
+
+
+def test_reranking_copies_shared_results():
+    results = [result("rate", 0.9), result("other", 0.8), result("rate rate", 0.7)]
+    original = copy.deepcopy(results)
+
+    kept, _ = rerank_results(results, ["rate"], relative_cutoff=0.0, max_gap=0, min_keep=1)
+
+    assert results == original
+    assert all("rerankScore" in r for r in kept)
+
+
+def test_numpy_and_python_bm25_agree(monkeypatch):
+    pytest.importorskip("numpy")
+    terms = query_terms(["federal funds rate hike inflation"])
+    normalized = [kb_rerank._normalized_text(result(text, 0.5)) for text in (
+        "The federal funds rate was raised to fight inflation.",
+        "Inflation expectations remained anchored; the rate was unchanged.",
+        "A hike in the federal funds rate, the first since 2006, followed.",
+        "Unrelated text about the weather.",
+    )]
+    counts, lengths = term_frequencies(terms, normalized)
+
+    with_numpy = bm25_scores(counts, lengths)
+    monkeypatch.setattr(kb_rerank, "np", None)
+    pure_python = bm25_scores(counts, lengths)
+
+    assert with_numpy == pytest.approx(pure_python)
+    assert pure_python[3] == 0.0
+
+
+def test_formatted_results_show_the_combined_score():
+    results = [result("weather", 0.60), result("federal funds rate", 0.58), result("markets", 0.59)]
+    kept, _ = rerank_results(results, ["federal funds rate"], relative_cutoff=0.0, max_gap=0, min_keep=1)
+
+    formatted = format_results(kept)
+
+    assert f"Score: {kept[0]['rerankScore']:.4f} (retrieval score 0.5800)" in formatted
+    assert formatted.index("federal funds rate") < formatted.index("weather")
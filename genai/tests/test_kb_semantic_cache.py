@@ -0,0 +1,82 @@
+"""Semantic KB query cache with the deterministic hashing embedder."""
+
+import numpy as np
+import pytest
+
+import aws_clients
+from benchmarks.fake_bedrock import FakeKnowledgeBaseClient
+from tools.kb_retrieve import retrieve_results
+from tools.kb_semantic_cache import SemanticCache, hashing_embedder, set_semantic_cache, get_semantic_cache
+
+SCOPE = ("KB1", 5, 0.4)
+RESULTS = [{"content": {"text": "The Committee raised the target range."}, "score": 0.8}]
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(hashing_embedder(256), threshold=0.8, max_bytes=256 * 1024)
+
+
+def test_hashing_embedder_is_deterministic():
+    embed = hashing_embedder(64)
+
+    assert np.array_equal(embed("Fed rate hike in December 2015"), embed("Fed rate hike in December 2015"))
+    assert not np.array_equal(embed("Fed rate hike"), embed("Supreme Court ruling"))
+
+
+def test_lookup_hits_a_near_duplicate(cache):
+    cache.add(SCOPE, "fed rate hike december 2015", RESULTS)
+
+    results, _ = cache.lookup(SCOPE, "December 2015 Fed rate hike")
+
+    assert results == RESULTS
+    assert cache.stats()["hits"] == 1
+
+
+def test_lookup_misses_an_unrelated_query(cache):
+    cache.add(SCOPE, "fed rate hike december 2015", RESULTS)
+
+    results, vector = cache.lookup(SCOPE, "supreme court first amendment ruling")
+
+    assert results is None
+    assert vector.shape == (256,)
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_are_scoped_by_retrieval_settings(cache):
+    cache.add(SCOPE, "fed rate hike december 2015", RESULTS)
+
+    assert cache.lookup(("KB1", 10, 0.4), "fed rate hike december 2015")[0] is None
+    assert cache.lookup(("KB2", 5, 0.4), "fed rate hike december 2015")[0] is None
+
+
+def test_least_recently_used_rows_are_evicted():
+    # Room for two vectors of 64 float32 values plus their payloads
+    cache = SemanticCache(hashing_embedder(64), threshold=0.99, max_bytes=2 * 64 * 4 * 2)
+    assert cache.capacity == 2
+    cache.add(SCOPE, "first query", [])
+    cache.add(SCOPE, "second query", [])
+    cache.lookup(SCOPE, "first query")
+    cache.add(SCOPE, "third query", [])
+
+    assert cache.lookup(SCOPE, "first query")[0] == []
+    assert cache.lookup(SCOPE, "second query")[0] is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_retrieve_results_serves_reworded_queries_from_the_cache(cache):
+    fake = FakeKnowledgeBaseClient(latency_ms=0.0, results=3)
+    aws_clients.register_client("bedrock-agent-runtime", fake)
+    previous = get_semantic_cache()
+    set_semantic_cache(cache)
+    try:
+        first = retrieve_results("KB1", "fed rate hike december 2015", min_score=0.0)
+        # Reordered words miss the exact-match cache but not the semantic one
+        second = retrieve_results("KB1", "december 2015 fed rate hike", min_score=0.0)
+        retrieve_results("KB1", "supreme court first amendment ruling", min_score=0.0)
+    finally:
+        set_semantic_cache(previous)
+
+    assert second == first
+    assert fake.calls == 2
+    assert cache.stats()["hits"] == 1
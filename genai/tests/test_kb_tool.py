@@ -0,0 +1,73 @@
+"""Per-knowledge-base isolation of KB search tools."""
+
+import asyncio
+import threading
+import time
+
+import aws_clients
+from benchmarks.fake_bedrock import FakeKnowledgeBaseClient
+from tools.kb_tool import KnowledgeBaseSearch, KnowledgeBaseSpec
+
+
+class BlockingKnowledgeBaseClient(FakeKnowledgeBaseClient):
+    """Fake client whose retrievals on one knowledge base wait for an event."""
+
+    def __init__(self, blocked_kb):
+        super().__init__(latency_ms=0.0, results=2)
+        self.blocked_kb = blocked_kb
+        self.release = threading.Event()
+
+    def retrieve(self, knowledgeBaseId, retrievalQuery, retrievalConfiguration, **kwargs):
+        if knowledgeBaseId == self.blocked_kb:
+            self.release.wait(10)
+        return super().retrieve(knowledgeBaseId, retrievalQuery, retrievalConfiguration, **kwargs)
+
+
+def batch_call(queries):
+    return {"toolUseId": "t1", "name": "kb", "input": {"queries": queries, "score": 0.0}}
+
+
+def test_busy_knowledge_base_does_not_starve_another_batch():
+    client = BlockingKnowledgeBaseClient("HOT")
+    aws_clients.register_client("bedrock-agent-runtime", client)
+    hot = KnowledgeBaseSearch(KnowledgeBaseSpec("hot_search", "HOT", "busy corpus", max_concurrency=2, rerank=False))
+    cold = KnowledgeBaseSearch(KnowledgeBaseSpec("cold_search", "COLD", "quiet corpus", max_concurrency=2,
+                                                 rerank=False))
+
+    # Enough hot batch calls to fill any shared fan-out pool
+    hot_calls = [threading.Thread(target=hot.search, args=(batch_call([f"hot {i} {j}" for j in range(4)]),))
+                 for i in range(4)]
+    for thread in hot_calls:
+        thread.start()
+    time.sleep(0.1)
+
+    started = time.perf_counter()
+    result = cold.search(batch_call(["rate hike", "balance sheet", "forward guidance"]))
+    elapsed = time.perf_counter() - started
+
+    client.release.set()
+    for thread in hot_calls:
+        thread.join()
+
+    assert result["status"] == "success"
+    assert "for 3 queries" in result["content"][0]["text"]
+    assert elapsed < 2.0
+
+
+def test_module_search_functions_share_the_tool_pools():
+    from tools import fomc_kb_search, scotus_kb_search
+    from tools.kb_tool import kb_tool_stats
+
+    client = FakeKnowledgeBaseClient(latency_ms=0.0, results=2)
+    aws_clients.register_client("bedrock-agent-runtime", client)
+    call = {"toolUseId": "t1", "input": {"text": "rate hike", "score": 0.0}}
+
+    assert fomc_kb_search.fomc_kb_search(call)["status"] == "success"
+    assert scotus_kb_search.scotus_kb_search(call)["status"] == "success"
+    calls_before = kb_tool_stats()["fomc_kb_search"]["calls"]
+    result = asyncio.run(fomc_kb_search.fomc_kb_search_async({**call, "input": {"text": "balance sheet"}}))
+
+    assert result["status"] == "success"
+    assert kb_tool_stats()["fomc_kb_search"]["calls"] == calls_before + 1
+    assert fomc_kb_search.fomc_kb_search.TOOL_SPEC["name"] == "fomc_kb_search"
+    assert scotus_kb_search.scotus_kb_search_async.TOOL_SPEC is scotus_kb_search.TOOL_SPEC
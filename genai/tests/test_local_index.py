@@ -0,0 +1,161 @@
+"""Memory-mapped local vector indexes (tools/local_index.py)."""
+
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from tools.kb_semantic_cache import hashing_embedder
+from tools.local_index import LocalVectorIndex, build_index, get_local_index, matches_filter
+
+EMBEDDER = {"type": "hashing", "dimensions": 256}
+
+TOPICS = [
+    "federal funds rate target range raised quarter point inflation",
+    "balance sheet runoff treasury securities mortgage backed reinvestment",
+    "unemployment rate labor market payroll employment wages",
+    "first amendment free speech public forum content neutral",
+    "fourth amendment search warrant probable cause exclusionary",
+    "commerce clause interstate regulation congressional power",
+    "quantitative easing asset purchases long term yields",
+    "equal protection strict scrutiny classification",
+]
+
+
+def corpus(extra=""):
+    for i, topic in enumerate(TOPICS):
+        court = i >= 3 and i != 6
+        metadata = {"year": 2000 + i, "source": "scotus" if court else "fomc"}
+        yield f"s3://bucket/doc-{i}.txt", f"{topic} {extra}document {i}", metadata
+
+
+def build(path, **kwargs):
+    embed = hashing_embedder(EMBEDDER["dimensions"])
+    return build_index(corpus(), str(path), embed, EMBEDDER, chunk_size=50, chunk_overlap=0, **kwargs)
+
+
+@pytest.fixture
+def flat_index(tmp_path):
+    build(tmp_path / "flat")
+    return LocalVectorIndex(str(tmp_path / "flat"))
+
+
+def test_each_document_is_its_own_best_match(flat_index):
+    for i, topic in enumerate(TOPICS):
+        results = flat_index.retrieve(f"{topic} document {i}", number_of_results=3)
+        assert results[0]["location"]["s3Location"]["uri"] == f"s3://bucket/doc-{i}.txt"
+        assert results[0]["metadata"]["x-amz-bedrock-kb-source-uri"] == f"s3://bucket/doc-{i}.txt"
+
+
+def test_scores_map_cosine_to_zero_one(flat_index):
+    results = flat_index.retrieve(TOPICS[0] + " document 0", number_of_results=len(TOPICS))
+
+    scores = [r["score"] for r in results]
+    assert all(0.0 <= score <= 1.0 for score in scores)
+    assert scores == sorted(scores, reverse=True)
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_min_score_drops_weak_results(flat_index):
+    everything = flat_index.retrieve(TOPICS[0], number_of_results=len(TOPICS))
+    threshold = everything[2]["score"]
+
+    kept = flat_index.retrieve(TOPICS[0], number_of_results=len(TOPICS), min_score=threshold)
+
+    assert len(kept) >= 3
+    assert all(r["score"] >= threshold for r in kept)
+
+
+@pytest.mark.parametrize("retrieve_filter, expected", [
+    ({"equals": {"key": "source", "value": "fomc"}}, True),
+    ({"equals": {"key": "source", "value": "scotus"}}, False),
+    ({"in": {"key": "year", "value": [2008, 2015]}}, True),
+    ({"notIn": {"key": "year", "value": [2008, 2015]}}, False),
+    ({"greaterThanOrEquals": {"key": "year", "value": 2015}}, True),
+    ({"andAll": [{"equals": {"key": "source", "value": "fomc"}}, {"lessThan": {"key": "year", "value": 2010}}]},
+     False),
+    ({"orAll": [{"equals": {"key": "source", "value": "scotus"}}, {"equals": {"key": "year", "value": 2015}}]},
+     True),
+    ({"equals": {"key": "missing", "value": 1}}, False),
+    ({"notEquals": {"key": "missing", "value": 1}}, True),
+    ({"startsWith": {"key": "source", "value": "fo"}}, True),
+])
+def test_matches_filter_supports_bedrock_operators(retrieve_filter, expected):
+    assert matches_filter({"source": "fomc", "year": 2015}, retrieve_filter) is expected
+
+
+def test_unsupported_filters_are_rejected():
+    with pytest.raises(ValueError):
+        matches_filter({}, {"regex": {"key": "source", "value": ".*"}})
+    with pytest.raises(ValueError):
+        matches_filter({}, {"equals": {"key": "a", "value": 1}, "in": {"key": "b", "value": [1]}})
+
+
+def test_filtered_retrieval_only_returns_matching_documents(flat_index):
+    results = flat_index.retrieve(TOPICS[3], number_of_results=len(TOPICS),
+                                  retrieve_filter={"equals": {"key": "source", "value": "fomc"}})
+
+    assert results
+    assert {r["metadata"]["source"] for r in results} == {"fomc"}
+    assert len(results) == 4
+
+
+def test_ivf_search_agrees_with_brute_force(tmp_path, flat_index):
+    manifest = build(tmp_path / "ivf", ivf_lists=4, nprobe=2)
+    ivf_index = LocalVectorIndex(str(tmp_path / "ivf"))
+    assert manifest["ivf"] == {"lists": 4, "nprobe": 2}
+    assert ivf_index.stats()["ivf_lists"] == 4
+
+    for i, topic in enumerate(TOPICS):
+        query = f"{topic} document {i}"
+        flat_top = flat_index.retrieve(query, number_of_results=1)[0]
+        ivf_top = ivf_index.retrieve(query, number_of_results=1)[0]
+        # IVF rows are stored by list, so results must map back to the right text
+        assert ivf_top["content"]["text"] == flat_top["content"]["text"]
+        assert ivf_top["score"] == pytest.approx(flat_top["score"], abs=1e-5)
+
+
+def test_probing_every_list_matches_brute_force_exactly(tmp_path, flat_index):
+    build(tmp_path / "ivf", ivf_lists=4, nprobe=4)
+    ivf_index = LocalVectorIndex(str(tmp_path / "ivf"))
+
+    flat = flat_index.retrieve(TOPICS[1], number_of_results=5)
+    ivf = ivf_index.retrieve(TOPICS[1], number_of_results=5)
+
+    # Chunks sharing only "document" tie, so compare scores rather than their order
+    assert [r["score"] for r in ivf] == pytest.approx([r["score"] for r in flat], abs=1e-5)
+    assert ivf[0]["content"]["text"] == flat[0]["content"]["text"]
+
+
+def test_rebuild_swaps_the_index_in_place(tmp_path):
+    path = tmp_path / "index"
+    build(path)
+    old = get_local_index(str(path))
+    old_mtime = os.stat(path / "manifest.json").st_mtime_ns
+
+    embed = hashing_embedder(EMBEDDER["dimensions"])
+    build_index([("s3://bucket/new.txt", "entirely new corpus text", {})], str(path), embed, EMBEDDER)
+    # Coarse filesystem timestamps could hide the rebuild from the mtime check
+    os.utime(path / "manifest.json", ns=(old_mtime + 1_000_000_000, old_mtime + 1_000_000_000))
+
+    new = get_local_index(str(path))
+    assert new is not old
+    assert len(new) == 1
+    assert new.retrieve("entirely new corpus", number_of_results=1)[0]["content"]["text"] == \
+        "entirely new corpus text"
+    # Searches holding the old index still read its unlinked files
+    assert len(old.retrieve(TOPICS[0], number_of_results=2)) == 2
+    assert sorted(os.listdir(tmp_path)) == ["index"]
+
+
+def test_unchanged_index_is_reused(tmp_path):
+    build(tmp_path / "index")
+
+    assert get_local_index(str(tmp_path / "index")) is get_local_index(str(tmp_path / "index"))
+
+
+def test_empty_corpus_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        build_index([("s3://bucket/empty.txt", "   ", {})], str(tmp_path / "index"),
+                    hashing_embedder(16), {"type": "hashing", "dimensions": 16})
@@ -0,0 +1,39 @@
+"""Moving agents between routing tiers."""
+
+import agent_config
+from agent_pool import get_pooled_agent
+from model_router import AUTO_MODEL, apply_route, router_tiers
+
+
+def routed_agent():
+    return get_pooled_agent(model=AUTO_MODEL, personality="basic", session_id="s1", s3_bucket="", s3_prefix="")
+
+
+def test_bedrock_models_are_built_for_the_requested_model():
+    model_id = router_tiers()[1]
+    model = agent_config.bedrock_model_factory(agent_config.model_config(model_id))
+
+    assert model.config["model_id"] == model_id
+
+
+def test_apply_route_swaps_the_model(fake_bedrock):
+    agent = routed_agent()
+    tiers = router_tiers()
+    assert agent.model.config["model_id"] == tiers[0]
+
+    apply_route(agent, tiers[2], "basic")
+
+    assert agent.model.config["model_id"] == tiers[2]
+
+
+def test_apply_route_sizes_the_history_budget_for_the_new_model(fake_bedrock, monkeypatch):
+    # Larger than the cheapest tier's context window, so the budget depends on the model
+    monkeypatch.setenv("CONVERSATION_MAX_TOKENS", "250000")
+    agent = routed_agent()
+    small_budget = agent.conversation_manager.token_budget
+
+    apply_route(agent, "us.amazon.nova-pro-v1:0", "basic")
+
+    assert agent.conversation_manager.token_budget > small_budget
+    apply_route(agent, router_tiers()[0], "basic")
+    assert agent.conversation_manager.token_budget == small_budget
@@ -0,0 +1,164 @@
+"""Personality registry validation and hot reload (personalities.py)."""
+
+import json
+import os
+import threading
+
+import pytest
+
+import personalities
+from personalities import LazyTool, PersonalityRegistry, get_registry, reload_registry
+
+
+@pytest.fixture
+def registry_file(tmp_path, monkeypatch):
+    """A personalities file made the active registry; the real registry is restored after."""
+    for name in ("_registry", "_mtime", "_last_check"):
+        monkeypatch.setattr(personalities, name, getattr(personalities, name))
+    monkeypatch.setenv("PERSONALITIES_RELOAD_SECONDS", "5")
+    path = tmp_path / "personalities.json"
+    write(path, {"personalities": {"basic": {"system_prompt": "You are helpful."}}})
+    reload_registry(str(path))
+    return path
+
+
+def write(path, config, bump_mtime=True):
+    previous = os.stat(path).st_mtime_ns if path.exists() else None
+    path.write_text(config if isinstance(config, str) else json.dumps(config))
+    if bump_mtime and previous is not None:
+        # Coarse filesystem timestamps could hide a quick rewrite
+        os.utime(path, ns=(previous + 1_000_000_000, previous + 1_000_000_000))
+
+
+def check_now():
+    # Skip the PERSONALITIES_RELOAD_SECONDS wait so the next call checks the file
+    personalities._last_check = float("-inf")
+    return get_registry()
+
+
+def test_changed_file_is_reloaded_with_a_new_version(registry_file):
+    first = get_registry()
+    write(registry_file, {"personalities": {"basic": {"system_prompt": "You are helpful."},
+                                            "pirate": {"system_prompt": "Talk like a pirate."}}})
+
+    second = check_now()
+
+    assert second is not first
+    assert second.version == first.version + 1
+    assert "pirate" in second and "pirate" not in first
+
+
+def test_unchanged_file_keeps_the_registry(registry_file):
+    first = get_registry()
+
+    assert check_now() is first
+
+
+def test_checks_wait_for_the_reload_interval(registry_file):
+    first = check_now()
+    write(registry_file, {"personalities": {"pirate": {"system_prompt": "Arr."}}})
+
+    assert get_registry() is first
+
+
+def test_invalid_file_keeps_the_previous_registry(registry_file, monkeypatch):
+    first = get_registry()
+    write(registry_file, "{not json")
+
+    assert check_now() is first
+
+    # The broken file is not parsed again until it changes
+    loads = []
+    monkeypatch.setattr(PersonalityRegistry, "from_file",
+                        classmethod(lambda cls, path, version=0: loads.append(path)))
+    assert check_now() is first
+    assert loads == []
+
+
+def test_invalid_personality_keeps_the_previous_registry(registry_file):
+    first = get_registry()
+    write(registry_file, {"personalities": {"broken": {"system_prompt": "x", "tools": ["no_such_tool"]}}})
+
+    assert check_now() is first
+
+    write(registry_file, {"personalities": {"fixed": {"system_prompt": "Fixed."}}})
+    fixed = check_now()
+    assert "fixed" in fixed
+    assert fixed.version == first.version + 1
+
+
+def test_a_missing_first_file_is_an_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(personalities, "_registry", None)
+
+    with pytest.raises(OSError):
+        reload_registry(str(tmp_path / "missing.json"))
+
+
+@pytest.mark.parametrize("config, message", [
+    ({"personalities": {"custom": {"system_prompt": "x"}}}, "reserved"),
+    ({"personalities": {"empty": {"system_prompt": ""}}}, "needs a system_prompt"),
+    ({"personalities": {"p": {"system_prompt": "x", "tools": ["nope"]}}}, "unknown tools: nope"),
+    ({"knowledge_bases": {"kb": {"description": "no id"}}}, "needs knowledge_base_id"),
+    ({"knowledge_bases": {"kb": {"knowledge_base_id": "ID", "description": "d", "bogus": 1}}}, "kb"),
+])
+def test_malformed_configs_are_rejected(config, message):
+    with pytest.raises(ValueError, match=message):
+        PersonalityRegistry.from_dict(config)
+
+
+def test_custom_prompts_resolve_to_a_tool_less_personality():
+    registry = PersonalityRegistry.from_dict(
+        {"personalities": {"fomc": {"system_prompt": "Fed expert.", "tools": ["fomc_kb_search"]}}})
+
+    custom = registry.resolve("You are a terse assistant.")
+
+    assert custom.is_custom
+    assert custom.system_prompt == "You are a terse assistant."
+    assert custom.tools == ()
+    assert registry.resolve("fomc").tool_names == ("fomc_kb_search",)
+    assert registry.label("fomc") == "fomc"
+    assert registry.label("You are a terse assistant.") == "custom"
+
+
+def test_lazy_tools_load_once_on_first_use():
+    calls = []
+    tool = LazyTool("slow_tool", lambda: calls.append(1) or object())
+    assert calls == []
+
+    loaded = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        loaded.append(tool.load())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert len({id(t) for t in loaded}) == 1
+
+
+def test_declared_knowledge_bases_are_built_on_first_use():
+    registry = PersonalityRegistry.from_dict({
+        "knowledge_bases": {"treasury_kb_search": {"knowledge_base_id": "ABCDEFGHIJ", "description": "Treasury"}},
+        "personalities": {"treasury": {"system_prompt": "Treasury expert.", "tools": ["treasury_kb_search"]}},
+    })
+    tool = registry.get("treasury").tools[0]
+
+    assert tool._tool is None
+    loaded = registry.get("treasury").load_tools()
+    assert loaded[0].tool_name == "treasury_kb_search"
+    assert tool._tool is loaded[0]
+
+
+def test_builtin_tools_are_shared_across_registry_versions():
+    config = {"personalities": {"fomc": {"system_prompt": "Fed expert.", "tools": ["fomc_kb_search"]}}}
+
+    first = PersonalityRegistry.from_dict(config, version=1)
+    second = PersonalityRegistry.from_dict(config, version=2)
+
+    assert first.get("fomc").tools[0] is second.get("fomc").tools[0]
@@ -0,0 +1,77 @@
+"""Prompt cache checkpoints in formatted Bedrock requests (prompt_cache.py)."""
+
+import copy
+
+import pytest
+
+from agent_config import build_agent_resources
+
+NOVA = "us.amazon.nova-pro-v1:0"
+CLAUDE = "us.anthropic.claude-sonnet-4-20250514-v1:0"
+UNSUPPORTED = "us.meta.llama3-3-70b-instruct-v1:0"
+
+MESSAGES = [
+    {"role": "user", "content": [{"text": "What did the Fed do in December 2015?"}]},
+    {"role": "assistant", "content": [{"text": "It raised the target range."}]},
+    {"role": "user", "content": [{"text": "By how much?"}]},
+]
+
+
+def format_request(model_id, personality, prompt_cache=True):
+    resources = build_agent_resources(model=model_id, personality=personality, prompt_cache=prompt_cache)
+    tool_specs = [tool.tool_spec for tool in resources.tools] or None
+    messages = copy.deepcopy(MESSAGES)
+    request = resources.bedrock_model.format_request(messages, tool_specs, resources.system_prompt)
+    assert messages == MESSAGES, "agent.messages must never get cache points"
+    return request
+
+
+def cache_points(blocks):
+    return [i for i, block in enumerate(blocks) if "cachePoint" in block]
+
+
+def tool_blocks(request):
+    return request.get("toolConfig", {}).get("tools", [])
+
+
+@pytest.mark.parametrize("model_id", [NOVA, CLAUDE])
+def test_system_prompt_and_last_message_get_checkpoints(model_id):
+    request = format_request(model_id, "basic")
+
+    assert cache_points(request["system"]) == [len(request["system"]) - 1]
+    assert "text" in request["system"][0]
+    assert cache_points(request["messages"][-1]["content"]) == [1]
+    assert all(not cache_points(message["content"]) for message in request["messages"][:-1])
+
+
+def test_claude_tools_get_a_checkpoint():
+    request = format_request(CLAUDE, "fomc")
+
+    tools = tool_blocks(request)
+    assert cache_points(tools) == [len(tools) - 1]
+    assert "toolSpec" in tools[0]
+
+
+def test_nova_tools_get_no_checkpoint():
+    request = format_request(NOVA, "fomc")
+
+    assert tool_blocks(request)
+    assert cache_points(tool_blocks(request)) == []
+    assert cache_points(request["system"])
+
+
+def test_unsupported_models_get_no_checkpoints():
+    request = format_request(UNSUPPORTED, "fomc")
+
+    assert cache_points(request["system"]) == []
+    assert cache_points(tool_blocks(request)) == []
+    assert all(not cache_points(message["content"]) for message in request["messages"])
+
+
+@pytest.mark.parametrize("model_id", [NOVA, CLAUDE])
+def test_caching_can_be_turned_off(model_id):
+    request = format_request(model_id, "fomc", prompt_cache=False)
+
+    assert cache_points(request["system"]) == []
+    assert cache_points(tool_blocks(request)) == []
+    assert cache_points(request["messages"][-1]["content"]) == []
@@ -0,0 +1,256 @@
+"""Write-behind S3 session persistence against InMemoryS3Client."""
+
+import asyncio
+import threading
+
+import pytest
+from strands import Agent
+
+import s3_session
+from model_router import rewind_turn, turn_checkpoint
+from benchmarks.fake_s3 import InMemoryS3Client
+from s3_session import SessionStateCache, WriteBehindS3SessionManager
+
+BUCKET = "sessions"
+PREFIX = "alice/nova-micro"
+
+
+@pytest.fixture
+def s3():
+    return InMemoryS3Client()
+
+
+def make_agent(model, s3, session_id="s1", state_cache=None):
+    manager = WriteBehindS3SessionManager(session_id=session_id, bucket=BUCKET, prefix=PREFIX,
+                                          client=s3, state_cache=state_cache)
+    return Agent(model=model, session_manager=manager, callback_handler=None)
+
+
+def stored_keys(s3):
+    return sorted(key for bucket, key in s3.objects if bucket == BUCKET)
+
+
+def message_keys(s3):
+    return [key for key in stored_keys(s3) if "/messages/" in key]
+
+
+def test_writes_are_buffered_until_flush(fake_model, s3):
+    agent = make_agent(fake_model, s3)
+    agent("hello")
+    manager = agent._session_manager
+
+    assert s3.calls.get("put_object", 0) == 0
+    assert manager.pending_count > 0
+
+    manager.flush()
+
+    assert manager.pending_count == 0
+    assert len(message_keys(s3)) == 2
+    # agent.json is rewritten after every message but written once
+    assert manager.writes_coalesced > 0
+    assert s3.calls["put_object"] == manager.objects_written == len(stored_keys(s3))
+
+
+def test_next_request_reads_the_flushed_turn(fake_model, s3):
+    agent = make_agent(fake_model, s3)
+    agent("hello")
+    s3_session.flush_agent_session(agent).result()
+
+    restored = make_agent(fake_model, s3)
+
+    assert [m["role"] for m in restored.messages] == ["user", "assistant"]
+    assert restored.messages[0]["content"][0]["text"] == "hello"
+
+
+def test_new_manager_waits_for_the_inflight_flush(fake_model):
+    slow_s3 = InMemoryS3Client(latency_seconds=0.05)
+    agent = make_agent(fake_model, slow_s3)
+    agent("hello")
+    s3_session.flush_agent_session(agent)
+
+    restored = make_agent(fake_model, slow_s3)
+
+    assert len(restored.messages) == 2
+
+
+def test_wait_for_flush_runs_off_the_event_loop(fake_model):
+    slow_s3 = InMemoryS3Client(latency_seconds=0.2)
+    agent = make_agent(fake_model, slow_s3)
+    agent("hello")
+    s3_session.flush_agent_session(agent)
+    session_key = agent._session_manager.session_key
+
+    async def main():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        beat = asyncio.create_task(heartbeat())
+        await asyncio.to_thread(s3_session.wait_for_flush, session_key)
+        beat.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 5
+    assert session_key not in s3_session._inflight_flushes
+
+
+def test_state_cache_skips_s3_reads_while_the_etag_matches(fake_model, s3):
+    cache = SessionStateCache(max_bytes=1024 * 1024)
+    agent = make_agent(fake_model, s3, state_cache=cache)
+    agent("hello")
+    agent._session_manager.flush()
+    s3.calls.clear()
+
+    restored = make_agent(fake_model, s3, state_cache=cache)
+
+    assert len(restored.messages) == 2
+    assert cache.stats()["hits"] == 1
+    assert set(s3.calls) == {"head_object"}
+
+
+def test_state_cache_reloads_when_the_etag_changes(fake_model, s3):
+    cache = SessionStateCache(max_bytes=1024 * 1024)
+    agent = make_agent(fake_model, s3, state_cache=cache)
+    agent("hello")
+    agent._session_manager.flush()
+
+    # Another writer moves the session on
+    other = make_agent(fake_model, s3)
+    other("second question")
+    other._session_manager.flush()
+
+    restored = make_agent(fake_model, s3, state_cache=cache)
+
+    assert cache.stats()["stale"] == 1
+    assert len(restored.messages) == 4
+
+
+def test_rewind_drops_the_buffered_turn(fake_model, s3):
+    agent = make_agent(fake_model, s3)
+    agent("hello")
+    checkpoint = turn_checkpoint(agent)
+    agent("a turn to take back")
+
+    assert rewind_turn(agent, checkpoint)
+    assert len(agent.messages) == 2
+
+    # The retry reuses the message ids of the discarded turn
+    agent("the retried turn")
+    agent._session_manager.flush()
+    keys = message_keys(s3)
+    assert [key.rsplit("/", 1)[-1] for key in keys] == [f"message_{i}.json" for i in range(4)]
+    restored = make_agent(fake_model, s3)
+    assert restored.messages[2]["content"][0]["text"] == "the retried turn"
+
+
+def test_rewind_refuses_once_the_turn_is_in_s3(fake_model, s3):
+    agent = make_agent(fake_model, s3)
+    checkpoint = turn_checkpoint(agent)
+    agent("hello")
+    agent._session_manager.flush()
+
+    assert not rewind_turn(agent, checkpoint)
+    assert len(agent.messages) == 2
+
+
+def test_failed_puts_go_back_in_the_buffer(fake_model, s3):
+    agent = make_agent(fake_model, s3)
+    agent("hello")
+    manager = agent._session_manager
+    pending = manager.pending_count
+    put_object = s3.put_object
+    s3.put_object = lambda **kwargs: (_ for _ in ()).throw(RuntimeError("S3 is down"))
+
+    with pytest.raises(s3_session.SessionException):
+        manager.flush()
+    assert manager.pending_count == pending
+
+    s3.put_object = put_object
+    manager.flush()
+    assert len(message_keys(s3)) == 2
+
+
+def test_reserved_session_holds_the_next_request_until_released(fake_model, s3):
+    agent = make_agent(fake_model, s3)
+    agent("hello")
+    s3_session.flush_agent_session(agent)
+    release = s3_session.reserve_agent_session(agent)
+    agent.state.set("summary_marker", "saved")
+
+    restored = []
+    waiter = threading.Thread(target=lambda: restored.append(make_agent(fake_model, s3)))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+
+    release(lambda: agent._session_manager.sync_agent(agent))
+    release()
+    waiter.join(5)
+
+    assert restored[0].state.get("summary_marker") == "saved"
+    assert agent._session_manager.session_key not in s3_session._inflight_flushes
+
+
+def test_reserve_needs_a_write_behind_session(fake_model):
+    assert s3_session.reserve_agent_session(Agent(model=fake_model, callback_handler=None)) is None
+
+
+def test_delete_drops_buffered_writes(fake_model, s3):
+    agent = make_agent(fake_model, s3)
+    agent("hello")
+    manager = agent._session_manager
+    manager.flush()
+    agent("and again")
+    assert manager.pending_count > 0
+
+    manager.delete_session("s1")
+    s3_session.flush_all()
+
+    assert stored_keys(s3) == []
+    assert manager.pending_count == 0
+
+
+def test_delete_of_a_never_flushed_session(fake_model, s3):
+    agent = make_agent(fake_model, s3)
+    agent("hello")
+
+    agent._session_manager.delete_session("s1")
+    agent._session_manager.flush()
+
+    assert stored_keys(s3) == []
+
+
+def test_delete_waits_for_the_inflight_flush(fake_model):
+    slow_s3 = InMemoryS3Client(latency_seconds=0.1)
+    agent = make_agent(fake_model, slow_s3)
+    agent("hello")
+    manager = agent._session_manager
+    manager.flush_async()
+
+    manager.delete_session("s1")
+
+    assert stored_keys(slow_s3) == []
+
+
+def test_delete_of_an_unknown_session_fails(fake_model, s3):
+    manager = make_agent(fake_model, s3)._session_manager
+
+    with pytest.raises(s3_session.SessionException):
+        manager.delete_session("nobody")
+
+
+def test_delete_invalidates_the_session_cache(fake_model, s3):
+    cache = SessionStateCache()
+    agent = make_agent(fake_model, s3, state_cache=cache)
+    agent("hello")
+    s3_session.flush_agent_session(agent).result()
+    assert cache.stats()["sessions"] == 1
+
+    agent._session_manager.delete_session("s1")
+
+    assert cache.stats()["sessions"] == 0
+    assert make_agent(fake_model, s3, state_cache=cache).messages == []
@@ -0,0 +1,80 @@
+"""Per-session agent routing for the FastAPI server."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from session_router import SessionRouter, SessionRouterSaturated
+
+
+class _Agent:
+    def __init__(self, model, personality):
+        self.model = model
+        self.personality = personality
+        self.thread = threading.current_thread()
+
+
+def slow_factory(delay=0.05):
+    def factory(model, personality):
+        time.sleep(delay)
+        return _Agent(model, personality)
+    return factory
+
+
+def test_agents_are_built_off_the_event_loop():
+    router = SessionRouter(agent_factory=slow_factory(0.2))
+
+    async def main():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        beat = asyncio.create_task(heartbeat())
+        lease = await router.acquire("s1", "model", "basic")
+        beat.cancel()
+        lease.release()
+        return lease.agent, ticks
+
+    agent, ticks = asyncio.run(main())
+
+    assert agent.thread is not threading.main_thread()
+    assert ticks >= 5
+
+
+def test_concurrent_first_requests_share_one_session_agent():
+    router = SessionRouter(agent_factory=slow_factory())
+
+    async def main():
+        async def request():
+            lease = await router.acquire("s1", "model", "basic")
+            agent = lease.agent
+            await asyncio.sleep(0)
+            lease.release()
+            return agent
+
+        return await asyncio.gather(request(), request(), request())
+
+    agents = asyncio.run(main())
+
+    assert len({id(agent) for agent in agents}) == 1
+    assert router.stats()["sessions"] == 1
+    assert router.stats()["completed"] == 3
+
+
+def test_full_queue_is_rejected():
+    router = SessionRouter(max_concurrency=1, max_queue=0, agent_factory=slow_factory(0.0))
+
+    async def main():
+        lease = await router.acquire("s1", "model", "basic")
+        with pytest.raises(SessionRouterSaturated):
+            await router.acquire("s2", "model", "basic")
+        lease.release()
+
+    asyncio.run(main())
+    assert router.stats()["rejected"] == 1
@@ -0,0 +1,69 @@
+"""Incremental SSE decoding of AgentCore runtime responses."""
+
+import json
+
+import pytest
+
+from sse import SSEDecoder, iter_agent_events, iter_sse_events
+
+STREAM = (
+    'data: {"type": "start"}\n\n'
+    'data: {"type": "token", "text": "café "}\n\n'
+    ': keep-alive\n\n'
+    'data: {"type": "token", "text": "ok"}\n\n'
+    'data: {"type": "done"}\n\n'
+).encode("utf-8")
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, len(STREAM)])
+def test_events_survive_any_chunking(size):
+    events = list(iter_agent_events(split(STREAM, size)))
+
+    assert [event.type for event in events] == ["start", "token", "token", "done"]
+    assert "".join(event.text for event in events) == "café ok"
+
+
+def test_multibyte_character_split_across_chunks():
+    frame = 'data: {"type": "token", "text": "€"}\n\n'.encode("utf-8")
+    euro = frame.index(b"\xe2")
+    decoder = SSEDecoder()
+
+    assert decoder.feed(frame[:euro + 1]) == []
+    events = decoder.feed(frame[euro + 1:])
+
+    assert json.loads(events[0].data)["text"] == "€"
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+def test_line_endings(newline):
+    data = f"event: update{newline}id: 7{newline}data: a{newline}data: b{newline}{newline}".encode()
+
+    events = list(iter_sse_events(split(data, 1)))
+
+    assert len(events) == 1
+    assert (events[0].event, events[0].id, events[0].data) == ("update", "7", "a\nb")
+
+
+def test_crlf_split_between_chunks_is_one_line_ending():
+    decoder = SSEDecoder()
+
+    events = decoder.feed(b"data: x\r") + decoder.feed(b"\n\r\n")
+
+    assert [event.data for event in events] == ["x"]
+
+
+def test_final_event_without_blank_line_is_delivered():
+    events = list(iter_sse_events([b'data: {"type": "done"}']))
+
+    assert [event.data for event in events] == ['{"type": "done"}']
+
+
+def test_runtime_errors_and_non_json_data():
+    events = list(iter_agent_events([b'data: {"error": "boom"}\n\ndata: plain text\n\n']))
+
+    assert [(event.type, event.payload) for event in events] == [("error", {"error": "boom"}),
+                                                                 ("raw", "plain text")]
@@ -0,0 +1,44 @@
+"""Per-request coalescing options and token coalescing."""
+
+import asyncio
+
+import pytest
+
+from stream_coalescer import coalesce_tokens, coalescing_options
+
+
+@pytest.mark.parametrize("value", [False, "false", "False", " off ", "0", "no", 0])
+def test_coalescing_can_be_turned_off(value):
+    assert coalescing_options({"coalesce": value}) is None
+
+
+@pytest.mark.parametrize("value", [True, "true", "ON", "1", "yes", 1])
+def test_coalescing_can_be_turned_on(value, monkeypatch):
+    monkeypatch.setenv("STREAM_COALESCE", "false")
+
+    assert coalescing_options({"coalesce": value}) is not None
+
+
+@pytest.mark.parametrize("value", [None, "maybe", [], {}])
+def test_missing_or_unknown_values_use_the_default(value, monkeypatch):
+    payload = {} if value is None else {"coalesce": value}
+    assert coalescing_options(payload) is not None
+
+    monkeypatch.setenv("STREAM_COALESCE", "false")
+    assert coalescing_options(payload) is None
+
+
+def test_zero_flush_interval_turns_coalescing_off():
+    assert coalescing_options({"stream_flush_ms": 0}) is None
+
+
+def test_tokens_are_merged_and_other_events_pass_through():
+    async def source():
+        for text in ("Hel", "lo", " world"):
+            yield {"type": "token", "text": text}
+        yield {"type": "done"}
+
+    async def collect():
+        return [event async for event in coalesce_tokens(source(), flush_ms=1000, flush_bytes=1024)]
+
+    assert asyncio.run(collect()) == [{"type": "token", "text": "Hello world"}, {"type": "done"}]
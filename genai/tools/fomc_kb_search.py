@@ -1,79 +1,58 @@
 # fomc_kb_search.py
 
-from strands_tools.retrieve import retrieve
+import os
 from typing import Any
+from tools.kb_tool import KnowledgeBaseSpec, kb_search_for, make_kb_tool
 
-# 1. Tool Specification
-TOOL_SPEC = {
-    "name": "fomc_kb_search",
-    "description": """Search the FOMC knowledge base for Federal Reserve monetary policy information, meeting minutes, and economic decisions.
+KNOWLEDGE_BASE_ID = "P7J0PZOXSE"
+REGION = "us-east-1"
+# Local vector index built by data_pulls/build_local_index.py; unset uses Bedrock
+LOCAL_INDEX = os.getenv("FOMC_KB_LOCAL_INDEX") or None
+
+FOMC_KB = KnowledgeBaseSpec(
+    name="fomc_kb_search",
+    knowledge_base_id=KNOWLEDGE_BASE_ID,
+    region=REGION,
+    local_index=LOCAL_INDEX,
+    description="""Search the FOMC knowledge base for Federal Reserve monetary policy information, meeting minutes, and economic decisions.
 
 This tool provides access to FOMC meeting transcripts and minutes from 1993-2019, enabling queries about:
 - Interest rate decisions and rationale
 - Economic outlook and Fed communications  
 - Historical context and precedents
-- Market implications of Fed actions
+- Market implications of Fed actions""",
+)
+
+# Agent tool used by the personality registry
+FOMC_KB_TOOL = make_kb_tool(FOMC_KB)
+TOOL_SPEC = FOMC_KB_TOOL.tool_spec
 
-Results are sorted by relevance score and include source metadata.""",
-    "inputSchema": {
-        "json": {
-            "type": "object",
-            "properties": {
-                "text": {
-                    "type": "string",
-                    "description": "The query to search for in the FOMC knowledge base"
-                },
-                "numberOfResults": {
-                    "type": "integer",
-                    "description": "The maximum number of results to return. Default is 5.",
-                    "default": 5
-                },
-                "score": {
-                    "type": "number",
-                    "description": "Minimum relevance score threshold (0.0-1.0). Results below this score will be filtered out. Default is 0.4.",
-                    "default": 0.4,
-                    "minimum": 0.0,
-                    "maximum": 1.0
-                }
-            },
-            "required": ["text"]
-        }
-    }
-}
 
-# 2. Tool Function
+# Module-level functions for callers that use them directly; they share the
+# tool's worker pools and counters
 def fomc_kb_search(tool, **kwargs: Any):
     """
-    Search the FOMC knowledge base with pre-configured settings.
-    
-    This is a wrapper around the retrieve tool that automatically uses
-    the correct knowledge base ID and region for FOMC data.
-    
+    Search the FOMC knowledge base on the calling thread.
+
     Args:
         tool: Tool object containing toolUseId and input parameters
         **kwargs: Additional keyword arguments
-        
+
     Returns:
         dict: Structured response from the knowledge base search
     """
-    # Extract the original input
-    tool_input = tool["input"]
-    
-    # Add the pre-configured knowledge base settings
-    enhanced_input = {
-        **tool_input,
-        "knowledgeBaseId": "P7J0PZOXSE",
-        "region": "us-east-1"
-    }
-    
-    # Create a new tool object with the enhanced input
-    enhanced_tool = {
-        **tool,
-        "input": enhanced_input
-    }
-    
-    # Call the original retrieve function with our pre-configured settings
-    return retrieve(enhanced_tool, **kwargs)
+    return kb_search_for(FOMC_KB).search(tool, **kwargs)
+
+
+async def fomc_kb_search_async(tool, **kwargs: Any):
+    """
+    Search the FOMC knowledge base without blocking the event loop.
+
+    Same inputs and results as fomc_kb_search, run on the knowledge base's
+    own worker pool.
+    """
+    return await kb_search_for(FOMC_KB).search_async(tool, **kwargs)
+
 
-# Attach TOOL_SPEC to function for Strands framework
 fomc_kb_search.TOOL_SPEC = TOOL_SPEC
+fomc_kb_search_async.TOOL_SPEC = TOOL_SPEC
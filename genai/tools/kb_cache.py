@@ -0,0 +1,181 @@
+# kb_cache.py
+
+"""
+Result cache for knowledge base retrievals.
+
+The FOMC and SCOTUS knowledge bases are static historical corpora, so the
+same query always returns the same chunks and results can be kept for a long
+time. Entries are keyed by (knowledgeBaseId, normalized text, numberOfResults,
+score), expire after a TTL, and are held in an in-memory LRU bounded by the
+total size of the serialized results. An optional SQLite file lets the cache
+survive container restarts.
+
+Configuration (environment variables):
+    KB_CACHE_ENABLED        Turn the cache on or off (true)
+    KB_CACHE_TTL_SECONDS    Entry lifetime in seconds (604800, one week)
+    KB_CACHE_MAX_BYTES      In-memory size bound in bytes (67108864)
+    KB_CACHE_PATH           SQLite file for the on-disk backend (unset = memory only)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_query(text):
+    """Normalize query text so trivial differences share a cache entry."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(text.split()).strip(" ?.!")
+
+
+class RetrievalCache:
+    """
+    TTL + byte-bounded LRU cache of retrieval results with an optional disk backend.
+
+    Args:
+        max_bytes (int): Upper bound on the serialized size of in-memory entries
+        ttl_seconds (float): Lifetime of an entry
+        disk_path (str): Optional SQLite file used as a second, persistent tier
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl_seconds=7 * 24 * 3600, disk_path=None):
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = float(ttl_seconds)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        if disk_path:
+            self._open_disk(disk_path)
+
+    @staticmethod
+    def make_key(knowledge_base_id, text, number_of_results, score):
+        """Return the cache key for a retrieval request."""
+        return (knowledge_base_id, normalize_query(text), int(number_of_results), round(float(score), 4))
+
+    def _open_disk(self, disk_path):
+        directory = os.path.dirname(disk_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS kb_cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute("DELETE FROM kb_cache WHERE expires_at < ?", (time.time(),))
+
+    def get(self, key):
+        """
+        Return cached results for a key, or None on a miss.
+
+        Args:
+            key (tuple): Key from make_key
+
+        Returns:
+            list | None: A fresh copy of the cached results
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(payload)
+                self._remove(key)
+                self.expirations += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM kb_cache WHERE key = ?", (json.dumps(key),)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._store(key, bytes(row[0]), row[1])
+                    self.disk_hits += 1
+                    return json.loads(row[0])
+
+            self.misses += 1
+            return None
+
+    def put(self, key, results):
+        """
+        Store results for a key in memory and, if configured, on disk.
+
+        Args:
+            key (tuple): Key from make_key
+            results (list): JSON-serializable retrieval results
+        """
+        payload = json.dumps(results, default=str).encode("utf-8")
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, payload, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO kb_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (json.dumps(key), payload, expires_at),
+                )
+
+    def _store(self, key, payload, expires_at):
+        if len(payload) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, payload)
+        self._bytes += len(payload)
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def clear(self):
+        """Drop every entry from memory and disk and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM kb_cache")
+            self.hits = self.disk_hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        """Return a snapshot of the cache counters and hit rate."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+def _cache_from_env():
+    if os.getenv("KB_CACHE_ENABLED", "true").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    return RetrievalCache(
+        max_bytes=int(os.getenv("KB_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        ttl_seconds=float(os.getenv("KB_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+        disk_path=os.getenv("KB_CACHE_PATH") or None,
+    )
+
+
+# Process-wide cache shared by every KB tool
+KB_CACHE = _cache_from_env()
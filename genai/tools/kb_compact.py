@@ -0,0 +1,181 @@
+# kb_compact.py
+
+"""
+Post-retrieval compaction of knowledge base results.
+
+Everything a KB tool returns stays in the conversation for the rest of the
+sliding window, so the results are compacted before they are formatted:
+
+1. Near-identical passages (word-shingle Jaccard similarity at or above the
+   threshold, e.g. the same paragraph in two documents) keep only the
+   best-scored copy. The other copy's source is kept as an extra citation.
+2. Overlapping chunks of the same document (chunkers repeat the tail of one
+   chunk at the head of the next) have the repeated words removed from the
+   lower-scored chunk.
+3. Results are packed in score order into a token budget. The first result
+   that does not fit is cut at a sentence boundary if enough budget is
+   left; everything after it is dropped.
+
+Token counts are estimated from characters (about 4 per token), which is
+close enough for budgeting without a tokenizer dependency.
+
+Results from the caches are shared, so compaction returns new dicts and
+never modifies its input.
+"""
+
+import re
+
+CHARS_PER_TOKEN = 4
+
+# Words per shingle for near-duplicate detection
+SHINGLE_SIZE = 3
+
+# Shortest repeated run of words treated as chunk overlap
+MIN_OVERLAP_WORDS = 8
+
+# Do not bother adding a cut-down result with less budget than this left
+MIN_PARTIAL_TOKENS = 48
+
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]?\s")
+
+
+def estimate_tokens(text):
+    """Estimate the number of model tokens in ``text``."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _text(result):
+    content = result.get("content", {}) or {}
+    text = content.get("text")
+    return text if isinstance(text, str) else ""
+
+
+def _with_text(result, text):
+    copy = dict(result)
+    copy["content"] = {**(result.get("content") or {}), "text": text}
+    return copy
+
+
+def _shingles(words):
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _overlap(kept_words, words):
+    """Return how many leading words of ``words`` repeat the end of ``kept_words``."""
+    longest = min(len(kept_words), len(words) - 1)
+    for size in range(longest, MIN_OVERLAP_WORDS - 1, -1):
+        if kept_words[-size:] == words[:size]:
+            return size
+    return 0
+
+
+def _trailing_overlap(kept_words, words):
+    """Return how many trailing words of ``words`` repeat the start of ``kept_words``."""
+    longest = min(len(kept_words), len(words) - 1)
+    for size in range(longest, MIN_OVERLAP_WORDS - 1, -1):
+        if words[-size:] == kept_words[:size]:
+            return size
+    return 0
+
+
+def _cut(text, max_chars):
+    """Cut text to at most max_chars, at the last sentence end if there is one."""
+    if len(text) <= max_chars:
+        return text
+    head = text[:max_chars]
+    ends = [m.end() for m in _SENTENCE_END.finditer(head)]
+    if ends and ends[-1] > max_chars // 2:
+        return head[:ends[-1]].rstrip() + " [...]"
+    space = head.rfind(" ")
+    return (head[:space] if space > max_chars // 2 else head).rstrip() + " [...]"
+
+
+def compact_results(results, token_budget=None, similarity_threshold=0.85, location_fn=None):
+    """
+    Deduplicate and pack retrieval results into a token budget.
+
+    Args:
+        results (list): Retrieval results sorted by descending score
+        token_budget (int): Estimated tokens of passage text to keep; None or
+            0 keeps everything that survives deduplication
+        similarity_threshold (float): Shingle similarity at which two
+            passages count as the same
+        location_fn (callable): Returns a result's source citation; results
+            compacted into another carry their sources in
+            ``additionalLocations``
+
+    Returns:
+        tuple: (compacted results, stats dict with input/output result counts,
+        duplicates, trimmed_overlaps and the estimated tokens_before/tokens_after)
+    """
+    stats = {"results_in": len(results), "duplicates": 0, "trimmed_overlaps": 0,
+             "tokens_before": sum(estimate_tokens(_text(r)) for r in results)}
+
+    kept = []  # (result, words, shingles, location)
+    for result in results:
+        words = _text(result).split()
+        shingles = _shingles(words)
+        location = location_fn(result) if location_fn else None
+
+        duplicate_of = None
+        for index, (_, kept_words, kept_shingles, _) in enumerate(kept):
+            if _similarity(shingles, kept_shingles) >= similarity_threshold or (shingles and shingles <= kept_shingles):
+                duplicate_of = index
+                break
+        if duplicate_of is not None:
+            stats["duplicates"] += 1
+            first, kept_words, kept_shingles, kept_location = kept[duplicate_of]
+            if location and location != kept_location:
+                extra = list(first.get("additionalLocations", []))
+                if location not in extra:
+                    extra.append(location)
+                    first = dict(first)
+                    first["additionalLocations"] = extra
+                    kept[duplicate_of] = (first, kept_words, kept_shingles, kept_location)
+            continue
+
+        # Remove chunk overlap with better-scored chunks of the same document
+        if location is not None:
+            lead = tail = 0
+            for _, kept_words, _, kept_location in kept:
+                if kept_location != location:
+                    continue
+                size = _overlap(kept_words, words)
+                words, lead = words[size:], lead + size
+                size = _trailing_overlap(kept_words, words)
+                words, tail = words[:len(words) - size], tail + size
+            if lead or tail:
+                stats["trimmed_overlaps"] += 1
+                if not words:
+                    continue
+                text = " ".join(words)
+                result = _with_text(result, ("[...] " if lead else "") + text + (" [...]" if tail else ""))
+                shingles = _shingles(words)
+        kept.append((result, words, shingles, location))
+
+    packed = []
+    used = 0
+    for result, _, _, _ in kept:
+        tokens = estimate_tokens(_text(result))
+        if not token_budget or used + tokens <= token_budget:
+            packed.append(result)
+            used += tokens
+            continue
+        remaining = token_budget - used
+        if remaining >= MIN_PARTIAL_TOKENS:
+            cut = _with_text(result, _cut(_text(result), remaining * CHARS_PER_TOKEN))
+            packed.append(cut)
+            used += estimate_tokens(_text(cut))
+        break
+
+    stats["results_out"] = len(packed)
+    stats["tokens_after"] = used
+    return packed, stats
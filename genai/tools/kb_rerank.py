@@ -0,0 +1,166 @@
+# kb_rerank.py
+
+"""
+Local reranking of knowledge base results.
+
+The KB relevance score alone decides what the tools return, so a call often
+returns several mediocre chunks next to one or two good ones. This stage
+rescores the (few) returned chunks by combining the KB score with lexical
+overlap with the query terms, Okapi BM25 computed over the returned chunks
+themselves. It then keeps only the results that clear an adaptive cutoff:
+
+- a result must reach ``relative_cutoff`` times the best combined score
+- results stop at the first drop in combined score larger than ``max_gap``
+- at least ``min_keep`` results are always kept
+
+Query terms are counted with str.count on normalized text rather than by
+tokenizing each chunk, and the BM25 formula runs with NumPy when it is
+installed (pure Python otherwise). A typical call (five ~300-word chunks)
+takes a small fraction of a millisecond; see benchmarks/rerank.py.
+"""
+
+import math
+import re
+import string
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+_TOKEN_RE = re.compile(r"\w+")
+_PUNCTUATION_TO_SPACE = str.maketrans(string.punctuation + "\n\r\t", " " * (len(string.punctuation) + 3))
+
+# Words too common to say anything about a chunk's relevance
+STOPWORDS = frozenset("""
+a about an and are as at be but by did do does for from had has have how i in is it its
+of on or s that the their there these this to was were what when where which who why will
+with you your
+""".split())
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def query_terms(queries):
+    """Return the distinct, lowercased non-stopword terms of one or more queries."""
+    terms = {}
+    for query in queries:
+        for term in _TOKEN_RE.findall(query.lower()):
+            if term not in STOPWORDS:
+                terms.setdefault(term, len(terms))
+    return terms
+
+
+def _normalized_text(result):
+    """Lowercase text with punctuation turned into spaces and a leading space."""
+    text = (result.get("content", {}) or {}).get("text")
+    return " " + text.lower().translate(_PUNCTUATION_TO_SPACE) if isinstance(text, str) else " "
+
+
+def term_frequencies(terms, texts):
+    """
+    Count query terms in normalized texts.
+
+    Terms are counted as word prefixes (" rate" matches "rate", "rates" and
+    "rated" but not "separate"), which doubles as crude stemming. Counting
+    with str.count runs in C and is several times faster than tokenizing
+    every chunk with a regular expression.
+
+    Args:
+        terms (dict): Query term -> column index, from query_terms
+        texts (list): Texts from _normalized_text
+
+    Returns:
+        tuple: (list of per-text term count lists, list of text lengths in words)
+    """
+    needles = [" " + term for term in terms]
+    counts = [[text.count(needle) for needle in needles] for text in texts]
+    lengths = [text.count(" ") for text in texts]
+    return counts, lengths
+
+
+def bm25_scores(counts, lengths):
+    """
+    Score documents with Okapi BM25 from their query term counts.
+
+    IDF is computed over the scored documents themselves, so terms that
+    appear in every returned chunk carry little weight.
+
+    Args:
+        counts (list): Per-document lists of query term counts
+        lengths (list): Document lengths in words
+
+    Returns:
+        list: BM25 score per document
+    """
+    n_docs = len(counts)
+    if not n_docs or not counts[0]:
+        return [0.0] * n_docs
+    avg_length = (sum(lengths) / n_docs) or 1.0
+
+    if np is not None:
+        tf = np.asarray(counts, dtype=np.float64)
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * np.asarray(lengths, dtype=np.float64) / avg_length)
+        return ((tf * (BM25_K1 + 1.0) / (tf + norm[:, None])) @ idf).tolist()
+
+    n_terms = len(counts[0])
+    idf = []
+    for column in range(n_terms):
+        df = sum(1 for row in counts if row[column])
+        idf.append(math.log1p((n_docs - df + 0.5) / (df + 0.5)))
+    scores = []
+    for row, length in zip(counts, lengths):
+        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * length / avg_length)
+        scores.append(sum(w * f * (BM25_K1 + 1.0) / (f + norm) for w, f in zip(idf, row) if f))
+    return scores
+
+
+def rerank_results(results, queries, lexical_weight=0.3, relative_cutoff=0.7, max_gap=0.2, min_keep=2):
+    """
+    Reorder results by combined KB and lexical score and drop the weak tail.
+
+    Args:
+        results (list): Retrieval results (any order)
+        queries (list): Query texts the results were retrieved for
+        lexical_weight (float): Share of the combined score from BM25 (0-1)
+        relative_cutoff (float): Keep results scoring at least this fraction
+            of the best combined score
+        max_gap (float): Stop at the first drop in combined score larger
+            than this (0 disables the gap rule)
+        min_keep (int): Always keep at least this many results
+
+    Returns:
+        tuple: (kept results in combined-score order, each a copy with its
+        combined score in ``rerankScore``, and a stats dict with results_in,
+        results_out and the cutoff used)
+    """
+    if len(results) <= min_keep:
+        return list(results), {"results_in": len(results), "results_out": len(results), "cutoff": 0.0}
+
+    terms = query_terms(queries)
+    if terms:
+        lexical = bm25_scores(*term_frequencies(terms, [_normalized_text(r) for r in results]))
+    else:
+        lexical = [0.0] * len(results)
+    best_lexical = max(lexical) or 1.0
+    combined = [
+        (1.0 - lexical_weight) * float(r.get("score", 0.0)) + lexical_weight * (lex / best_lexical)
+        for r, lex in zip(results, lexical)
+    ]
+    order = sorted(range(len(results)), key=combined.__getitem__, reverse=True)
+
+    cutoff = combined[order[0]] * relative_cutoff
+    kept = []
+    previous = None
+    for index in order:
+        score = combined[index]
+        if len(kept) >= min_keep:
+            if score < cutoff or (max_gap and previous - score > max_gap):
+                break
+        # Results from the caches are shared, so the score goes on a copy
+        kept.append({**results[index], "rerankScore": round(score, 4)})
+        previous = score
+    return kept, {"results_in": len(results), "results_out": len(kept), "cutoff": round(cutoff, 4)}
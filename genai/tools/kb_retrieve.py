@@ -0,0 +1,380 @@
+# kb_retrieve.py
+
+"""
+Bedrock Knowledge Base retrieval shared by the KB search tools.
+
+This mirrors strands_tools.retrieve (same inputs, same score filtering and
+same result text) but runs on the pooled bedrock-agent-runtime client from
+aws_clients instead of building a new boto3 client on every call. Results are
+served from the process-wide KB_CACHE when possible, then from the optional
+semantic cache for reworded queries. Knowledge bases with a local index
+(see tools.local_index) are searched in-process instead, without either cache.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from aws_clients import DEFAULT_REGION, get_client
+from cancellation import CANCELLATION_STATS, on_cancel
+from request_metrics import add_request_counter, request_span
+from tools.kb_cache import KB_CACHE, normalize_query
+from tools.kb_compact import compact_results
+from tools.kb_rerank import rerank_results
+from tools.kb_semantic_cache import get_semantic_cache
+
+DEFAULT_NUMBER_OF_RESULTS = 5
+DEFAULT_MIN_SCORE = 0.4
+
+# Post-retrieval compaction defaults (see tools.kb_compact)
+DEFAULT_TOKEN_BUDGET = int(os.getenv("KB_RESULT_TOKEN_BUDGET", "1500"))
+DEFAULT_DEDUPE_SIMILARITY = float(os.getenv("KB_DEDUPE_SIMILARITY", "0.85"))
+
+# Local reranking and adaptive cutoff (see tools.kb_rerank)
+DEFAULT_RERANK = os.getenv("KB_RERANK", "true").strip().lower() in ("1", "true", "yes", "on")
+RERANK_OPTIONS = {
+    "lexical_weight": float(os.getenv("KB_RERANK_LEXICAL_WEIGHT", "0.3")),
+    "relative_cutoff": float(os.getenv("KB_RERANK_RELATIVE_CUTOFF", "0.7")),
+    "max_gap": float(os.getenv("KB_RERANK_MAX_GAP", "0.2")),
+    "min_keep": int(os.getenv("KB_RERANK_MIN_KEEP", "2")),
+}
+
+# Default bounded pool for batch (multi-query) searches. Tools made by
+# tools.kb_tool fan out on a pool of their own instead, so one busy knowledge
+# base cannot starve the batch queries of the others.
+BATCH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("KB_BATCH_MAX_WORKERS", "8")),
+    thread_name_prefix="kb-batch",
+)
+
+# Default bounded pool that runs blocking retrievals for kb_search_async, so a
+# slow KB call never blocks the event loop that streams tokens for other
+# sessions. Tools made by tools.kb_tool pass a pool of their own instead.
+ASYNC_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("KB_ASYNC_MAX_CONCURRENCY", "16")),
+    thread_name_prefix="kb-async",
+)
+ASYNC_TIMEOUT_SECONDS = float(os.getenv("KB_TOOL_TIMEOUT_SECONDS", "30"))
+
+
+def retrieve_results(knowledge_base_id, text, number_of_results=DEFAULT_NUMBER_OF_RESULTS,
+                     min_score=DEFAULT_MIN_SCORE, region=DEFAULT_REGION, retrieve_filter=None,
+                     cache_namespace=None, local_index=None):
+    """
+    Query a knowledge base and return the raw results above the score threshold.
+
+    Args:
+        knowledge_base_id (str): Bedrock Knowledge Base ID
+        text (str): Query text
+        number_of_results (int): Maximum number of results to request
+        min_score (float): Minimum relevance score to keep
+        region (str): AWS region of the knowledge base
+        retrieve_filter (dict): Optional Bedrock metadata filter
+        cache_namespace (str): Cache scope for these results; defaults to the
+            knowledge base ID
+        local_index (str): Directory of a local vector index to search
+            instead of the Bedrock knowledge base
+
+    Returns:
+        list: Retrieval results sorted by descending score
+    """
+    if local_index:
+        # A local search is cheaper than a cache lookup, so it skips the caches
+        from tools.local_index import get_local_index
+        add_request_counter("kb_local_searches")
+        with request_span("kb_local_search", knowledge_base_id=knowledge_base_id):
+            return get_local_index(local_index).retrieve(text, number_of_results, min_score, retrieve_filter)
+
+    cache_scope = cache_namespace or knowledge_base_id
+
+    # Filtered queries are rare and not part of the cache key, so they bypass it
+    cache_key = None
+    if KB_CACHE is not None and not retrieve_filter:
+        cache_key = KB_CACHE.make_key(cache_scope, text, number_of_results, min_score)
+        cached = KB_CACHE.get(cache_key)
+        if cached is not None:
+            add_request_counter("kb_cache_hits")
+            return cached
+
+    semantic_cache = None if retrieve_filter else get_semantic_cache()
+    if semantic_cache is not None:
+        semantic_scope = (cache_scope, int(number_of_results), round(float(min_score), 4))
+        similar, query_vector = semantic_cache.lookup(semantic_scope, text)
+        if similar is not None:
+            add_request_counter("kb_semantic_cache_hits")
+            if cache_key is not None:
+                KB_CACHE.put(cache_key, similar)
+            return similar
+
+    client = get_client("bedrock-agent-runtime", region_name=region)
+    add_request_counter("kb_retrieve_calls")
+
+    vector_config = {"numberOfResults": number_of_results}
+    if retrieve_filter:
+        vector_config["filter"] = retrieve_filter
+
+    with request_span("kb_retrieve", knowledge_base_id=knowledge_base_id):
+        response = client.retrieve(
+            knowledgeBaseId=knowledge_base_id,
+            retrievalQuery={"text": text},
+            retrievalConfiguration={"vectorSearchConfiguration": vector_config},
+        )
+
+    results = [r for r in response.get("retrievalResults", []) if r.get("score", 0.0) >= min_score]
+    results.sort(key=lambda r: r.get("score", 0.0), reverse=True)
+
+    if cache_key is not None:
+        KB_CACHE.put(cache_key, results)
+    if semantic_cache is not None:
+        semantic_cache.add(semantic_scope, text, results, vector=query_vector)
+    return results
+
+
+def retrieve_many(knowledge_base_id, queries, number_of_results=DEFAULT_NUMBER_OF_RESULTS,
+                  min_score=DEFAULT_MIN_SCORE, region=DEFAULT_REGION, retrieve_filter=None,
+                  cache_namespace=None, local_index=None, executor=None):
+    """
+    Run several queries concurrently and merge their results.
+
+    Identical queries (after normalization) are only sent once. Results that
+    point at the same source chunk are merged keeping the best score, and the
+    merged list keeps relevance ordering.
+
+    Args:
+        knowledge_base_id (str): Bedrock Knowledge Base ID
+        queries (list): Query texts
+        number_of_results (int): Maximum number of results per query
+        min_score (float): Minimum relevance score to keep
+        region (str): AWS region of the knowledge base
+        retrieve_filter (dict): Optional Bedrock metadata filter
+        cache_namespace (str): Cache scope for these results
+        local_index (str): Directory of a local vector index to search instead
+        executor (Executor): Pool the queries fan out on; BATCH_EXECUTOR by default
+
+    Returns:
+        list: Merged retrieval results sorted by descending score
+    """
+    unique_queries = {}
+    for query in queries:
+        if isinstance(query, str) and query.strip():
+            unique_queries.setdefault(normalize_query(query), query)
+    if not unique_queries:
+        return []
+
+    def run(query):
+        return retrieve_results(knowledge_base_id, query, number_of_results=number_of_results,
+                                min_score=min_score, region=region, retrieve_filter=retrieve_filter,
+                                cache_namespace=cache_namespace, local_index=local_index)
+
+    if len(unique_queries) == 1:
+        batches = [run(next(iter(unique_queries.values())))]
+    else:
+        # Each query gets its own copy of the context, so the request's
+        # metrics and cancel scope follow it into the pool
+        pool = executor or BATCH_EXECUTOR
+        futures = [pool.submit(contextvars.copy_context().run, run, query) for query in unique_queries.values()]
+        batches = [future.result() for future in futures]
+
+    merged = {}
+    for results in batches:
+        for result in results:
+            key = result_key(result)
+            best = merged.get(key)
+            if best is None or result.get("score", 0.0) > best.get("score", 0.0):
+                merged[key] = result
+    return sorted(merged.values(), key=lambda r: r.get("score", 0.0), reverse=True)
+
+
+def result_key(result):
+    """Return the identity of the source chunk a result points at."""
+    metadata = result.get("metadata", {}) or {}
+    chunk_id = metadata.get("x-amz-bedrock-kb-chunk-id")
+    if chunk_id:
+        return (source_location(result), chunk_id)
+    return (source_location(result), (result.get("content", {}) or {}).get("text"))
+
+
+def source_location(result):
+    """Return a readable source identifier for a retrieval result."""
+    location = result.get("location", {}) or {}
+    for key, field in (("s3Location", "uri"), ("webLocation", "url"),
+                       ("confluenceLocation", "url"), ("salesforceLocation", "url"),
+                       ("sharePointLocation", "url"), ("customDocumentLocation", "id")):
+        value = (location.get(key) or {}).get(field)
+        if value:
+            return value
+    return "Unknown"
+
+
+def format_results(results, max_chars=None):
+    """
+    Format retrieval results the same way strands_tools.retrieve does.
+
+    Args:
+        results (list): Results sorted by descending score; reranked
+            results show their combined score next to the retrieval score
+        max_chars (int): Optional cap on the formatted size; lower-scored
+            results that do not fit are left out
+
+    Returns:
+        str: Formatted results
+    """
+    if not results:
+        return "No results found above score threshold."
+
+    formatted = []
+    size = 0
+    for index, result in enumerate(results):
+        score = f"Score: {result.get('score', 0.0):.4f}"
+        if "rerankScore" in result:
+            score = f"Score: {result['rerankScore']:.4f} (retrieval score {result.get('score', 0.0):.4f})"
+        lines = [f"\n{score}", f"Document ID: {source_location(result)}"]
+        if result.get("additionalLocations"):
+            lines.append(f"Also in: {', '.join(result['additionalLocations'])}")
+        content = result.get("content", {}) or {}
+        if isinstance(content.get("text"), str):
+            lines.append(f"Content: {content['text']}\n")
+        block = "\n".join(lines)
+        if max_chars and size + len(block) > max_chars:
+            if not formatted:
+                # Always return something from the best result
+                formatted.append(block[:max_chars] + " [truncated]")
+            omitted = len(results) - len(formatted)
+            if omitted:
+                formatted.append(f"\n[{omitted} lower-scored results omitted to fit the result size limit]")
+            break
+        formatted.append(block)
+        size += len(block) + 1
+    return "\n".join(formatted)
+
+
+def kb_search(tool, knowledge_base_id, region=DEFAULT_REGION, cache_namespace=None,
+              max_result_chars=None, token_budget=DEFAULT_TOKEN_BUDGET,
+              dedupe_similarity=DEFAULT_DEDUPE_SIMILARITY, rerank=DEFAULT_RERANK, local_index=None,
+              batch_executor=None, **kwargs: Any):
+    """
+    Run a knowledge base search for a Strands tool call.
+
+    Args:
+        tool: Tool object containing toolUseId and input parameters
+        knowledge_base_id (str): Bedrock Knowledge Base ID to search
+        region (str): AWS region of the knowledge base
+        cache_namespace (str): Cache scope for this knowledge base's results
+        max_result_chars (int): Optional cap on the size of the result text
+        token_budget (int): Estimated tokens of passage text to return after
+            deduplication; 0 disables the budget
+        dedupe_similarity (float): Similarity at which passages count as duplicates
+        rerank (bool): Rerank results locally and drop the weak tail
+        local_index (str): Directory of a local vector index to search
+            instead of the Bedrock knowledge base
+        batch_executor (Executor): Pool that multi-query calls fan out on;
+            BATCH_EXECUTOR by default
+        **kwargs: Additional keyword arguments from the agent (unused)
+
+    Returns:
+        dict: ToolResult with the formatted search results
+    """
+    tool_use_id = tool["toolUseId"]
+    tool_input = tool["input"]
+
+    try:
+        min_score = tool_input.get("score", DEFAULT_MIN_SCORE)
+        queries = [tool_input.get("text")] + list(tool_input.get("queries") or [])
+        queries = [q for q in queries if isinstance(q, str) and q.strip()]
+        if not queries:
+            raise ValueError("Provide a query in 'text' or a list of queries in 'queries'")
+
+        with request_span(f"tool.{tool.get('name', 'kb_search')}", queries=len(queries)):
+            results = retrieve_many(
+                knowledge_base_id,
+                queries,
+                number_of_results=tool_input.get("numberOfResults", DEFAULT_NUMBER_OF_RESULTS),
+                min_score=min_score,
+                region=region,
+                retrieve_filter=tool_input.get("retrieveFilter"),
+                cache_namespace=cache_namespace,
+                local_index=local_index,
+                executor=batch_executor,
+            )
+            retrieved = len(results)
+            if rerank:
+                results, _ = rerank_results(results, queries, **RERANK_OPTIONS)
+            results, compaction = compact_results(
+                results,
+                token_budget=token_budget,
+                similarity_threshold=dedupe_similarity,
+                location_fn=source_location,
+            )
+        add_request_counter("kb_results_dropped", retrieved - compaction["results_out"])
+        add_request_counter("kb_tokens_saved", compaction["tokens_before"] - compaction["tokens_after"])
+
+        header = f"Retrieved {len(results)} results with score >= {min_score}"
+        if len(queries) > 1:
+            header += f" for {len(queries)} queries"
+        if compaction["results_out"] < retrieved:
+            header += f" ({retrieved - compaction['results_out']} duplicate or lower-ranked results left out)"
+        return {
+            "toolUseId": tool_use_id,
+            "status": "success",
+            "content": [{"text": f"{header}:\n{format_results(results, max_chars=max_result_chars)}"}],
+        }
+    except Exception as e:
+        return {
+            "toolUseId": tool_use_id,
+            "status": "error",
+            "content": [{"text": f"Error during retrieval: {str(e)}"}],
+        }
+
+
+async def kb_search_async(tool, knowledge_base_id, region=DEFAULT_REGION, executor=None,
+                          timeout_seconds=None, **kwargs: Any):
+    """
+    Async version of kb_search that never blocks the event loop.
+
+    The blocking boto3 retrieval runs on ``executor`` (ASYNC_EXECUTOR by
+    default), whose size bounds how many retrievals are in flight, and is
+    abandoned with an error result after ``timeout_seconds``
+    (KB_TOOL_TIMEOUT_SECONDS by default), including time spent queued.
+
+    Args:
+        tool: Tool object containing toolUseId and input parameters
+        knowledge_base_id (str): Bedrock Knowledge Base ID to search
+        region (str): AWS region of the knowledge base
+        executor (Executor): Pool to run the retrieval on
+        timeout_seconds (float): Time limit for the search
+        **kwargs: cache_namespace, max_result_chars, token_budget,
+            dedupe_similarity, rerank, local_index and batch_executor are
+            passed on to kb_search; anything else from the agent is ignored
+
+    Returns:
+        dict: ToolResult with the formatted search results
+    """
+    timeout_seconds = ASYNC_TIMEOUT_SECONDS if timeout_seconds is None else timeout_seconds
+    options = {k: kwargs[k] for k in ("cache_namespace", "max_result_chars", "token_budget", "dedupe_similarity",
+                                      "rerank", "local_index", "batch_executor") if k in kwargs}
+    loop = asyncio.get_running_loop()
+    # run_in_executor does not carry context variables over, so copy them explicitly
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, kb_search, tool, knowledge_base_id, region, **options)
+    future = loop.run_in_executor(executor or ASYNC_EXECUTOR, call)
+    # A cancelled request drops the retrieval if it is still queued and stops waiting for it otherwise
+    unregister = on_cancel(lambda: loop.call_soon_threadsafe(_cancel_retrieval, future))
+    try:
+        return await asyncio.wait_for(future, timeout_seconds)
+    except asyncio.TimeoutError:
+        add_request_counter("kb_timeouts")
+        return {
+            "toolUseId": tool["toolUseId"],
+            "status": "error",
+            "content": [{"text": f"Error during retrieval: timed out after {timeout_seconds:g} seconds"}],
+        }
+    finally:
+        unregister()
+
+
+def _cancel_retrieval(future):
+    if future.cancel():
+        add_request_counter("kb_cancelled")
+        CANCELLATION_STATS.add("cancelled_tool_calls")
@@ -0,0 +1,269 @@
+# kb_semantic_cache.py
+
+"""
+Near-duplicate (embedding similarity) cache in front of the KB tools.
+
+The exact-match KB_CACHE misses queries that are worded differently but ask
+the same thing ("Fed rate hike Dec 2015" vs "December 2015 FOMC increase").
+This layer embeds each query, keeps the unit vectors in one preallocated
+float32 NumPy matrix and answers with the cached results of the most similar
+previous query when the cosine similarity clears a threshold.
+
+The embedding function is pluggable: bedrock_embedder uses Titan Text
+Embeddings on the pooled bedrock-runtime client, and hashing_embedder is a
+deterministic local embedder for tests and offline use.
+
+Configuration (environment variables):
+    KB_SEMANTIC_CACHE           Enable the layer (false)
+    KB_SEMANTIC_EMBEDDER        'bedrock' or 'hashing' (bedrock)
+    KB_SEMANTIC_THRESHOLD       Minimum cosine similarity for a hit (0.92)
+    KB_SEMANTIC_MAX_BYTES       Memory budget for vectors plus cached results (16777216)
+    KB_SEMANTIC_DIMENSIONS      Embedding size (256)
+
+NumPy is an optional dependency; without it the layer stays disabled.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from aws_clients import get_client
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def hashing_embedder(dimensions=256):
+    """
+    Return a deterministic local embedder based on feature hashing.
+
+    Words and word bigrams are hashed into a fixed number of buckets, so the
+    same text always gets the same unit vector without any network call.
+
+    Args:
+        dimensions (int): Embedding size
+
+    Returns:
+        callable: Function mapping text to a float32 unit vector
+    """
+    def embed(text):
+        vector = np.zeros(dimensions, dtype=np.float32)
+        tokens = _TOKEN_RE.findall(text.casefold())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % dimensions] += 1.0 if (value >> 63) else -1.0
+        return vector
+
+    embed.dimensions = dimensions
+    return embed
+
+
+def bedrock_embedder(model_id="amazon.titan-embed-text-v2:0", dimensions=256, region_name="us-east-1"):
+    """
+    Return an embedder that calls Titan Text Embeddings on the pooled client.
+
+    Args:
+        model_id (str): Bedrock embedding model ID
+        dimensions (int): Output size supported by the model (256, 512 or 1024 for v2)
+        region_name (str): AWS region
+
+    Returns:
+        callable: Function mapping text to a float32 vector
+    """
+    def embed(text):
+        client = get_client("bedrock-runtime", region_name=region_name)
+        response = client.invoke_model(
+            modelId=model_id,
+            body=json.dumps({"inputText": text, "dimensions": dimensions, "normalize": True}),
+        )
+        payload = json.loads(response["body"].read())
+        return np.asarray(payload["embedding"], dtype=np.float32)
+
+    embed.dimensions = dimensions
+    return embed
+
+
+class SemanticCache:
+    """
+    Cosine top-1 cache of retrieval results over a fixed-size vector matrix.
+
+    Entries are scoped by (knowledgeBaseId, numberOfResults, score) so a hit
+    only ever returns results produced with the same retrieval settings.
+
+    Args:
+        embed_fn (callable): Maps text to a 1-D vector; must expose ``dimensions``
+            or pass ``dimensions`` explicitly
+        threshold (float): Minimum cosine similarity for a hit
+        max_bytes (int): Budget for the vector matrix plus serialized results
+        dimensions (int): Embedding size, defaults to ``embed_fn.dimensions``
+    """
+
+    def __init__(self, embed_fn, threshold=0.92, max_bytes=16 * 1024 * 1024, dimensions=None):
+        if np is None:
+            raise RuntimeError("SemanticCache requires numpy")
+        self.embed_fn = embed_fn
+        self.threshold = float(threshold)
+        self.dimensions = int(dimensions or getattr(embed_fn, "dimensions"))
+        self.max_bytes = int(max_bytes)
+
+        # Half of the budget is reserved for vectors, the rest for result payloads
+        row_bytes = self.dimensions * 4
+        self.capacity = max(1, (self.max_bytes // 2) // row_bytes)
+        self.payload_budget = self.max_bytes - self.capacity * row_bytes
+
+        self._vectors = np.zeros((self.capacity, self.dimensions), dtype=np.float32)
+        self._scopes = np.full(self.capacity, -1, dtype=np.int32)
+        self._last_used = np.zeros(self.capacity, dtype=np.float64)
+        self._payloads = [None] * self.capacity
+        self._payload_bytes = 0
+        self._scope_ids = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def embed(self, text):
+        """Return the unit-normalized float32 embedding for text."""
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _scope_id(self, scope):
+        scope_id = self._scope_ids.get(scope)
+        if scope_id is None:
+            scope_id = len(self._scope_ids)
+            self._scope_ids[scope] = scope_id
+        return scope_id
+
+    def lookup(self, scope, text):
+        """
+        Find cached results for the most similar query in the same scope.
+
+        Args:
+            scope (tuple): (knowledgeBaseId, numberOfResults, score)
+            text (str): Query text
+
+        Returns:
+            tuple: (results or None, query vector) - pass the vector to add() on a miss
+        """
+        vector = self.embed(text)
+        with self._lock:
+            scope_id = self._scope_ids.get(scope)
+            if scope_id is not None:
+                similarities = self._vectors @ vector
+                similarities[self._scopes != scope_id] = -np.inf
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._last_used[best] = time.monotonic()
+                    self.hits += 1
+                    return json.loads(self._payloads[best]), vector
+            self.misses += 1
+        return None, vector
+
+    def add(self, scope, text, results, vector=None):
+        """
+        Store results for a query, evicting least recently used rows as needed.
+
+        Args:
+            scope (tuple): (knowledgeBaseId, numberOfResults, score)
+            text (str): Query text
+            results (list): JSON-serializable retrieval results
+            vector: Embedding returned by lookup(), computed if omitted
+        """
+        if vector is None:
+            vector = self.embed(text)
+        payload = json.dumps(results, default=str).encode("utf-8")
+        if len(payload) > self.payload_budget:
+            return
+
+        with self._lock:
+            free = np.flatnonzero(self._scopes < 0)
+            row = int(free[0]) if free.size else self._evict_one()
+            while self._payload_bytes + len(payload) > self.payload_budget:
+                self._evict_one()
+
+            self._vectors[row] = vector
+            self._scopes[row] = self._scope_id(scope)
+            self._last_used[row] = time.monotonic()
+            self._payloads[row] = payload
+            self._payload_bytes += len(payload)
+
+    def _evict_one(self):
+        used = self._scopes >= 0
+        candidates = np.where(used, self._last_used, np.inf)
+        row = int(np.argmin(candidates))
+        self._clear_row(row)
+        self.evictions += 1
+        return row
+
+    def _clear_row(self, row):
+        if self._payloads[row] is not None:
+            self._payload_bytes -= len(self._payloads[row])
+        self._payloads[row] = None
+        self._scopes[row] = -1
+        self._vectors[row] = 0.0
+        self._last_used[row] = 0.0
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            for row in range(self.capacity):
+                self._clear_row(row)
+            self._scope_ids.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Return a snapshot of the cache counters and hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": int(np.count_nonzero(self._scopes >= 0)),
+                "capacity": self.capacity,
+                "payload_bytes": self._payload_bytes,
+                "max_bytes": self.max_bytes,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_semantic_cache = None
+
+
+def _cache_from_env():
+    if np is None or os.getenv("KB_SEMANTIC_CACHE", "false").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    dimensions = int(os.getenv("KB_SEMANTIC_DIMENSIONS", "256"))
+    if os.getenv("KB_SEMANTIC_EMBEDDER", "bedrock") == "hashing":
+        embed_fn = hashing_embedder(dimensions)
+    else:
+        embed_fn = bedrock_embedder(dimensions=dimensions)
+    return SemanticCache(
+        embed_fn,
+        threshold=float(os.getenv("KB_SEMANTIC_THRESHOLD", "0.92")),
+        max_bytes=int(os.getenv("KB_SEMANTIC_MAX_BYTES", str(16 * 1024 * 1024))),
+    )
+
+
+def get_semantic_cache():
+    """Return the process-wide semantic cache, or None when it is disabled."""
+    return _semantic_cache
+
+
+def set_semantic_cache(cache):
+    """Replace the process-wide semantic cache (None disables the layer)."""
+    global _semantic_cache
+    _semantic_cache = cache
+
+
+_semantic_cache = _cache_from_env()
@@ -0,0 +1,240 @@
+# kb_tool.py
+
+"""
+Factory for knowledge base search tools.
+
+Every knowledge base is described by a KnowledgeBaseSpec and gets its own
+tool with its own budget:
+
+- a bounded worker pool (max_concurrency), and a second pool of the same
+  size that multi-query calls fan out on; a hot corpus queues behind its
+  own limits and cannot take the workers or pooled connections other
+  corpora need
+- a timeout covering queueing and retrieval
+- a cap on the size of the result text handed back to the model
+- a cache namespace for KB_CACHE and the semantic cache (the knowledge base
+  ID by default)
+- a token budget and duplicate threshold for result compaction
+- whether results are reranked locally before compaction
+- optionally a local vector index (tools.local_index) searched instead of
+  the Bedrock knowledge base
+
+Defaults come from KB_MAX_CONCURRENCY, KB_TOOL_TIMEOUT_SECONDS,
+KB_MAX_RESULT_CHARS, KB_RESULT_TOKEN_BUDGET, KB_DEDUPE_SIMILARITY and
+KB_RERANK.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional
+from strands.tools.tools import PythonAgentTool
+from tools.kb_retrieve import (ASYNC_TIMEOUT_SECONDS, DEFAULT_DEDUPE_SIMILARITY, DEFAULT_REGION,
+                               DEFAULT_RERANK, DEFAULT_TOKEN_BUDGET, kb_search, kb_search_async)
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("KB_MAX_CONCURRENCY", "4"))
+DEFAULT_MAX_RESULT_CHARS = int(os.getenv("KB_MAX_RESULT_CHARS", "20000"))
+
+
+@dataclass(frozen=True)
+class KnowledgeBaseSpec:
+    """
+    Declarative description of a knowledge base search tool.
+
+    Attributes:
+        name: Tool name shown to the model
+        knowledge_base_id: Bedrock Knowledge Base ID to search
+        description: What the knowledge base contains and when to search it
+        region: AWS region of the knowledge base
+        max_concurrency: Retrievals for this knowledge base running at once
+        timeout_seconds: Time limit for one tool call, including queueing
+        max_result_chars: Cap on the result text returned to the model (0 = no cap)
+        cache_namespace: Cache scope for results; the knowledge base ID if unset
+        token_budget: Estimated tokens of passage text per call (0 = no budget)
+        dedupe_similarity: Similarity at which two passages count as duplicates
+        rerank: Rerank results by KB score plus BM25 and drop the weak tail
+        local_index: Directory of a local vector index built from the same
+            corpus; when set, searches run in-process instead of on Bedrock
+    """
+    name: str
+    knowledge_base_id: str
+    description: str
+    region: str = DEFAULT_REGION
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    timeout_seconds: float = ASYNC_TIMEOUT_SECONDS
+    max_result_chars: int = DEFAULT_MAX_RESULT_CHARS
+    cache_namespace: Optional[str] = None
+    token_budget: int = DEFAULT_TOKEN_BUDGET
+    dedupe_similarity: float = DEFAULT_DEDUPE_SIMILARITY
+    rerank: bool = DEFAULT_RERANK
+    local_index: Optional[str] = None
+
+
+def kb_tool_spec(name, description):
+    """
+    Build the tool specification shared by all knowledge base search tools.
+
+    Args:
+        name (str): Tool name shown to the model
+        description (str): What the knowledge base contains and when to search it
+
+    Returns:
+        dict: Strands tool specification
+    """
+    return {
+        "name": name,
+        "description": description.rstrip() + "\n\nResults are sorted by relevance score and include source metadata.\n"
+                       "Pass several questions in queries to search them in parallel in a single call.",
+        "inputSchema": {
+            "json": {
+                "type": "object",
+                "properties": {
+                    "text": {
+                        "type": "string",
+                        "description": "The query to search for in the knowledge base. Required unless queries is given."
+                    },
+                    "queries": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Several related queries to run concurrently in one call. Results are merged, de-duplicated and sorted by relevance. Use instead of, or in addition to, text."
+                    },
+                    "numberOfResults": {
+                        "type": "integer",
+                        "description": "The maximum number of results to return. Default is 5.",
+                        "default": 5
+                    },
+                    "score": {
+                        "type": "number",
+                        "description": "Minimum relevance score threshold (0.0-1.0). Results below this score will be filtered out. Default is 0.4.",
+                        "default": 0.4,
+                        "minimum": 0.0,
+                        "maximum": 1.0
+                    }
+                },
+                # Either text or queries must be given; checked in kb_search
+                "required": []
+            }
+        }
+    }
+
+
+class KnowledgeBaseSearch:
+    """
+    Search functions and counters for one knowledge base.
+
+    Args:
+        spec (KnowledgeBaseSpec): The knowledge base and its budget
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, int(spec.max_concurrency)),
+            thread_name_prefix=f"kb-{spec.name}",
+        )
+        # Separate from self.executor: a search waiting on its own pool for
+        # its fan-out could deadlock once every worker is a waiting search
+        self.batch_executor = ThreadPoolExecutor(
+            max_workers=max(1, int(spec.max_concurrency)),
+            thread_name_prefix=f"kb-{spec.name}-batch",
+        )
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.in_flight = 0
+        self.errors = 0
+
+    def _options(self):
+        return {
+            "cache_namespace": self.spec.cache_namespace,
+            "max_result_chars": self.spec.max_result_chars or None,
+            "token_budget": self.spec.token_budget,
+            "dedupe_similarity": self.spec.dedupe_similarity,
+            "rerank": self.spec.rerank,
+            "local_index": self.spec.local_index,
+            "batch_executor": self.batch_executor,
+        }
+
+    def search(self, tool, **kwargs: Any):
+        """Run a search on the calling thread (sync tool interface)."""
+        return kb_search(tool, self.spec.knowledge_base_id, self.spec.region, **self._options())
+
+    async def search_async(self, tool, **kwargs: Any):
+        """Run a search on this knowledge base's worker pool."""
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+        try:
+            result = await kb_search_async(
+                tool,
+                self.spec.knowledge_base_id,
+                self.spec.region,
+                executor=self.executor,
+                timeout_seconds=self.spec.timeout_seconds,
+                **self._options()
+            )
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if result.get("status") == "error":
+            with self._lock:
+                self.errors += 1
+        return result
+
+    def stats(self):
+        """Return a snapshot of this knowledge base's counters."""
+        with self._lock:
+            return {
+                "knowledge_base_id": self.spec.knowledge_base_id,
+                "backend": "local" if self.spec.local_index else "bedrock",
+                "max_concurrency": self.spec.max_concurrency,
+                "calls": self.calls,
+                "in_flight": self.in_flight,
+                "errors": self.errors,
+            }
+
+
+# Searches by tool name; a spec registered again under the same name reuses
+# the existing pool when nothing changed. A replaced pool is not shut down
+# because pooled agents may still hold tools that use it.
+_searches = {}
+_searches_lock = threading.Lock()
+
+
+def kb_search_for(spec):
+    """
+    Return the KnowledgeBaseSearch for a spec, creating it on first use.
+
+    Args:
+        spec (KnowledgeBaseSpec): The knowledge base and its budget
+
+    Returns:
+        KnowledgeBaseSearch: Search functions sharing the knowledge base's pools
+    """
+    with _searches_lock:
+        search = _searches.get(spec.name)
+        if search is None or search.spec != spec:
+            search = KnowledgeBaseSearch(spec)
+            _searches[spec.name] = search
+        return search
+
+
+def make_kb_tool(spec):
+    """
+    Create an agent tool that searches one knowledge base.
+
+    Args:
+        spec (KnowledgeBaseSpec): The knowledge base and its budget
+
+    Returns:
+        PythonAgentTool: Async tool running on the knowledge base's own pool
+    """
+    search = kb_search_for(spec)
+    return PythonAgentTool(spec.name, kb_tool_spec(spec.name, spec.description), search.search_async)
+
+
+def kb_tool_stats():
+    """Return per-knowledge-base counters for every tool made by make_kb_tool."""
+    with _searches_lock:
+        searches = list(_searches.values())
+    return {search.spec.name: search.stats() for search in searches}
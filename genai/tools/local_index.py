@@ -0,0 +1,469 @@
+# local_index.py
+
+"""
+Local vector index: an offline retrieval backend for the KB search tools.
+
+A knowledge base whose spec sets ``local_index`` is searched in-process
+instead of through the Bedrock Retrieve API, so a hot corpus (FOMC, SCOTUS)
+answers without a network round trip or a per-query charge. Indexes are
+built from the data pulls by ``data_pulls/build_local_index.py`` and stored
+as a directory:
+
+    manifest.json       format version, embedder, sizes and IVF settings
+    embeddings.npy      float32 [chunks, dimensions], unit-normalized rows
+    chunks.bin          UTF-8 chunk texts back to back
+    chunk_offsets.npy   int64 [chunks + 1], byte offsets into chunks.bin
+    chunk_docs.npy      int32 [chunks], document of each chunk
+    documents.json      [{"uri": ..., "metadata": {...}}, ...]
+    ivf_centroids.npy   float32 [lists, dimensions] (IVF indexes only)
+    ivf_offsets.npy     int64 [lists + 1] (IVF indexes only)
+
+The arrays are opened with ``np.load(mmap_mode="r")`` and the chunk texts
+with ``np.memmap``, so loading copies nothing and every worker process
+shares one copy of the index in the OS page cache. Small indexes are
+searched brute force (one matrix-vector product); IVF indexes store the rows
+of each inverted list contiguously, and a search scores the ``nprobe`` lists
+whose centroids are closest to the query.
+
+Results have the shape of Bedrock Retrieve results, so caching, reranking,
+compaction and formatting work unchanged. Scores are mapped from cosine
+similarity to (1 + cosine) / 2, the scale of the Bedrock vector stores, so
+the usual ``score`` thresholds keep their meaning.
+
+NumPy is an optional dependency; without it local indexes cannot be loaded.
+"""
+
+import functools
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tools.kb_semantic_cache import bedrock_embedder, hashing_embedder, np
+
+FORMAT_VERSION = 1
+
+# Overrides the nprobe stored in IVF manifests when set
+DEFAULT_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", "0"))
+
+# Query embeddings kept per index, so repeated queries skip the embedder
+QUERY_CACHE_SIZE = int(os.getenv("LOCAL_INDEX_QUERY_CACHE", "1024"))
+
+
+def embedder_from_config(config):
+    """
+    Create the embedder an index was built with.
+
+    Args:
+        config (dict): ``embedder`` section of a manifest: ``type`` ('hashing'
+            or 'bedrock'), ``dimensions`` and, for Bedrock, ``model_id`` and
+            ``region``
+
+    Returns:
+        callable: Function mapping text to a 1-D vector
+    """
+    dimensions = int(config["dimensions"])
+    if config["type"] == "hashing":
+        return hashing_embedder(dimensions)
+    if config["type"] == "bedrock":
+        return bedrock_embedder(model_id=config["model_id"], dimensions=dimensions,
+                                region_name=config.get("region", "us-east-1"))
+    raise ValueError(f"Unknown embedder type '{config['type']}'")
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+# Bedrock metadata filter operators (see the Retrieve API) over one value
+_COMPARISONS = {
+    "equals": lambda value, target: value == target,
+    "notEquals": lambda value, target: value != target,
+    "greaterThan": lambda value, target: value > target,
+    "greaterThanOrEquals": lambda value, target: value >= target,
+    "lessThan": lambda value, target: value < target,
+    "lessThanOrEquals": lambda value, target: value <= target,
+    "in": lambda value, target: value in target,
+    "notIn": lambda value, target: value not in target,
+    "startsWith": lambda value, target: isinstance(value, str) and value.startswith(target),
+    "stringContains": lambda value, target: target in value,
+    "listContains": lambda value, target: isinstance(value, list) and target in value,
+}
+
+
+def matches_filter(metadata, retrieve_filter):
+    """
+    Evaluate a Bedrock Retrieve metadata filter against document metadata.
+
+    Args:
+        metadata (dict): Document metadata
+        retrieve_filter (dict): Filter such as ``{"equals": {"key": "year",
+            "value": 2008}}``, possibly nested in ``andAll`` / ``orAll``
+
+    Returns:
+        bool: Whether the document passes the filter
+    """
+    if "andAll" in retrieve_filter:
+        return all(matches_filter(metadata, f) for f in retrieve_filter["andAll"])
+    if "orAll" in retrieve_filter:
+        return any(matches_filter(metadata, f) for f in retrieve_filter["orAll"])
+    if len(retrieve_filter) != 1:
+        raise ValueError(f"Unsupported filter: {retrieve_filter}")
+    operator, condition = next(iter(retrieve_filter.items()))
+    compare = _COMPARISONS.get(operator)
+    if compare is None:
+        raise ValueError(f"Unsupported filter operator '{operator}'")
+    key = condition["key"]
+    if key not in metadata:
+        # Like Bedrock, a missing attribute only passes negative conditions
+        return operator in ("notEquals", "notIn")
+    try:
+        return bool(compare(metadata[key], condition["value"]))
+    except TypeError:
+        return False
+
+
+class LocalVectorIndex:
+    """
+    Read-only, memory-mapped vector index over chunked documents.
+
+    Args:
+        path (str): Index directory written by build_index()
+    """
+
+    def __init__(self, path):
+        if np is None:
+            raise RuntimeError("Local vector indexes require numpy")
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported local index format in {path}: {self.manifest.get('format_version')}")
+
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode="r")
+
+        self.embeddings = load("embeddings.npy")
+        self.chunk_offsets = load("chunk_offsets.npy")
+        self.chunk_docs = load("chunk_docs.npy")
+        self._texts = np.memmap(os.path.join(path, "chunks.bin"), dtype=np.uint8, mode="r")
+        with open(os.path.join(path, "documents.json")) as f:
+            self.documents = json.load(f)
+
+        ivf = self.manifest.get("ivf")
+        self.centroids = load("ivf_centroids.npy") if ivf else None
+        self.list_offsets = load("ivf_offsets.npy") if ivf else None
+        self.nprobe = DEFAULT_NPROBE or (ivf or {}).get("nprobe", 0)
+
+        self._embed_fn = embedder_from_config(self.manifest["embedder"])
+        self._embed_cached = functools.lru_cache(maxsize=QUERY_CACHE_SIZE)(self._embed)
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.search_seconds = 0.0
+
+    def __len__(self):
+        return int(self.embeddings.shape[0])
+
+    def _embed(self, text):
+        vector = np.asarray(self._embed_fn(text), dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vector))
+        vector = vector / norm if norm else vector
+        vector.setflags(write=False)
+        return vector
+
+    def embed(self, text):
+        """Return the unit-normalized query embedding for text."""
+        return self._embed_cached(text)
+
+    def search(self, vector, k, retrieve_filter=None):
+        """
+        Return the rows most similar to a unit query vector.
+
+        Filtered searches score every row, so the filter never empties the
+        candidate lists an IVF search would have probed.
+
+        Args:
+            vector: Unit-normalized query embedding
+            k (int): Number of rows to return
+            retrieve_filter (dict): Optional Bedrock metadata filter
+
+        Returns:
+            tuple: (row indices, cosine similarities), best first
+        """
+        if self.centroids is not None and not retrieve_filter and 0 < self.nprobe < len(self.centroids):
+            probes = np.argpartition(-(self.centroids @ vector), self.nprobe - 1)[:self.nprobe]
+            ranges = [(int(self.list_offsets[p]), int(self.list_offsets[p + 1])) for p in probes]
+            rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+            scores = np.concatenate([self.embeddings[start:end] @ vector for start, end in ranges])
+        else:
+            rows = None
+            scores = self.embeddings @ vector
+
+        if retrieve_filter:
+            allowed = np.fromiter((matches_filter(doc.get("metadata", {}), retrieve_filter)
+                                   for doc in self.documents), dtype=bool, count=len(self.documents))
+            scores = np.where(allowed[self.chunk_docs], scores, -np.inf)
+
+        k = min(int(k), scores.shape[0])
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        return (top if rows is None else rows[top]), scores[top]
+
+    def chunk_text(self, row):
+        """Return the text of one chunk."""
+        start, end = int(self.chunk_offsets[row]), int(self.chunk_offsets[row + 1])
+        return self._texts[start:end].tobytes().decode("utf-8")
+
+    def result(self, row, similarity):
+        """Build a Bedrock Retrieve result for one chunk."""
+        document = self.documents[int(self.chunk_docs[row])]
+        uri = document["uri"]
+        if uri.startswith("s3://"):
+            location = {"type": "S3", "s3Location": {"uri": uri}}
+        else:
+            location = {"type": "CUSTOM", "customDocumentLocation": {"id": uri}}
+        return {
+            "content": {"text": self.chunk_text(row), "type": "TEXT"},
+            "location": location,
+            "metadata": {
+                **document.get("metadata", {}),
+                "x-amz-bedrock-kb-source-uri": uri,
+                "x-amz-bedrock-kb-chunk-id": f"local-{int(row)}",
+            },
+            "score": (1.0 + float(similarity)) / 2.0,
+        }
+
+    def retrieve(self, text, number_of_results=5, min_score=0.0, retrieve_filter=None):
+        """
+        Search the index like the Bedrock Retrieve API.
+
+        Args:
+            text (str): Query text
+            number_of_results (int): Maximum number of results
+            min_score (float): Minimum relevance score to keep
+            retrieve_filter (dict): Optional Bedrock metadata filter
+
+        Returns:
+            list: Retrieval results sorted by descending score
+        """
+        vector = self.embed(text)
+        started = time.perf_counter()
+        rows, similarities = self.search(vector, number_of_results, retrieve_filter)
+        results = [self.result(row, similarity) for row, similarity in zip(rows, similarities)
+                   if (1.0 + float(similarity)) / 2.0 >= min_score]
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.searches += 1
+            self.search_seconds += elapsed
+        return results
+
+    def stats(self):
+        """Return the index size and search counters."""
+        with self._lock:
+            searches, seconds = self.searches, self.search_seconds
+        return {
+            "path": self.path,
+            "chunks": len(self),
+            "documents": len(self.documents),
+            "dimensions": int(self.embeddings.shape[1]),
+            "ivf_lists": 0 if self.centroids is None else len(self.centroids),
+            "nprobe": self.nprobe,
+            "searches": searches,
+            "mean_search_ms": seconds * 1000.0 / searches if searches else 0.0,
+        }
+
+
+# Loaded indexes by path; an index rebuilt in place is reopened on next use
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_local_index(path):
+    """
+    Return the process-wide LocalVectorIndex for a directory.
+
+    The index is reopened when its manifest changes, so a rebuilt index is
+    picked up without a restart. Searches still using the old index keep
+    reading its (unlinked) files.
+
+    Args:
+        path (str): Index directory
+
+    Returns:
+        LocalVectorIndex: The loaded index
+    """
+    path = os.path.abspath(path)
+    version = os.stat(os.path.join(path, "manifest.json")).st_mtime_ns
+    with _indexes_lock:
+        entry = _indexes.get(path)
+        if entry is None or entry[0] != version:
+            entry = (version, LocalVectorIndex(path))
+            _indexes[path] = entry
+        return entry[1]
+
+
+def local_index_stats():
+    """Return stats for every loaded local index."""
+    with _indexes_lock:
+        indexes = [entry[1] for entry in _indexes.values()]
+    return {index.path: index.stats() for index in indexes}
+
+
+def chunk_words(text, size=300, overlap=60):
+    """
+    Split text into chunks of ``size`` words that overlap by ``overlap`` words.
+
+    Returns:
+        list: Chunk texts
+    """
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, size - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + size]))
+        if start + size >= len(words):
+            break
+    return chunks
+
+
+def train_ivf(embeddings, lists, iterations=10, sample_size=100000, seed=0):
+    """
+    Train spherical k-means centroids for an IVF index.
+
+    Args:
+        embeddings: Unit-normalized float32 rows
+        lists (int): Number of inverted lists (centroids)
+        iterations (int): k-means iterations
+        sample_size (int): Rows sampled for training
+        seed (int): Random seed
+
+    Returns:
+        numpy.ndarray: Unit-normalized float32 centroids [lists, dimensions]
+    """
+    rng = np.random.default_rng(seed)
+    sample = embeddings
+    if len(embeddings) > sample_size:
+        sample = embeddings[rng.choice(len(embeddings), sample_size, replace=False)]
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign_lists(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = np.flatnonzero(~sums.any(axis=1))
+        # Restart empty lists from random rows
+        sums[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        centroids = _normalize_rows(sums).astype(np.float32)
+    return centroids
+
+
+def assign_lists(embeddings, centroids, batch_size=8192):
+    """Return the closest centroid of every row."""
+    assignment = np.empty(len(embeddings), dtype=np.int64)
+    for start in range(0, len(embeddings), batch_size):
+        assignment[start:start + batch_size] = np.argmax(embeddings[start:start + batch_size] @ centroids.T, axis=1)
+    return assignment
+
+
+def build_index(documents, path, embed_fn, embedder_config, chunk_size=300, chunk_overlap=60,
+                ivf_lists=0, nprobe=None, workers=1):
+    """
+    Chunk, embed and write documents as a local vector index.
+
+    The index is written next to ``path`` and moved into place when
+    complete, so servers never open a half-written index.
+
+    Args:
+        documents (iterable): (uri, text, metadata) tuples
+        path (str): Index directory to create or replace
+        embed_fn (callable): Maps text to a 1-D vector
+        embedder_config (dict): Manifest description of ``embed_fn``, used
+            to embed queries (see embedder_from_config)
+        chunk_size (int): Words per chunk
+        chunk_overlap (int): Words shared by consecutive chunks
+        ivf_lists (int): Number of IVF lists; 0 builds a brute-force index
+        nprobe (int): Lists searched per query; defaults to 1/64 of the
+            lists (at least 8)
+        workers (int): Threads embedding chunks concurrently
+
+    Returns:
+        dict: The manifest
+    """
+    if np is None:
+        raise RuntimeError("Building a local vector index requires numpy")
+    catalog, texts, chunk_docs = [], [], []
+    for uri, text, metadata in documents:
+        chunks = chunk_words(text, chunk_size, chunk_overlap)
+        if chunks:
+            texts.extend(chunks)
+            chunk_docs.extend([len(catalog)] * len(chunks))
+            catalog.append({"uri": uri, "metadata": metadata})
+    if not texts:
+        raise ValueError("No text to index")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        vectors = list(executor.map(lambda t: np.asarray(embed_fn(t), dtype=np.float32).reshape(-1), texts))
+    embeddings = _normalize_rows(np.stack(vectors)).astype(np.float32)
+    chunk_docs = np.asarray(chunk_docs, dtype=np.int32)
+
+    ivf = None
+    ivf_lists = min(int(ivf_lists or 0), len(texts))
+    if ivf_lists > 1:
+        centroids = train_ivf(embeddings, ivf_lists)
+        assignment = assign_lists(embeddings, centroids)
+        # Store each list's rows contiguously so a probe is one slice
+        order = np.argsort(assignment, kind="stable")
+        embeddings, chunk_docs = embeddings[order], chunk_docs[order]
+        texts = [texts[i] for i in order]
+        list_offsets = np.zeros(ivf_lists + 1, dtype=np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(assignment, minlength=ivf_lists))
+        ivf = {"lists": ivf_lists, "nprobe": int(nprobe or max(8, ivf_lists // 64))}
+
+    encoded = [t.encode("utf-8") for t in texts]
+    chunk_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    chunk_offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "embedder": embedder_config,
+        "chunks": len(texts),
+        "documents": len(catalog),
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "ivf": ivf,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+    path = os.path.abspath(path)
+    staging = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    np.save(os.path.join(staging, "embeddings.npy"), embeddings)
+    np.save(os.path.join(staging, "chunk_offsets.npy"), chunk_offsets)
+    np.save(os.path.join(staging, "chunk_docs.npy"), chunk_docs)
+    with open(os.path.join(staging, "chunks.bin"), "wb") as f:
+        for data in encoded:
+            f.write(data)
+    with open(os.path.join(staging, "documents.json"), "w") as f:
+        json.dump(catalog, f)
+    if ivf:
+        np.save(os.path.join(staging, "ivf_centroids.npy"), centroids)
+        np.save(os.path.join(staging, "ivf_offsets.npy"), list_offsets)
+    with open(os.path.join(staging, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.exists(path):
+        retired = f"{path}.old-{os.getpid()}"
+        os.replace(path, retired)
+        os.replace(staging, path)
+        shutil.rmtree(retired, ignore_errors=True)
+    else:
+        os.replace(staging, path)
+    return manifest
@@ -0,0 +1,91 @@
+"""
+Start-up warm-up for new containers.
+
+AgentCore scales out by starting containers, so everything the first request
+would otherwise build on its critical path (boto3 clients, the personality
+registry, agent resources and the tools of warm personalities) is built by
+warm_up() instead. start_warm_up() runs it on a daemon thread right after the
+app is created, so the server accepts connections without waiting for it; a
+request that arrives first simply builds what it needs itself, as before.
+
+Configured with WARMUP (default true), WARMUP_MODELS (comma-separated model
+IDs, default Nova Micro) and WARMUP_PERSONALITIES (comma-separated names,
+default basic,fomc,scotus).
+"""
+
+import logging
+import os
+import threading
+import time
+from aws_clients import DEFAULT_REGION, get_boto_session, get_client
+
+logger = logging.getLogger(__name__)
+
+# Clients every container ends up creating
+WARMUP_CLIENTS = ("s3", "bedrock-runtime", "bedrock-agent-runtime")
+
+
+def _env_list(name, default):
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+
+def warm_up(models=None, personalities=None):
+    """
+    Build shared clients, the registry and pooled agent resources now.
+
+    Args:
+        models (list): Model IDs to warm; defaults to WARMUP_MODELS
+        personalities (list): Personality names to warm; defaults to
+            WARMUP_PERSONALITIES. Unknown names are skipped.
+
+    Returns:
+        dict: Milliseconds spent per step
+    """
+    # Imported here so importing this module stays cheap
+    from agent_pool import AGENT_POOL
+    from personalities import get_registry
+
+    models = models or _env_list("WARMUP_MODELS", "us.amazon.nova-micro-v1:0")
+    personalities = personalities or _env_list("WARMUP_PERSONALITIES", "basic,fomc,scotus")
+    timings = {}
+
+    def step(name, fn, *args):
+        started = time.perf_counter()
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.warning("warm-up step %s failed: %s", name, e)
+        timings[name] = round((time.perf_counter() - started) * 1000.0, 1)
+
+    step("boto_session", get_boto_session, DEFAULT_REGION)
+    for service in WARMUP_CLIENTS:
+        step(f"client:{service}", get_client, service, DEFAULT_REGION)
+    step("registry", get_registry)
+
+    registry = get_registry()
+    for model in models:
+        for personality in personalities:
+            if personality in registry:
+                step(f"agent:{model}:{personality}", AGENT_POOL.get, model, personality)
+    return timings
+
+
+def start_warm_up():
+    """
+    Run warm_up() on a daemon thread unless WARMUP is off.
+
+    Returns:
+        threading.Thread | None: The warm-up thread, or None when disabled
+    """
+    if os.getenv("WARMUP", "true").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+
+    def run():
+        started = time.perf_counter()
+        timings = warm_up()
+        logger.info("warm-up finished", extra={
+            "warmup_ms": round((time.perf_counter() - started) * 1000.0, 1), "steps": timings})
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread